@@ -1,15 +1,39 @@
 ﻿from __future__ import annotations
 
 import argparse
+import hashlib
+import json
 import os
+import re
+import shutil
+import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 from datetime import datetime
 
+from as_is_scan import SKIP_DIRS
+from file_fact_cache import RACY_WINDOW_NS, sha256_file
+import perf_trace
+from repo_walker import iter_files
+
 ROOT = Path(__file__).resolve().parents[1]
 ART  = ROOT / "Artifacts"
 ART.mkdir(exist_ok=True)
 
+# Bump when the state file layout or the stage key recipe changes; old state is ignored.
+STATE_VERSION = 1
+STATE_PATH = Path("Artifacts") / "pipeline_state.json"
+
+# Inputs named TREE stand for every repository file the walkers see, minus pipeline
+# scratch directories and the declared outputs of all stages.
+TREE = "<repo>"
+SCRATCH_DIRS = ("AgentInput/", "AgentOutput/", "Artifacts/")
+
+IMPORT_RE = re.compile(r"^\s*(?:from|import)\s+(\w+)", re.M)
+
 def now():
     return datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
 
@@ -19,12 +43,320 @@ def append_strategic_idea(title: str, details: str):
     entry = f"\n## {title}\n- time_utc: {now()}\n- details: {details.strip()}\n"
     p.write_text(p.read_text(encoding="utf-8") + entry if p.exists() else ("# Strategic Ideas (requires human decision)\n" + entry), encoding="utf-8")
 
+class Stage:
+    """
+    One pipeline step: `script` (in scripts/) run with `args` from the repo root. `inputs`
+    and `outputs` are repo-relative files; `after` names stages that must finish first even
+    though no file links them. `publish` copies (src, dst) after a successful run, the way
+    prep_agent_inputs.ps1 stages requirements for the agent.
+    """
+
+    def __init__(self, name: str, script: str, args=(), inputs=(), outputs=(), after=(), publish=()):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs) + [dst for _, dst in publish]
+        self.after = list(after)
+        self.publish = list(publish)
+
+def pipeline_stages() -> list:
+    md = os.getenv("REQUIREMENTS_MD", "Requirements/CANONICAL.md")
+    req_json = os.getenv("CANON_REQUIREMENTS_JSON", "Requirements/CANONICAL.requirements.json")
+    req_jsonl = os.getenv("CANON_REQUIREMENTS_JSONL", "Requirements/CANONICAL.requirements.jsonl")
+    out = "AgentOutput"
+    return [
+        Stage("sync", "sync_requirements_from_md.py",
+              ["--md", md, "--json", req_json, "--jsonl", req_jsonl],
+              inputs=[md], outputs=[req_json, req_jsonl],
+              publish=[(req_jsonl, "AgentInput/requirements.jsonl"),
+                       (req_jsonl, "AgentInput/Requirements/requirements.jsonl")]),
+        Stage("as_is_scan", "as_is_scan.py",
+              inputs=[TREE], outputs=["AgentInput/as_is_scan.json", "AgentInput/as_is_scan.md"]),
+        Stage("db_catalog", "db_catalog.py",
+              inputs=[TREE], outputs=["AgentInput/db_catalog.json"]),
+        Stage("index_advice", "index_advisor.py",
+              inputs=[TREE, "AgentInput/db_catalog.json"],
+              outputs=["AgentInput/index_advice.json", "AgentInput/index_advice.md"]),
+        Stage("seed_status", "seed_status.py",
+              inputs=[TREE, "AgentInput/requirements.jsonl", "AgentInput/as_is_scan.json", "AgentInput/db_catalog.json"],
+              outputs=["AgentInput/requirements_status_seed.jsonl", "AgentInput/requirements_status_seed.md"]),
+        Stage("quality_report", "requirements_quality_report.py",
+              inputs=["AgentInput/Requirements/requirements.jsonl"],
+              outputs=["AgentInput/requirements_quality_report.md"]),
+        Stage("agentic_scan", "agentic_scan_runner.py",
+              ["--requirements-json", req_jsonl, "--out-dir", out, "--incremental"],
+              inputs=[TREE, req_jsonl, "AgentInput/requirements_status_seed.jsonl", "Requirements/status_taxonomy.json"],
+              outputs=[f"{out}/requirements_status.jsonl", f"{out}/requirements_status.md",
+                       f"{out}/milestone_summary.md", f"{out}/run_metadata.json"],
+              after=["quality_report"]),
+        Stage("validate", "validate_agent_output.py",
+              inputs=[f"{out}/requirements_status.jsonl", f"{out}/requirements_status.md",
+                      f"{out}/implemented_not_documented.md", "Requirements/requirements_status.schema.json",
+                      "Requirements/status_taxonomy.json"]),
+        Stage("dashboard", "make_dashboard.py",
+              ["--jsonl", f"{out}/requirements_status.jsonl", "--out", f"{out}/dashboard.html",
+               "--taxonomy", "Requirements/status_taxonomy.json", "--status-md", "none", "--milestone-md", "none"],
+              inputs=[f"{out}/requirements_status.jsonl", "Requirements/status_taxonomy.json"],
+              outputs=[f"{out}/dashboard.html"]),
+        # the other stages keep their own datasets current; this adds the source text index
+        Stage("store", "requirements_store.py", ["build"],
+              inputs=[TREE, "Requirements/CANONICAL.json"], after=["seed_status", "dashboard"]),
+    ]
+
+class Pipeline:
+    """
+    The stages as a DAG: an edge runs from the stage that writes a file to every stage
+    that reads it, plus the explicit `after` edges.
+    """
+
+    def __init__(self, stages: list):
+        self.stages = {s.name: s for s in stages}
+        self.order = [s.name for s in stages]
+        writers = {o: s.name for s in stages for o in s.outputs}
+        self.deps = {}
+        for s in stages:
+            d = {writers[i] for i in s.inputs if i in writers and writers[i] != s.name}
+            self.deps[s.name] = sorted(d | set(s.after), key=self.order.index)
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        state = {}
+        def visit(n, path):
+            if state.get(n) == 1:
+                raise ValueError("pipeline cycle: " + " -> ".join(path + [n]))
+            if state.get(n) == 2:
+                return
+            state[n] = 1
+            for d in self.deps[n]:
+                visit(d, path + [n])
+            state[n] = 2
+        for n in self.order:
+            visit(n, [])
+
+    def _closure(self, start: str, edges: dict) -> set:
+        seen, todo = {start}, [start]
+        while todo:
+            for m in edges[todo.pop()]:
+                if m not in seen:
+                    seen.add(m)
+                    todo.append(m)
+        return seen
+
+    def select(self, first: str = "", last: str = "") -> list:
+        """Stages from `first` (and everything downstream of it) up to `last` (and everything it needs)."""
+        for n in (first, last):
+            if n and n not in self.stages:
+                raise ValueError(f"unknown stage {n!r} (stages: {', '.join(self.order)})")
+        chosen = set(self.order)
+        if first:
+            users = {n: [m for m in self.order if n in self.deps[m]] for n in self.order}
+            chosen &= self._closure(first, users)
+        if last:
+            chosen &= self._closure(last, self.deps)
+        return [n for n in self.order if n in chosen]
+
+class BuildState:
+    """
+    Artifacts/pipeline_state.json: per stage, the key of its last successful run (command,
+    code and input content hashes) and the hashes of the outputs it left behind. File
+    hashes are reused while size and mtime are unchanged, as in FileFactCache.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = path
+        self.files = {}
+        self.stages = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, root: Path):
+        """PIPELINE_STATE=0 disables up-to-date checks (every stage runs); any other value overrides the path."""
+        setting = os.getenv("PIPELINE_STATE", "")
+        if setting.strip().lower() in {"0","off","false","no"}:
+            return cls()
+        path = Path(setting) if setting.strip() else root / STATE_PATH
+        st = cls(path)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            data = None
+        if isinstance(data, dict) and data.get("version") == STATE_VERSION:
+            st.files = data.get("files") or {}
+            st.stages = data.get("stages") or {}
+        return st
+
+    def file_hash(self, root: Path, rel: str) -> str:
+        """sha256 of the file, or "" when it does not exist."""
+        p = root / rel
+        try:
+            st = p.stat()
+        except OSError:
+            return ""
+        with self.lock:
+            e = self.files.get(rel)
+        if e and e[0] == st.st_size and e[1] == st.st_mtime_ns and not e[3]:
+            return e[2]
+        try:
+            sha = sha256_file(p)
+        except OSError:
+            return ""
+        with self.lock:
+            self.files[rel] = [st.st_size, st.st_mtime_ns, sha, (time.time_ns() - st.st_mtime_ns) < RACY_WINDOW_NS]
+        return sha
+
+    def save(self):
+        if self.path is None:
+            return
+        with self.lock:
+            data = json.dumps({"version": STATE_VERSION, "files": self.files, "stages": self.stages},
+                              separators=(",",":"), sort_keys=True)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(data, encoding="utf-8")
+        os.replace(tmp, self.path)
+
+def code_files(script: str) -> list:
+    """The stage script plus every scripts/ module it imports, transitively."""
+    out, todo = [], [script[:-3]]
+    while todo:
+        mod = todo.pop()
+        if mod in out:
+            continue
+        p = ROOT / "scripts" / f"{mod}.py"
+        if not p.exists():
+            continue
+        out.append(mod)
+        todo.extend(IMPORT_RE.findall(p.read_text(encoding="utf-8-sig", errors="replace")))
+    return sorted(f"scripts/{m}.py" for m in out)
+
+class Runner:
+    def __init__(self, pipeline: Pipeline, state: BuildState, jobs: int, force: bool, env: dict):
+        self.pipeline = pipeline
+        self.state = state
+        self.jobs = max(1, jobs)
+        self.force = force
+        self.env = env
+        self._tree = None
+        self._tree_lock = threading.Lock()
+        self._print_lock = threading.Lock()
+
+    def tree_files(self) -> list:
+        # the walk is shared by all TREE stages in one run; hashing happens per stage, so a
+        # stage sees the content its upstream stages left behind
+        with self._tree_lock:
+            if self._tree is None:
+                generated = {o for s in self.pipeline.stages.values() for o in s.outputs}
+                self._tree = [f.rel for f in iter_files(ROOT, SKIP_DIRS)
+                              if not f.rel.startswith(SCRATCH_DIRS) and f.rel not in generated]
+            return self._tree
+
+    def stage_key(self, s: Stage) -> str:
+        h = hashlib.sha256(json.dumps([STATE_VERSION, s.script, s.args, s.publish]).encode("utf-8"))
+        files = code_files(s.script)
+        for i in s.inputs:
+            files.extend(self.tree_files() if i == TREE else [i])
+        for rel in files:
+            h.update(f"{rel}\0{self.state.file_hash(ROOT, rel)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def up_to_date(self, s: Stage, key: str) -> bool:
+        if self.force or self.state.path is None:
+            return False
+        rec = self.state.stages.get(s.name)
+        if not rec or rec.get("key") != key:
+            return False
+        return all(self.state.file_hash(ROOT, o) == sha for o, sha in rec.get("outputs", {}).items())
+
+    def plan(self, names: list) -> list:
+        """(stage, "run"/"skip") for a dry run, assuming every stage that runs changes its outputs."""
+        out, dirty = [], set()
+        for n in names:
+            s = self.pipeline.stages[n]
+            upstream = any(d in dirty for d in self.pipeline.deps[n])
+            verdict = "run" if upstream or not self.up_to_date(s, self.stage_key(s)) else "skip"
+            if verdict == "run":
+                dirty.add(n)
+            out.append((n, verdict))
+        return out
+
+    def _log(self, text: str):
+        with self._print_lock:
+            print(text, flush=True)
+
+    def run_stage(self, s: Stage) -> str:
+        key = self.stage_key(s)
+        if self.up_to_date(s, key):
+            self._log(f"SKIP: {s.name} (up to date)")
+            return "skipped"
+        cmd = [sys.executable, str(ROOT / "scripts" / s.script)] + s.args
+        t0 = time.perf_counter()
+        with perf_trace.span(f"stage:{s.name}") as sp:
+            p = subprocess.run(cmd, cwd=str(ROOT), env=self.env, capture_output=True, text=True)
+            sp.set(rc=p.returncode)
+        dt = time.perf_counter() - t0
+        body = (p.stdout + p.stderr).rstrip()
+        if p.returncode != 0:
+            self._log(f"FAIL: {s.name} (exit={p.returncode}, {dt:.1f}s)" + (f"\n{body}" if body else ""))
+            return "failed"
+        for src, dst in s.publish:
+            (ROOT / dst).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(ROOT / src, ROOT / dst)
+        outputs = {o: self.state.file_hash(ROOT, o) for o in s.outputs}
+        missing = [o for o, sha in outputs.items() if not sha]
+        if missing:
+            # nothing to be up to date with: the next run tries again
+            self.state.stages.pop(s.name, None)
+            body += "\nINFO: not written this run: " + ", ".join(missing)
+        else:
+            self.state.stages[s.name] = {"key": key, "outputs": outputs, "finished_utc": now(), "seconds": round(dt, 3)}
+        self.state.save()
+        self._log(f"OK: {s.name} ({dt:.1f}s)" + (f"\n{body}" if body else ""))
+        return "ran"
+
+    def run(self, names: list) -> dict:
+        """
+        Runs the selected stages, each as soon as its selected dependencies succeeded, up to
+        `jobs` at a time. Stages downstream of a failure are reported as blocked.
+        """
+        wanted = set(names)
+        deps = {n: [d for d in self.pipeline.deps[n] if d in wanted] for n in names}
+        result = {}
+        pending = list(names)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as ex:
+            while pending or running:
+                for n in list(pending):
+                    if any(result.get(d) in {"failed", "blocked"} for d in deps[n]):
+                        result[n] = "blocked"
+                        pending.remove(n)
+                        self._log(f"BLOCKED: {n} (upstream failed)")
+                    elif all(d in result for d in deps[n]) and len(running) < self.jobs:
+                        running[ex.submit(self.run_stage, self.pipeline.stages[n])] = n
+                        pending.remove(n)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for f in done:
+                    n = running.pop(f)
+                    try:
+                        result[n] = f.result()
+                    except Exception as e:
+                        self._log(f"FAIL: {n} ({e})")
+                        result[n] = "failed"
+        return result
+
 def main():
     ap = argparse.ArgumentParser(description="Agentic build runner (guardrailed).")
     ap.add_argument("--mode", choices=["plan","build"], default="plan", help="plan = no code changes; build = allowed to patch code.")
     ap.add_argument("--allow_new_scope", action="store_true", help="Allow adding new scope; otherwise record to Artifacts/strategic_ideas.md")
     ap.add_argument("--allow_financial_automation", action="store_true", help="Allow automations touching money movement; default OFF.")
     ap.add_argument("--max_cost_usd", type=float, default=float(os.getenv("OPENAI_BUDGET_USD", "0") or "0"), help="Optional budget cap for agent usage.")
+    ap.add_argument("--from", dest="first", default="", help="Start at this stage (and run everything downstream of it).")
+    ap.add_argument("--to", dest="last", default="", help="Stop after this stage (running only what it depends on).")
+    ap.add_argument("--jobs", type=int, default=int(os.getenv("PIPELINE_JOBS", "0") or "0") or min(4, os.cpu_count() or 1),
+                    help="Independent stages run concurrently, up to this many at a time.")
+    ap.add_argument("--force", action="store_true", help="Run the selected stages even when their inputs are unchanged.")
     args = ap.parse_args()
 
     # Guardrails
@@ -38,30 +370,38 @@ def main():
             "Build runner executed with allow_financial_automation=FALSE. Any money-moving steps must be proposed and queued for approval."
         )
 
-    # Minimal orchestration hooks (safe): run scans/validators if present.
-    # Keep this runner non-destructive unless mode=build AND explicit flags allow it.
-    scripts = ROOT / "scripts"
-    candidates = [
-        scripts / "agentic_scan_runner.py",
-        scripts / "validate_agent_output.py",
-        scripts / "requirements_quality_report.py",
-    ]
+    pipeline = Pipeline(pipeline_stages())
+    try:
+        names = pipeline.select(args.first, args.last)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(2)
 
-    for c in candidates:
-        if c.exists():
-            print(f"INFO: found {c.name} (runner may invoke in future phases).")
+    env = dict(os.environ)
+    env["OPENAI_BUDGET_USD"] = str(args.max_cost_usd)
+    runner = Runner(pipeline, BuildState.from_env(ROOT), args.jobs, args.force, env)
 
     if args.mode == "plan":
+        # plan never executes a stage: it shows what build would run and why
+        for n, verdict in runner.plan(names):
+            after = ", ".join(pipeline.deps[n]) or "-"
+            print(f"PLAN: {n:<16} {verdict:<5} after: {after}")
         print("OK: plan complete (no code changes).")
         sys.exit(0)
 
-    # build mode: still guardrailed  only declares intent right now; actual patch execution should be added deliberately.
+    # build mode: runs the pipeline stages; patch execution is still not automated
     append_strategic_idea(
         "Build mode requested",
         "Runner invoked in build mode. Implement patch-execution steps only after audit output is clean and approvals/flags are set."
     )
+    result = runner.run(names)
+    counts = {v: sum(1 for r in result.values() if r == v) for v in ("ran", "skipped", "failed", "blocked")}
+    print("SUMMARY: " + " ".join(f"{k}={v}" for k, v in counts.items()))
+    if counts["failed"] or counts["blocked"]:
+        print("ERROR: pipeline incomplete.", file=sys.stderr)
+        sys.exit(1)
     print("OK: build mode acknowledged; guardrails applied.")
     sys.exit(0)
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run("agentic_build_runner", main)
@@ -1,18 +1,162 @@
 ﻿from __future__ import annotations
 
+import argparse
+import asyncio
 import json
+import subprocess
+import sys
+from collections import Counter
 from datetime import datetime, timezone
 from pathlib import Path
 import os
 
+from scan_engine import (
+    PROMPT_VERSION, Budget, BudgetExceeded, EvaluationEngine, FakeBackend, OpenAIBackend,
+    StreamingJsonlWriter, load_evidence,
+)
+from eval_result_cache import EvalResultCache, evidence_hashes, result_key
+from make_dashboard import build_reports
+import openai_usage_ledger
+import perf_trace
+from requirement_deps import DEFAULT_PATH as DEPS_PATH, DependencyGraph
+from status_history import StatusHistory
+
 ROOT = Path(__file__).resolve().parents[1]
 OUT  = ROOT / "AgentOutput"
-OUT.mkdir(parents=True, exist_ok=True)
+
+TAXONOMY = ROOT / "Requirements" / "status_taxonomy.json"
+SEED_JSONL = ROOT / "AgentInput" / "requirements_status_seed.jsonl"
+DEFAULT_REQUIREMENTS = [
+    ROOT / "Requirements" / "requirements.jsonl",
+    ROOT / "AgentInput" / "requirements.jsonl",
+]
 
 def now():
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-def main():
+def env_int(name: str, default: int) -> int:
+    v = os.getenv(name, "")
+    try:
+        return int(v) if v.strip() else default
+    except ValueError:
+        return default
+
+def read_json(p: Path):
+    return json.loads(p.read_text(encoding="utf-8-sig"))
+
+def load_jsonl(p: Path):
+    out = []
+    for line in p.read_text(encoding="utf-8-sig", errors="replace").splitlines():
+        line = line.strip()
+        if line:
+            out.append(json.loads(line))
+    return out
+
+def normalize_requirement(r: dict):
+    rid = r.get("requirement_id") or r.get("id")
+    if not rid:
+        return None
+    return {
+        "requirement_id": rid,
+        "title": r.get("title") or "",
+        "milestone": r.get("milestone"),
+        "description": r.get("description") or r.get("body_md") or "",
+        "acceptance_criteria": r.get("acceptance_criteria") or [],
+    }
+
+def load_requirements(path: Path = None):
+    """
+    Accepts requirements as JSONL, a JSON array, or a JSON object with a "requirements"
+    array. Falls back to Requirements/requirements.jsonl when `path` holds none (e.g. the
+    canonical JSON before the MD sync has run).
+    """
+    candidates = ([path] if path else []) + DEFAULT_REQUIREMENTS
+    for p in candidates:
+        if not p or not p.exists():
+            continue
+        if p.suffix == ".jsonl":
+            raw = load_jsonl(p)
+        else:
+            data = read_json(p)
+            raw = data.get("requirements") if isinstance(data, dict) else data
+        reqs = [n for n in (normalize_requirement(r) for r in (raw or []) if isinstance(r, dict)) if n]
+        if reqs:
+            return p, reqs
+    return None, []
+
+def load_statuses():
+    try:
+        sts = read_json(TAXONOMY).get("statuses") or []
+    except Exception:
+        sts = []
+    return [s for s in sts if isinstance(s, str)] or ["NOT_STARTED", "PARTIAL", "IMPLEMENTED_NO_TESTS",
+                                                       "IMPLEMENTED_WITH_TESTS", "UNKNOWN_REVIEW_NEEDED"]
+
+def load_seed_evidence():
+    if not SEED_JSONL.exists():
+        return {}
+    return {r.get("requirement_id"): r.get("evidence_paths") or [] for r in load_jsonl(SEED_JSONL)}
+
+def git_sha():
+    if os.getenv("GITHUB_SHA"):
+        return os.getenv("GITHUB_SHA")
+    try:
+        return subprocess.run(["git","rev-parse","HEAD"], cwd=str(ROOT), capture_output=True, text=True, timeout=30).stdout.strip()
+    except Exception:
+        return ""
+
+def workflow_run_url():
+    server, repo, run_id = os.getenv("GITHUB_SERVER_URL"), os.getenv("GITHUB_REPOSITORY"), os.getenv("GITHUB_RUN_ID")
+    return f"{server}/{repo}/actions/runs/{run_id}" if server and repo and run_id else ""
+
+def changed_paths(graph: DependencyGraph, changed_files: str):
+    """
+    Paths changed since the graph was last updated: commits since its git_head plus the
+    working tree, or the newline-separated list in `changed_files`. None = unknown.
+    """
+    if changed_files:
+        return {l.strip() for l in Path(changed_files).read_text(encoding="utf-8-sig").splitlines() if l.strip()}
+    if not graph.git_head:
+        return None
+    from as_is_scan import git_changed_since, git_dirty_paths
+    committed, dirty = git_changed_since(graph.git_head), git_dirty_paths()
+    if committed is None or dirty is None:
+        return None
+    return set(committed) | set(dirty)
+
+class LedgerBudget(Budget):
+    """OPENAI_BUDGET_USD enforced through the shared usage ledger (reservations held under its lock)."""
+
+    def __init__(self, ledger: str, budget_usd: float, model: str):
+        self.ledger = ledger
+        self.budget_usd = budget_usd
+        self.model = model
+
+    @classmethod
+    def from_env(cls, model: str):
+        budget = float(os.getenv("OPENAI_BUDGET_USD", "0") or "0")
+        if budget <= 0:
+            return None
+        ledger = os.getenv("OPENAI_LEDGER_PATH") or str(ROOT / "Artifacts" / "openai_usage_ledger.jsonl")
+        return cls(ledger, budget, model)
+
+    def reserve(self, input_tokens, output_tokens, requirement_id):
+        try:
+            return openai_usage_ledger.reserve(ledger_path=self.ledger, budget_usd=self.budget_usd, model=self.model,
+                                               input_tokens=input_tokens, output_tokens=output_tokens,
+                                               work_tag=requirement_id)
+        except RuntimeError as e:
+            raise BudgetExceeded(str(e)) from e
+
+    def settle(self, hold, input_tokens, output_tokens, requirement_id):
+        openai_usage_ledger.settle(ledger_path=self.ledger, reservation=hold, purpose="requirements_scan",
+                                   model=self.model, input_tokens=input_tokens, output_tokens=output_tokens,
+                                   work_tag=requirement_id)
+
+    def release(self, hold):
+        openai_usage_ledger.release(self.ledger, hold)
+
+def write_scan_summary(out_dir: Path, note: str):
     req_dir = ROOT / "Requirements"
     files = []
     if req_dir.exists():
@@ -26,10 +170,10 @@ def main():
         "requirements_dir_exists": req_dir.exists(),
         "requirements_file_count": len(files),
         "openai_api_key_present": bool(os.getenv("OPENAI_API_KEY")),
-        "note": "Minimal scan runner (unblocks CI). Replace with full scan implementation when ready."
+        "note": note,
     }
 
-    (OUT / "scan_summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    (out_dir / "scan_summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
 
     md = [
         "# Agentic Scan Summary",
@@ -41,10 +185,194 @@ def main():
         summary["note"],
         ""
     ]
-    (OUT / "scan_summary.md").write_text("\n".join(md), encoding="utf-8")
+    (out_dir / "scan_summary.md").write_text("\n".join(md), encoding="utf-8")
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Agentic requirements scan: evaluates each requirement against repo evidence.")
+    ap.add_argument("--requirements-json", default="", help="Requirements JSON/JSONL (default: Requirements/requirements.jsonl).")
+    ap.add_argument("--mode", default=os.getenv("SCAN_MODE", "LITE"), help="LITE = evidence paths only; FULL = include file snippets.")
+    ap.add_argument("--run-mode", default=os.getenv("RUN_MODE", "full"), choices=["full","test"], help="test = evaluate only the first --batch-size requirements.")
+    ap.add_argument("--batch-size", type=int, default=env_int("BATCH_SIZE", 10))
+    ap.add_argument("--max-requirements", type=int, default=env_int("LIMIT", 9999))
+    ap.add_argument("--out-dir", default=str(OUT))
+    ap.add_argument("--model", default=os.getenv("OPENAI_MODEL") or "gpt-5.2")
+    ap.add_argument("--backend", default=os.getenv("SCAN_BACKEND", ""), choices=["","openai","fake"], help="Default: openai when OPENAI_API_KEY is set.")
+    ap.add_argument("--concurrency", type=int, default=env_int("SCAN_CONCURRENCY", 4))
+    ap.add_argument("--rpm", type=float, default=float(env_int("OPENAI_RPM", 60)), help="Request rate limit per minute.")
+    ap.add_argument("--tpm", type=float, default=float(env_int("OPENAI_TPM", 200_000)), help="Token rate limit per minute.")
+    ap.add_argument("--max-retries", type=int, default=5)
+    ap.add_argument("--fake-latency-ms", type=float, default=50.0)
+    ap.add_argument("--fake-fail-rate", type=float, default=0.0)
+    ap.add_argument("--incremental", action="store_true", default=os.getenv("SCAN_INCREMENTAL", "") in {"1","true","yes"},
+                    help="Re-evaluate only requirements whose text or evidence changed; carry the rest forward.")
+    ap.add_argument("--changed-files", default="", help="Newline-separated changed paths (default: git diff since the last graph update).")
+    ap.add_argument("--deps-graph", default=str(ROOT / DEPS_PATH))
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    backend_name = args.backend or ("openai" if os.getenv("OPENAI_API_KEY") else "")
+    if not backend_name:
+        write_scan_summary(out_dir, "OPENAI_API_KEY not set; requirements were not evaluated (use --backend fake for an offline run).")
+        print("INFO: OPENAI_API_KEY not set; skipping evaluation.")
+        return 0
+
+    req_path, reqs = load_requirements(Path(args.requirements_json) if args.requirements_json else None)
+    if not reqs:
+        print(f"ERROR: no requirements found (tried {args.requirements_json or 'defaults'}).", file=sys.stderr)
+        return 2
+
+    limit = args.batch_size if args.run_mode == "test" else args.max_requirements
+    selected = reqs[:max(0, limit)]
+    statuses = load_statuses()
+    full = args.mode.strip().lower() == "full"
+    seed = load_seed_evidence()
+    cache = EvalResultCache.from_env(ROOT)
+    scan_mode = "full" if full else "lite"
+    graph = DependencyGraph.load(Path(args.deps_graph), ROOT,
+                                 context=json.dumps([PROMPT_VERSION, args.model, statuses, scan_mode]))
+    prev_out = out_dir / "requirements_status.jsonl"
+    previous = load_jsonl(prev_out) if prev_out.exists() else []
+    if previous:
+        graph.seed_from_output(previous)
+    base_head = graph.git_head
+    changed = changed_paths(graph, args.changed_files) if args.incremental else None
+    incremental = args.incremental and changed is not None
+    if args.incremental and not incremental:
+        print("INFO: no usable dependency graph or git history; evaluating every selected requirement.")
+    writer = StreamingJsonlWriter(out_dir / "requirements_status.jsonl")
+
+    # untouched requirements are carried forward and cache hits replayed straight into the
+    # output; only the rest reach the model
+    keys = {}
+    items = []
+    affected = []
+    settled = set()  # requirements whose graph entry is current as of this run
+    cache_hits = 0
+    by_id = {r["requirement_id"]: r for r in selected}
+    seed_paths = {r["requirement_id"]: seed.get(r["requirement_id"], [])[:6] for r in selected}
+    for r in selected:
+        paths = seed_paths[r["requirement_id"]]
+        if incremental:
+            reasons = graph.reasons(r, paths, changed)
+            if not reasons:
+                writer.write(graph.record(r["requirement_id"]))
+                settled.add(r["requirement_id"])
+                continue
+            affected.append({"requirement_id": r["requirement_id"], "reasons": reasons})
+        keys[r["requirement_id"]] = key = result_key(
+            req=r, evidence=evidence_hashes(ROOT, paths), prompt_version=PROMPT_VERSION,
+            model=args.model, statuses=statuses, scan_mode=scan_mode)
+        answer = cache.get(key)
+        if answer is not None:
+            cache_hits += 1
+            rec = {"requirement_id": r["requirement_id"], "title": r.get("title"), "milestone": r.get("milestone"), **answer}
+            writer.write(rec)
+            graph.update(r, paths, rec)
+            settled.add(r["requirement_id"])
+        else:
+            items.append((r, load_evidence(ROOT, paths, max_files=6, snippet_chars=1500 if full else 0)))
+
+    if backend_name == "fake":
+        backend = FakeBackend(statuses, latency_ms=args.fake_latency_ms, fail_rate=args.fake_fail_rate)
+    else:
+        backend = OpenAIBackend()
+    engine = EvaluationEngine(backend, model=args.model, statuses=statuses, concurrency=args.concurrency,
+                              rpm=args.rpm, tpm=args.tpm, max_retries=args.max_retries, budget=LedgerBudget.from_env(args.model))
+
+    def on_result(rec):
+        writer.write(rec)
+        rid = rec["requirement_id"]
+        if rid not in engine.failed_ids:
+            cache.put(keys[rid], rid, {k: rec[k] for k in ("status", "evidence", "gaps", "notes")})
+            graph.update(by_id[rid], seed_paths[rid], rec)
+            settled.add(rid)
+
+    async def run():
+        try:
+            return await engine.run(items, on_result)
+        finally:
+            await backend.close()
+
+    try:
+        with perf_trace.span("evaluate", requirements=len(items), backend=backend.name) as s:
+            engine_stats = asyncio.run(run())
+            s.set(completed=engine_stats["completed"], retries=engine_stats["retries"])
+    finally:
+        cache.save()
+        # a partial run (test mode, budget stop, failed calls) leaves some requirements
+        # unevaluated: keep the old head so the next incremental run still sees their changes
+        head = git_sha() if all(r["requirement_id"] in settled for r in reqs) else base_head
+        graph.save(head, keep=[r["requirement_id"] for r in reqs])
+    # requirements this run did not get to (outside the test batch / --max-requirements, or
+    # left over by a budget stop) keep their previous status instead of dropping out
+    written = {rec["requirement_id"] for rec in writer.records}
+    known = {r["requirement_id"] for r in reqs}
+    carried = [rec for rec in previous if rec.get("requirement_id") in known and rec["requirement_id"] not in written]
+    for rec in carried:
+        writer.write(rec)
+    records = writer.finalize([r["requirement_id"] for r in reqs])
+    if args.incremental:
+        (out_dir / "affected_requirements.json").write_text(json.dumps(affected, indent=2) + "\n", encoding="utf-8")
+
+    determinants = Counter()
+    for rec in records:
+        for ev in rec.get("evidence") or []:
+            determinants[str(ev).split(":", 1)[0] if ":" in str(ev) else "other"] += 1
+
+    meta = {
+        "generated_at_utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "run_mode": args.run_mode,
+        "scan_mode": args.mode,
+        "model": args.model,
+        "prompt_version": PROMPT_VERSION,
+        "batch_size": args.batch_size,
+        "max_requirements": args.max_requirements,
+        "requirements_total": len(reqs),
+        "requirements_evaluated_this_run": engine_stats["completed"],
+        "requirements_from_cache": cache_hits,
+        "requirements_carried_forward": len(records) - engine_stats["completed"] - cache_hits,
+        "status_counts": dict(Counter(r["status"] for r in records)),
+        "determinants_of_truth_counts": dict(determinants),
+        "git_sha": git_sha(),
+        "workflow_run_url": workflow_run_url(),
+        "canonical_requirements": str(req_path),
+        "engine": engine_stats,
+        "eval_cache": {"enabled": cache.enabled, **cache.stats},
+        "incremental": {
+            "enabled": incremental,
+            "base_git_sha": base_head if incremental else "",
+            "changed_paths": len(changed) if incremental else None,
+            "re_evaluated": len(affected) if incremental else len(selected),
+            "skipped": len(selected) - len(affected) if incremental else 0,
+        },
+    }
+    (out_dir / "run_metadata.json").write_text(json.dumps(meta, indent=2) + "\n", encoding="utf-8")
+    build_reports(out_dir / "requirements_status.jsonl", taxonomy_path=TAXONOMY if TAXONOMY.exists() else None,
+                  status_md=out_dir / "requirements_status.md", milestone_md=out_dir / "milestone_summary.md", meta=meta)
+    history = StatusHistory.from_env(ROOT)
+    if history is not None:
+        try:
+            history.record_run(records, meta)
+        finally:
+            history.close()
+    write_scan_summary(out_dir, f"Evaluated {engine_stats['completed']} of {len(reqs)} requirements with {backend.name} backend ({args.model}).")
 
+    print(f"Engine: {engine_stats['completed']} done in {engine_stats['wall_seconds']}s, "
+          f"{engine_stats['throughput_per_min']}/min, p50={engine_stats['latency_p50_s']}s p95={engine_stats['latency_p95_s']}s "
+          f"p99={engine_stats['latency_p99_s']}s, retries={engine_stats['retries']}, failed={engine_stats['failed']}")
+    if cache.enabled:
+        print(cache.summary())
+    if incremental:
+        print(f"Incremental: {len(changed)} changed paths since {base_head[:12]}; "
+              f"re-evaluated={len(affected)} skipped={len(selected) - len(affected)}")
+    if engine_stats["stopped_reason"]:
+        print(f"WARN: stopped early: {engine_stats['stopped_reason']}", file=sys.stderr)
     print("OK: agentic_scan_runner.py completed.")
     return 0
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    raise SystemExit(perf_trace.run("agentic_scan_runner", main))
@@ -1,6 +1,13 @@
-﻿import json, os, re, subprocess, sys
+﻿import argparse, json, subprocess, sys
 from pathlib import Path
 
+from endpoint_extractors import extract_many
+from file_fact_cache import FileFactCache
+from git_history import GitHistory
+import perf_trace
+from repo_walker import Collector, RepoFile, format_timings, iter_files, iter_paths, walk, walk_key
+from requirements_store import RequirementsStore
+
 ROOT = Path(".").resolve()
 AGENT_IN = ROOT / "AgentInput"
 OUT_JSON = AGENT_IN / "as_is_scan.json"
@@ -9,6 +16,9 @@ OUT_MD   = AGENT_IN / "as_is_scan.md"
 CODE_EXTS = {".ts",".tsx",".js",".jsx",".py",".go",".java",".cs",".rb",".php"}
 SKIP_DIRS = {"node_modules",".git",".next","dist","build","out",".turbo",".cache",".venv","venv","coverage"}
 
+# Bump whenever the as_is_scan.json layout changes; --incremental only patches same-version inventories.
+SCHEMA_VERSION = 2
+
 def run(cmd, timeout=30):
     try:
         p = subprocess.run(cmd, cwd=str(ROOT), capture_output=True, text=True, timeout=timeout, shell=False)
@@ -17,147 +27,292 @@ def run(cmd, timeout=30):
         return {"cmd": cmd, "rc": -1, "out": "", "err": str(e)}
 
 def walk_files():
-    files = []
-    for dp, dns, fns in os.walk(ROOT):
-        dname = Path(dp).name
-        dns[:] = [d for d in dns if d not in SKIP_DIRS]
-        rel_dp = Path(dp).relative_to(ROOT)
-        for fn in fns:
-            p = Path(dp) / fn
-            rel = p.relative_to(ROOT)
-            files.append(str(rel).replace("\\","/"))
-    return files
-
-def find_package_jsons():
-    pkgs = []
-    for p in ROOT.rglob("package.json"):
-        if any(part in SKIP_DIRS for part in p.parts):
-            continue
-        try:
-            j = json.loads(p.read_text(encoding="utf-8", errors="replace"))
-        except Exception:
-            continue
-        pkgs.append({
-            "path": str(p.relative_to(ROOT)).replace("\\","/"),
-            "name": j.get("name"),
-            "private": j.get("private"),
-            "scripts": list((j.get("scripts") or {}).keys()),
-            "dependencies": list((j.get("dependencies") or {}).keys())[:200],
-            "devDependencies": list((j.get("devDependencies") or {}).keys())[:200],
-        })
-    return pkgs
-
-ROUTE_PATTERNS = [
-    # Express (Express.js), Router
-    re.compile(r"\b(app|router)\.(get|post|put|delete|patch)\s*\(\s*['\"]([^'\"]+)['\"]", re.I),
-    # Fastify (Fastify)
-    re.compile(r"\bfastify\.(get|post|put|delete|patch)\s*\(\s*['\"]([^'\"]+)['\"]", re.I),
-    # Koa Router
-    re.compile(r"\brouter\.(get|post|put|delete|patch)\s*\(\s*['\"]([^'\"]+)['\"]", re.I),
-]
-
-def scan_endpoints():
-    endpoints = []
-    for p in ROOT.rglob("*"):
-        if p.is_dir(): 
-            continue
-        if any(part in SKIP_DIRS for part in p.parts):
-            continue
-        if p.suffix.lower() not in {".ts",".tsx",".js",".jsx"}:
-            continue
+    return [f.rel for f in iter_files(ROOT, SKIP_DIRS)]
+
+def package_facts(text: str):
+    try:
+        j = json.loads(text)
+    except Exception:
+        return None
+    return {
+        "name": j.get("name"),
+        "private": j.get("private"),
+        "scripts": list((j.get("scripts") or {}).keys()),
+        "dependencies": list((j.get("dependencies") or {}).keys())[:200],
+        "devDependencies": list((j.get("devDependencies") or {}).keys())[:200],
+    }
+
+class PackageCollector(Collector):
+    name = "packages"
+
+    def __init__(self, cache: FileFactCache):
+        self.cache = cache
+        self.pkgs = []
+
+    def visit(self, f: RepoFile):
+        if f.name != "package.json":
+            return
         try:
-            txt = p.read_text(encoding="utf-8", errors="replace")
+            facts = self.cache.get(f.path, f.rel, "package", package_facts)
         except Exception:
-            continue
-        for pat in ROUTE_PATTERNS:
-            for m in pat.finditer(txt):
-                if pat.pattern.startswith("\\bfastify"):
-                    method = m.group(1).upper()
-                    path = m.group(2)
-                else:
-                    method = m.group(2).upper()
-                    path = m.group(3)
+            return
+        if facts is None:
+            return
+        self.pkgs.append({"path": f.rel, **facts})
+
+    def finish(self):
+        return self.pkgs
+
+    def merge(self, old, fresh, dropped):
+        keep = [p for p in old if not dropped(p["path"])]
+        return sorted(keep + fresh, key=lambda p: walk_key(p["path"]))
+
+NEXTJS_API_BASES = ["pages/api", "src/pages/api", "app/api", "src/app/api"]
+
+class EndpointCollector(Collector):
+    name = "endpoints"
+
+    def __init__(self, cache: FileFactCache):
+        self.cache = cache
+        self.files = []
+        # Next.js style API routes: pages/api/** or app/api/**
+        self.nextjs = {base: [] for base in NEXTJS_API_BASES}
+
+    def visit(self, f: RepoFile):
+        suffix = f.suffix.lower()
+        if suffix not in {".ts",".tsx",".js",".jsx"}:
+            return
+        self.files.append((f.path, f.rel))
+        if suffix in {".ts",".js"}:
+            for base in NEXTJS_API_BASES:
+                if f.rel.startswith(base + "/"):
+                    self.nextjs[base].append({
+                        "method": "NEXTJS",
+                        "path": "/" + f.rel[len(base) + 1:],
+                        "file": f.rel,
+                    })
+
+    def finish(self):
+        routes = extract_many(self.files, cache=self.cache)
+        endpoints = []
+        for _, rel in self.files:
+            for method, path in routes.get(rel, []):
                 endpoints.append({
                     "method": method,
                     "path": path,
-                    "file": str(p.relative_to(ROOT)).replace("\\","/"),
+                    "file": rel,
                 })
+        for base in NEXTJS_API_BASES:
+            endpoints.extend(self.nextjs[base])
+        return self._dedupe(endpoints)
 
-    # Next.js style API routes: pages/api/** or app/api/**
-    for base in ["pages/api", "src/pages/api", "app/api", "src/app/api"]:
-        b = ROOT / base
-        if b.exists() and b.is_dir():
-            for f in b.rglob("*"):
-                if f.is_file() and f.suffix.lower() in {".ts",".js"}:
-                    endpoints.append({
-                        "method": "NEXTJS",
-                        "path": "/" + str(f.relative_to(b)).replace("\\","/"),
-                        "file": str(f.relative_to(ROOT)).replace("\\","/"),
-                    })
+    def merge(self, old, fresh, dropped):
+        keep = [e for e in old if not dropped(e["file"])]
+        code = [e for e in keep + fresh if e["method"] != "NEXTJS"]
+        nextjs = [e for e in keep + fresh if e["method"] == "NEXTJS"]
+        # stable sorts: routes keep their in-file order, Next.js routes stay grouped by base
+        code.sort(key=lambda e: walk_key(e["file"]))
+        nextjs.sort(key=lambda e: (NEXTJS_API_BASES.index(e["file"][:-len(e["path"])]), walk_key(e["file"])))
+        return self._dedupe(code + nextjs)
+
+    @staticmethod
+    def _dedupe(endpoints):
+        seen = set()
+        out = []
+        for e in endpoints:
+            k = (e["method"], e["path"], e["file"])
+            if k in seen:
+                continue
+            seen.add(k)
+            out.append(e)
+        return out
+
+class WorkflowCollector(Collector):
+    name = "workflows"
+
+    def __init__(self):
+        self.wf = set()
+
+    def visit(self, f: RepoFile):
+        if f.rel.startswith(".github/workflows/") and (f.name.endswith(".yml") or f.name.endswith(".yaml")):
+            self.wf.add(f.rel)
+
+    def finish(self):
+        return sorted(self.wf)
+
+    def merge(self, old, fresh, dropped):
+        return sorted({x for x in old if not dropped(x)} | set(fresh))
 
-    # De-dupe
-    seen = set()
-    out = []
-    for e in endpoints:
-        k = (e["method"], e["path"], e["file"])
-        if k in seen:
+# migrations/tests lists are capped; an incremental merge can't recover entries cut off earlier
+MAX_LISTED = 2000
+
+# Directory names whose whole contents count as migrations, even without "migration" in the path
+# (covers migrations/, migration/, prisma/migrations, drizzle/, supabase/migrations, db/migrations ...).
+MIGRATION_DIRS = {"migrations","migration","drizzle"}
+
+class MigrationCollector(Collector):
+    name = "migrations"
+
+    def __init__(self, limit=MAX_LISTED):
+        self.limit = limit
+        self.mig = set()
+
+    def visit(self, f: RepoFile):
+        # Also common "migrations" anywhere
+        if "migration" in f.rel.lower() or any(part in MIGRATION_DIRS for part in f.rel.split("/")[:-1]):
+            self.mig.add(f.rel)
+
+    def finish(self):
+        return sorted(self.mig)[:self.limit]
+
+    def merge(self, old, fresh, dropped):
+        return sorted({x for x in old if not dropped(x)} | set(fresh))[:self.limit]
+
+class TestCollector(Collector):
+    name = "tests"
+
+    def __init__(self, limit=MAX_LISTED):
+        self.limit = limit
+        self.tests = set()
+
+    def visit(self, f: RepoFile):
+        name = f.name.lower()
+        if any(x in name for x in [".spec.", ".test."]) or name.endswith("_test.py"):
+            self.tests.add(f.rel)
+
+    def finish(self):
+        return sorted(self.tests)[:self.limit]
+
+    def merge(self, old, fresh, dropped):
+        return sorted({x for x in old if not dropped(x)} | set(fresh))[:self.limit]
+
+def git_lines(args, timeout=60):
+    try:
+        p = subprocess.run(["git"] + args, cwd=str(ROOT), capture_output=True, text=True, timeout=timeout, shell=False)
+    except Exception:
+        return None
+    if p.returncode != 0:
+        return None
+    return p.stdout
+
+def git_dirty_paths():
+    """
+    Modified, staged, untracked and ignored paths in the working tree (ignored directories
+    are reported once, with a trailing "/"). None if git isn't usable here.
+    """
+    out = git_lines(["status","--porcelain","-z","--untracked-files=all","--ignored=matching"])
+    if out is None:
+        return None
+    toks = out.split("\0")
+    paths = []
+    i = 0
+    while i < len(toks):
+        t = toks[i]
+        i += 1
+        if not t:
             continue
-        seen.add(k)
-        out.append(e)
-    return out
-
-def find_workflows():
-    wf = []
-    p = ROOT / ".github" / "workflows"
-    if p.exists():
-        for f in p.rglob("*.yml"):
-            wf.append(str(f.relative_to(ROOT)).replace("\\","/"))
-        for f in p.rglob("*.yaml"):
-            wf.append(str(f.relative_to(ROOT)).replace("\\","/"))
-    return sorted(set(wf))
-
-def find_migrations():
-    mig = []
-    for candidate in ["migrations","migration","prisma/migrations","drizzle","supabase/migrations","db/migrations","infra/db/migrations"]:
-        for p in ROOT.rglob(candidate):
-            if p.is_dir() and not any(part in SKIP_DIRS for part in p.parts):
-                for f in p.rglob("*"):
-                    if f.is_file():
-                        mig.append(str(f.relative_to(ROOT)).replace("\\","/"))
-    # Also common "migrations" anywhere
-    for f in ROOT.rglob("*"):
-        if f.is_file() and not any(part in SKIP_DIRS for part in f.parts):
-            low = str(f).lower()
-            if "migration" in low or "migrations" in low:
-                mig.append(str(f.relative_to(ROOT)).replace("\\","/"))
-    return sorted(set(mig))[:2000]
-
-def find_tests():
-    tests = []
-    for f in ROOT.rglob("*"):
-        if f.is_file() and not any(part in SKIP_DIRS for part in f.parts):
-            name = f.name.lower()
-            if any(x in name for x in [".spec.", ".test."]) or name.endswith("_test.py"):
-                tests.append(str(f.relative_to(ROOT)).replace("\\","/"))
-    return sorted(set(tests))[:2000]
+        paths.append(t[3:])
+        if t[0] in "RC" and i < len(toks):
+            paths.append(toks[i])  # rename/copy source
+            i += 1
+    return sorted(set(paths))
 
-def main():
+def git_changed_since(old_head: str):
+    """Paths added/modified/deleted/renamed between old_head and HEAD (both sides of renames)."""
+    out = git_lines(["diff","--name-status","-z","--find-renames",f"{old_head}..HEAD"])
+    if out is None:
+        return None
+    toks = out.split("\0")
+    paths = []
+    i = 0
+    while i < len(toks):
+        st = toks[i]
+        i += 1
+        if not st:
+            continue
+        n = 2 if st[0] in "RC" else 1
+        paths.extend(toks[i:i + n])
+        i += n
+    return paths
+
+def make_collectors(cache: FileFactCache, limit=MAX_LISTED):
+    """`limit` caps the migrations/tests lists; None keeps them whole (for callers that patch them)."""
+    return [
+        PackageCollector(cache),
+        WorkflowCollector(),
+        MigrationCollector(limit),
+        TestCollector(limit),
+        EndpointCollector(cache),
+    ]
+
+def full_scan(cache: FileFactCache, limit=MAX_LISTED):
+    return walk(ROOT, make_collectors(cache, limit), SKIP_DIRS)
+
+def incremental_scan(prev: dict, head: str, dirty, cache: FileFactCache):
+    """
+    Patches the previous inventory with only the files that changed since it was written.
+    Returns (found, timings), or (None, reason) when a full scan is required.
+    """
+    if prev.get("schema_version") != SCHEMA_VERSION:
+        return None, "schema version differs"
+    if prev.get("root") != str(ROOT):
+        return None, "scan root differs"
+    old_head = ((prev.get("git") or {}).get("head") or {}).get("out", "")
+    old_dirty = (prev.get("git") or {}).get("dirty")
+    if not old_head or not head or old_dirty is None or dirty is None:
+        return None, "git state unavailable"
+    toplevel = (git_lines(["rev-parse","--show-toplevel"]) or "").strip()
+    if not toplevel or Path(toplevel).resolve() != ROOT:
+        return None, "scan root is not the git top-level"
+    committed = git_changed_since(old_head)
+    if committed is None:
+        return None, f"history for {old_head[:12]} unavailable"
+    if any(len(prev.get(k) or []) >= MAX_LISTED for k in ("migrations", "tests")):
+        return None, "previous inventory was truncated"
+
+    changed = set(committed) | set(dirty) | set(old_dirty)
+    prefixes = tuple(c if c.endswith("/") else c + "/" for c in changed)
+
+    def dropped(rel):
+        return rel in changed or rel.startswith(prefixes)
+
+    collectors = make_collectors(cache)
+    fresh, timings = walk(ROOT, collectors, SKIP_DIRS, files=list(iter_paths(ROOT, changed, SKIP_DIRS)))
+    found = {c.name: c.merge(prev.get(c.name) or [], fresh[c.name], dropped) for c in collectors}
+    timings["walk"]["changed_paths"] = len(changed)
+    return found, timings
+
+def inventory_paths(found):
+    """Every file the inventory lists, in listing order."""
+    paths = [p["path"] for p in found["packages"]] + found["workflows"] + found["migrations"] + found["tests"]
+    paths += [e["file"] for e in found["endpoints"] if e["method"] != "NEXTJS"]
+    return list(dict.fromkeys(paths))
+
+def build_inventory(found, head, dirty, history: GitHistory = None):
     inv = {
+        "schema_version": SCHEMA_VERSION,
         "root": str(ROOT),
         "git": {
-            "head": run(["git","rev-parse","HEAD"]),
+            "head": head,
             "branch": run(["git","branch","--show-current"]),
             "status": run(["git","status","-sb"]),
             "remotes": run(["git","remote","-v"]),
+            "dirty": dirty,
         },
         "lockfiles": [p for p in ["pnpm-lock.yaml","package-lock.json","yarn.lock"] if (ROOT/p).exists()],
-        "packages": find_package_jsons(),
-        "workflows": find_workflows(),
-        "migrations": find_migrations(),
-        "tests": find_tests(),
-        "endpoints": scan_endpoints(),
+        "packages": found["packages"],
+        "workflows": found["workflows"],
+        "migrations": found["migrations"],
+        "tests": found["tests"],
+        "endpoints": found["endpoints"],
     }
+    if history is not None:
+        # last commit/author/time and recent change count of each listed file, by path
+        inv["history"] = history.section(inventory_paths(found))
+    return inv
 
+def write_outputs(inv: dict):
+    """Writes as_is_scan.json and the as_is_scan.md summary of an inventory."""
     OUT_JSON.write_text(json.dumps(inv, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
 
     md = []
@@ -200,10 +355,72 @@ def main():
     for e in inv["endpoints"][:60]:
         md.append(f"- {e['method']} {e['path']}  ({e['file']})")
     md.append("")
+    if "history" in inv:
+        hist = inv["history"]["paths"]
+        days = inv["history"]["window_days"]
+        md.append("## Most changed files (Git history)")
+        md.append(f"- Files with history: {len(hist)}; changes counted over the {days} days before HEAD")
+        busy = sorted(hist.items(), key=lambda kv: (-kv[1]["recent_changes"], kv[0]))
+        for rel, f in busy[:20]:
+            if not f["recent_changes"]:
+                break
+            md.append(f"- {rel}: {f['recent_changes']} change(s), last {f['last_changed'][:10]} by {f['last_author']}")
+        md.append("")
 
     OUT_MD.write_text("\n".join(md), encoding="utf-8")
+
+def main():
+    ap = argparse.ArgumentParser(description="As-is repository scan (evidence pack for the agent).")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Patch the previous as_is_scan.json using git changes since its HEAD; falls back to a full scan.")
+    ap.add_argument("--verify", action="store_true",
+                    help="With --incremental: also run a full scan and fail if the results differ.")
+    args = ap.parse_args()
+
+    cache = FileFactCache.from_env(ROOT)
+    head = run(["git","rev-parse","HEAD"])
+    dirty = git_dirty_paths()
+
+    found = None
+    if args.incremental:
+        try:
+            prev = json.loads(OUT_JSON.read_text(encoding="utf-8"))
+        except Exception:
+            prev = None
+        if not isinstance(prev, dict):
+            found, timings = None, "no previous as_is_scan.json"
+        else:
+            found, timings = incremental_scan(prev, head.get("out", "") if head.get("rc") == 0 else "", dirty, cache)
+        if found is None:
+            print(f"INFO: incremental scan not possible ({timings}); running full scan.")
+        else:
+            print(f"INFO: incremental scan patched {timings['walk']['changed_paths']} changed path(s).")
+    if found is None:
+        found, timings = full_scan(cache)
+    cache.save()
+
+    history = GitHistory.from_env(ROOT)
+    inv = build_inventory(found, head, dirty, history)
+
+    if args.incremental and args.verify:
+        full, _ = full_scan(cache)
+        if build_inventory(full, head, dirty, history) != inv:
+            diff = [k for k in full if full[k] != found[k]]
+            print(f"ERROR: incremental scan differs from full scan in: {', '.join(diff)}", file=sys.stderr)
+            sys.exit(1)
+        print("OK: incremental scan matches full scan.")
+
+    write_outputs(inv)
     print(f"Wrote: {OUT_JSON}")
     print(f"Wrote: {OUT_MD}")
+    store = RequirementsStore.from_env(ROOT)
+    if store is not None:
+        store.put_inventory(inv)
+        store.stamp("inventory", OUT_JSON)
+        store.close()
+    print(format_timings(timings))
+    if cache.enabled:
+        print(cache.summary())
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run("as_is_scan", main)
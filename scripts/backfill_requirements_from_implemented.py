@@ -1,5 +1,7 @@
 ﻿import os, re, sys, time
 
+import perf_trace
+
 MARKER = "## Backfilled from implemented_not_documented (auto)"
 
 def backfill(md_path: str, implemented_path: str) -> bool:
@@ -21,8 +23,11 @@ def backfill(md_path: str, implemented_path: str) -> bool:
     open(md_path, "w", encoding="utf-8").write(md)
     return True
 
-if __name__ == "__main__":
+def main():
     md_path = sys.argv[1]
     impl_path = sys.argv[2]
     changed = backfill(md_path, impl_path)
     print("BACKFILL_CHANGED=" + ("1" if changed else "0"))
+
+if __name__ == "__main__":
+    perf_trace.run("backfill_requirements_from_implemented", main)
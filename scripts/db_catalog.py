@@ -0,0 +1,816 @@
+import argparse, json, re, sys
+from pathlib import Path
+
+from file_fact_cache import FileFactCache
+import perf_trace
+
+# Schema model of the Supabase migrations: every migration is parsed into a delta (a list
+# of JSON ops: create_table, alter_table, create_index, create_policy ...) that is cached
+# by content in the file-fact cache, and the deltas are replayed in timestamp order into
+# one catalog of tables, columns, indexes, RLS policies, triggers and functions. Dropping
+# a table drops what hangs off it, as Postgres does, so a table redefined by a later
+# migration (DROP TABLE payments; CREATE TABLE payments ...) ends up as its last definition.
+# The catalog also carries `objects`, a lowercase name -> ["kind:name", ...] map, so
+# requirement text is matched against schema objects with dict lookups (SchemaMatcher).
+
+ROOT = Path(".").resolve()
+MIGRATIONS_DIR = Path("supabase") / "migrations"
+OUT_JSON = ROOT / "AgentInput" / "db_catalog.json"
+
+# Bump when the db_catalog.json layout changes.
+CATALOG_VERSION = 1
+
+# ---- lexing ----
+
+# Comments, quoted literals/identifiers and dollar-quoted bodies are consumed whole, so a
+# ";" inside them never ends a statement.
+SPLIT_RE = re.compile(r"""--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'|"(?:[^"]|"")*"|\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$|;""", re.S)
+
+TOKEN_RE = re.compile(r"""
+    (?P<str>[EeBbXxNn]?'(?:[^']|'')*')
+  | (?P<dollar>\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$)
+  | (?P<qid>"(?:[^"]|"")*")
+  | (?P<word>[A-Za-z_][\w$]*)
+  | (?P<num>\d+(?:\.\d*)?)
+  | (?P<op>::|<=|>=|<>|!=|\|\||[^\s\w])
+""", re.S | re.X)
+
+def split_statements(sql: str) -> list:
+    """SQL text -> statements without comments or the trailing ";"."""
+    out = []
+    buf = []
+    pos = 0
+    for m in SPLIT_RE.finditer(sql):
+        buf.append(sql[pos:m.start()])
+        tok = m.group(0)
+        if tok == ";":
+            out.append("".join(buf).strip())
+            buf = []
+        elif tok.startswith(("--", "/*")):
+            buf.append(" ")
+        else:
+            buf.append(tok)
+        pos = m.end()
+    buf.append(sql[pos:])
+    out.append("".join(buf).strip())
+    return [s for s in out if s]
+
+class Token:
+    __slots__ = ("kind", "text", "up", "start", "end")
+
+    def __init__(self, kind, text, start, end):
+        self.kind = kind
+        self.text = text
+        self.up = text.upper() if kind == "word" else text
+        self.start = start
+        self.end = end
+
+def tokenize(stmt: str) -> list:
+    return [Token(m.lastgroup, m.group(0), m.start(), m.end())
+            for m in TOKEN_RE.finditer(stmt)]
+
+def ident(tok: Token) -> str:
+    """Identifier as Postgres stores it: quoted ones verbatim, bare ones lowercased."""
+    if tok.kind == "qid":
+        return tok.text[1:-1].replace('""', '"')
+    return tok.text.lower()
+
+def unquote(tok: Token) -> str:
+    return tok.text[tok.text.index("'") + 1:-1].replace("''", "'") if tok.kind == "str" else tok.text
+
+# ---- parsing ----
+
+class Parser:
+    """Cursor over one statement's tokens; `src` slices keep expressions as written."""
+
+    def __init__(self, stmt: str, toks=None, lo: int = 0, hi: int = None):
+        self.src = stmt
+        self.toks = tokenize(stmt) if toks is None else toks
+        self.i = lo
+        self.hi = len(self.toks) if hi is None else hi
+
+    def done(self) -> bool:
+        return self.i >= self.hi
+
+    def peek(self, *words) -> bool:
+        if self.i + len(words) > self.hi:
+            return False
+        return all(self.toks[self.i + k].up == w for k, w in enumerate(words))
+
+    def accept(self, *words) -> bool:
+        if self.peek(*words):
+            self.i += len(words)
+            return True
+        return False
+
+    def next(self) -> Token:
+        if self.done():
+            raise ValueError("unexpected end of statement")
+        t = self.toks[self.i]
+        self.i += 1
+        return t
+
+    def name(self) -> str:
+        """A possibly schema-qualified name; the public schema is implied and dropped."""
+        parts = [ident(self.next())]
+        while self.i < self.hi and self.toks[self.i].text == ".":
+            self.i += 1
+            parts.append(ident(self.next()))
+        if len(parts) > 1 and parts[0] == "public":
+            parts = parts[1:]
+        return ".".join(parts)
+
+    def close_of(self, i: int) -> int:
+        """Index of the ")" matching the "(" at token i."""
+        depth = 0
+        for j in range(i, self.hi):
+            t = self.toks[j].text
+            if t == "(":
+                depth += 1
+            elif t == ")":
+                depth -= 1
+                if depth == 0:
+                    return j
+        raise ValueError("unbalanced parentheses")
+
+    def group(self) -> "Parser":
+        """Parser over the parenthesized group at the cursor (without the parens); skips it."""
+        if self.done() or self.toks[self.i].text != "(":
+            raise ValueError("expected (")
+        end = self.close_of(self.i)
+        inner = Parser(self.src, self.toks, self.i + 1, end)
+        self.i = end + 1
+        return inner
+
+    def text(self, lo: int = None, hi: int = None) -> str:
+        lo = self.i if lo is None else lo
+        hi = self.hi if hi is None else hi
+        if lo >= hi:
+            return ""
+        return " ".join(self.src[self.toks[lo].start:self.toks[hi - 1].end].split())
+
+    def until(self, stop) -> str:
+        """Source text up to (not including) the first top-level word in `stop`; advances."""
+        lo = self.i
+        depth = 0
+        while self.i < self.hi:
+            t = self.toks[self.i]
+            if t.text == "(":
+                depth += 1
+            elif t.text == ")":
+                depth -= 1
+            elif depth == 0 and t.up in stop:
+                break
+            self.i += 1
+        return self.text(lo, self.i)
+
+    def split(self, sep: str = ",") -> list:
+        """Parsers over the top-level `sep`-separated parts of the rest."""
+        parts = []
+        lo = self.i
+        depth = 0
+        for j in range(self.i, self.hi):
+            t = self.toks[j].text
+            if t == "(":
+                depth += 1
+            elif t == ")":
+                depth -= 1
+            elif depth == 0 and t == sep:
+                parts.append(Parser(self.src, self.toks, lo, j))
+                lo = j + 1
+        parts.append(Parser(self.src, self.toks, lo, self.hi))
+        self.i = self.hi
+        return [p for p in parts if not p.done()]
+
+    def names(self) -> list:
+        return [p.name() for p in self.group().split()]
+
+COLUMN_KEYWORDS = {"CONSTRAINT", "NOT", "NULL", "DEFAULT", "PRIMARY", "UNIQUE", "REFERENCES", "CHECK",
+                   "GENERATED", "COLLATE"}
+TABLE_CONSTRAINTS = {"CONSTRAINT", "PRIMARY", "UNIQUE", "FOREIGN", "CHECK", "EXCLUDE"}
+REFERENCE_TAIL = {"ON", "MATCH", "DEFERRABLE", "NOT", "INITIALLY"}
+
+def _references(p: Parser) -> dict:
+    ref = {"table": p.name(), "columns": p.names() if not p.done() and p.toks[p.i].text == "(" else []}
+    while not p.done() and p.toks[p.i].up in REFERENCE_TAIL:
+        if p.peek("NOT") and not p.peek("NOT", "DEFERRABLE"):
+            break  # NOT NULL of the column
+        if p.accept("ON", "DELETE") or p.accept("ON", "UPDATE"):
+            key = "on_delete" if p.toks[p.i - 1].up == "DELETE" else "on_update"
+            words = [p.next().up]
+            if words[0] in ("SET", "NO"):
+                words.append(p.next().up)
+            ref[key] = " ".join(words).lower()
+        else:
+            p.next()
+    return ref
+
+def parse_column(p: Parser) -> tuple:
+    """column definition -> (column dict, foreign key or None)"""
+    col = {"name": p.name(), "type": p.until(COLUMN_KEYWORDS).lower(), "nullable": True, "default": None}
+    fk = None
+    while not p.done():
+        if p.accept("CONSTRAINT"):
+            p.name()
+        elif p.accept("NOT", "NULL"):
+            col["nullable"] = False
+        elif p.accept("NULL"):
+            col["nullable"] = True
+        elif p.accept("DEFAULT"):
+            col["default"] = p.until(COLUMN_KEYWORDS)
+        elif p.accept("PRIMARY", "KEY"):
+            col["primary_key"] = True
+            col["nullable"] = False
+        elif p.accept("UNIQUE"):
+            col["unique"] = True
+        elif p.accept("REFERENCES"):
+            ref = _references(p)
+            fk = {"columns": [col["name"]], "references": ref["table"], "referenced_columns": ref["columns"] or ["id"],
+                  **{k: v for k, v in ref.items() if k.startswith("on_")}}
+        elif p.accept("CHECK"):
+            col["check"] = p.group().text()
+        elif p.accept("GENERATED"):
+            col["generated"] = p.until(COLUMN_KEYWORDS - {"GENERATED"})
+        else:
+            p.next()
+    return col, fk
+
+def parse_table_constraint(p: Parser) -> dict:
+    name = p.name() if p.accept("CONSTRAINT") else None
+    if p.accept("PRIMARY", "KEY"):
+        c = {"type": "primary_key", "columns": p.names()}
+    elif p.accept("UNIQUE"):
+        c = {"type": "unique", "columns": p.names()}
+    elif p.accept("FOREIGN", "KEY"):
+        cols = p.names()
+        p.accept("REFERENCES")
+        ref = _references(p)
+        c = {"type": "foreign_key", "columns": cols, "references": ref["table"],
+             "referenced_columns": ref["columns"] or ["id"], **{k: v for k, v in ref.items() if k.startswith("on_")}}
+    elif p.accept("CHECK"):
+        c = {"type": "check", "expression": p.group().text()}
+    else:
+        c = {"type": "other", "text": p.text()}
+    if name:
+        c["name"] = name
+    return c
+
+def _create_table(p: Parser) -> dict:
+    op = {"op": "create_table", "if_not_exists": p.accept("IF", "NOT", "EXISTS")}
+    op["table"] = p.name()
+    if p.done() or p.toks[p.i].text != "(":
+        return {"op": "other", "kind": "CREATE TABLE", "text": p.text(0)}  # CREATE TABLE ... AS / PARTITION OF
+    op["columns"], op["constraints"] = [], []
+    for part in p.group().split():
+        if part.toks[part.i].up in TABLE_CONSTRAINTS:
+            op["constraints"].append(parse_table_constraint(part))
+        elif part.peek("LIKE"):
+            op["constraints"].append({"type": "other", "text": part.text()})
+        else:
+            col, fk = parse_column(part)
+            op["columns"].append(col)
+            if fk:
+                op["constraints"].append({"type": "foreign_key", **fk})
+    return op
+
+def _alter_action(p: Parser) -> dict:
+    if p.accept("ENABLE", "ROW", "LEVEL", "SECURITY") or p.accept("FORCE", "ROW", "LEVEL", "SECURITY"):
+        return {"action": "enable_rls"}
+    if p.accept("DISABLE", "ROW", "LEVEL", "SECURITY") or p.accept("NO", "FORCE", "ROW", "LEVEL", "SECURITY"):
+        return {"action": "disable_rls"}
+    if p.accept("RENAME", "TO"):
+        return {"action": "rename_table", "to": p.name()}
+    if p.accept("RENAME", "CONSTRAINT"):
+        return {"action": "other", "text": p.text(p.i - 2)}
+    if p.accept("RENAME"):
+        p.accept("COLUMN")
+        old = p.name()
+        p.accept("TO")
+        return {"action": "rename_column", "column": old, "to": p.name()}
+    if p.peek("ADD") and p.i + 1 < p.hi and p.toks[p.i + 1].up in TABLE_CONSTRAINTS:
+        p.next()
+        return {"action": "add_constraint", "constraint": parse_table_constraint(p)}
+    if p.accept("ADD"):
+        p.accept("COLUMN")
+        if_not_exists = p.accept("IF", "NOT", "EXISTS")
+        col, fk = parse_column(p)
+        return {"action": "add_column", "if_not_exists": if_not_exists, "column": col, "foreign_key": fk}
+    if p.accept("DROP", "CONSTRAINT"):
+        p.accept("IF", "EXISTS")
+        return {"action": "drop_constraint", "name": p.name()}
+    if p.accept("DROP"):
+        p.accept("COLUMN")
+        p.accept("IF", "EXISTS")
+        return {"action": "drop_column", "column": p.name()}
+    if p.accept("ALTER"):
+        p.accept("COLUMN")
+        column = p.name()
+        if p.accept("SET", "DATA", "TYPE") or p.accept("TYPE"):
+            return {"action": "set_type", "column": column, "type": p.until({"USING", "COLLATE"}).lower()}
+        if p.accept("SET", "DEFAULT"):
+            return {"action": "set_default", "column": column, "default": p.text()}
+        if p.accept("DROP", "DEFAULT"):
+            return {"action": "set_default", "column": column, "default": None}
+        if p.accept("SET", "NOT", "NULL"):
+            return {"action": "set_nullable", "column": column, "nullable": False}
+        if p.accept("DROP", "NOT", "NULL"):
+            return {"action": "set_nullable", "column": column, "nullable": True}
+    return {"action": "other", "text": p.text(p.i)}
+
+def _alter_table(p: Parser) -> dict:
+    p.accept("IF", "EXISTS")
+    p.accept("ONLY")
+    table = p.name()
+    return {"op": "alter_table", "table": table, "actions": [_alter_action(a) for a in p.split()]}
+
+def _create_index(p: Parser, unique: bool) -> dict:
+    p.accept("CONCURRENTLY")
+    op = {"op": "create_index", "unique": unique, "if_not_exists": p.accept("IF", "NOT", "EXISTS"), "name": None}
+    if not p.peek("ON"):
+        op["name"] = p.name()
+    p.accept("ON")
+    p.accept("ONLY")
+    op["table"] = p.name()
+    op["method"] = p.next().text.lower() if p.accept("USING") else "btree"
+    op["columns"] = [c.until({"ASC", "DESC", "NULLS", "COLLATE"}) for c in p.group().split()]
+    if p.accept("INCLUDE"):
+        op["include"] = p.names()
+    p.until({"WHERE"})
+    if p.accept("WHERE"):
+        op["where"] = p.text()
+    return op
+
+def _create_policy(p: Parser) -> dict:
+    op = {"op": "create_policy", "name": ident(p.next())}
+    p.accept("ON")
+    op.update(table=p.name(), permissive=True, command="ALL", roles=["public"], using=None, with_check=None)
+    while not p.done():
+        if p.accept("AS"):
+            op["permissive"] = p.next().up == "PERMISSIVE"
+        elif p.accept("FOR"):
+            op["command"] = p.next().up
+        elif p.accept("TO"):
+            op["roles"] = [c.text().lower() for c in Parser(p.src, p.toks, p.i, p.i + _list_len(p)).split()]
+            p.i += _list_len(p)
+        elif p.accept("USING"):
+            op["using"] = p.group().text()
+        elif p.accept("WITH", "CHECK"):
+            op["with_check"] = p.group().text()
+        else:
+            p.next()
+    return op
+
+def _list_len(p: Parser) -> int:
+    # tokens in a "a, b, c" list that ends at the next clause keyword
+    j = p.i
+    while j < p.hi and p.toks[j].up not in {"USING", "WITH"}:
+        j += 1
+    return j - p.i
+
+def _create_function(p: Parser) -> dict:
+    op = {"op": "create_function", "name": p.name()}
+    op["arguments"] = p.group().text() if not p.done() and p.toks[p.i].text == "(" else ""
+    op["returns"] = p.until({"LANGUAGE", "AS", "SECURITY", "STABLE", "IMMUTABLE", "VOLATILE", "SET"}).lower() \
+        if p.accept("RETURNS") else None
+    op["language"] = None
+    while not p.done():
+        if p.accept("LANGUAGE"):
+            op["language"] = unquote(p.next()).lower()
+        elif p.accept("SECURITY", "DEFINER"):
+            op["security_definer"] = True
+        else:
+            p.next()
+    return op
+
+def _create_trigger(p: Parser) -> dict:
+    op = {"op": "create_trigger", "name": p.name()}
+    op["timing"] = "INSTEAD OF" if p.accept("INSTEAD", "OF") else p.next().up
+    events = p.until({"ON"})
+    op["events"] = [e.strip().upper() for e in events.split(" OR ")]
+    p.accept("ON")
+    op["table"] = p.name()
+    op["function"] = None
+    while not p.done():
+        if p.accept("EXECUTE", "FUNCTION") or p.accept("EXECUTE", "PROCEDURE"):
+            op["function"] = p.name()
+        elif p.accept("FOR", "EACH"):
+            op["for_each"] = p.next().up
+        else:
+            p.next()
+    return op
+
+DROP_KINDS = {"TABLE": "table", "INDEX": "index", "POLICY": "policy", "FUNCTION": "function", "TRIGGER": "trigger",
+              "VIEW": "view", "TYPE": "type", "EXTENSION": "extension"}
+
+def _drop(p: Parser) -> dict:
+    p.accept("MATERIALIZED")
+    kind = DROP_KINDS.get(p.next().up)
+    if kind is None:
+        return {"op": "other", "kind": "DROP", "text": p.text(0)}
+    p.accept("CONCURRENTLY")
+    op = {"op": "drop", "kind": kind, "if_exists": p.accept("IF", "EXISTS")}
+    if kind in ("policy", "trigger"):
+        op["names"] = [ident(p.next()) if kind == "policy" else p.name()]
+        p.accept("ON")
+        op["table"] = p.name()
+    else:
+        op["names"] = []
+        op["cascade"] = False
+        for part in p.split():
+            op["names"].append(part.name())
+            part.until({"CASCADE"})
+            op["cascade"] = part.accept("CASCADE") or op["cascade"]
+    return op
+
+def parse_statement(stmt: str) -> dict:
+    p = Parser(stmt)
+    if p.accept("CREATE"):
+        replace = p.accept("OR", "REPLACE")
+        p.accept("UNLOGGED") or p.accept("TEMPORARY") or p.accept("TEMP")
+        if p.accept("TABLE"):
+            return _create_table(p)
+        if p.accept("UNIQUE", "INDEX"):
+            return _create_index(p, True)
+        if p.accept("INDEX"):
+            return _create_index(p, False)
+        if p.accept("POLICY"):
+            return _create_policy(p)
+        if p.accept("FUNCTION") or p.accept("PROCEDURE"):
+            return {**_create_function(p), "replace": replace}
+        if p.accept("TRIGGER") or p.accept("CONSTRAINT", "TRIGGER"):
+            return _create_trigger(p)
+        if p.accept("EXTENSION"):
+            p.accept("IF", "NOT", "EXISTS")
+            return {"op": "create_extension", "name": p.name()}
+        if p.accept("TYPE"):
+            name = p.name()
+            values = [unquote(v.next()) for v in p.group().split()] if p.accept("AS", "ENUM") else None
+            return {"op": "create_type", "name": name, "values": values}
+        if p.accept("MATERIALIZED", "VIEW") or p.accept("VIEW"):
+            p.accept("IF", "NOT", "EXISTS")
+            return {"op": "create_view", "name": p.name()}
+    elif p.accept("ALTER", "TABLE"):
+        return _alter_table(p)
+    elif p.accept("DROP"):
+        return _drop(p)
+    words = [t.up for t in p.toks[:2] if t.kind == "word"]
+    return {"op": "other", "kind": " ".join(words) or "?"}
+
+def parse_migration(text: str) -> dict:
+    """One migration file -> its delta: {"statements": n, "ops": [...]} (JSON-serializable)."""
+    ops = []
+    for stmt in split_statements(text):
+        try:
+            ops.append(parse_statement(stmt))
+        except (ValueError, IndexError) as e:
+            ops.append({"op": "error", "error": str(e), "text": " ".join(stmt.split())[:200]})
+    return {"statements": len(ops), "ops": ops}
+
+# ---- replay ----
+
+class Catalog:
+    """The schema after replaying migration deltas in order."""
+
+    def __init__(self):
+        self.tables = {}
+        self.indexes = {}
+        self.functions = {}
+        self.views = {}
+        self.types = {}
+        self.extensions = {}
+        self.dropped = {}
+        self.warnings = []
+
+    def _warn(self, migration: str, msg: str):
+        self.warnings.append(f"{migration}: {msg}")
+
+    def _history(self, table: str, migration: str, op: str):
+        t = self.tables.get(table)
+        (t["history"] if t is not None else self.dropped.setdefault(table, {"history": []})["history"]).append(
+            {"migration": migration, "op": op})
+
+    def apply(self, migration: str, delta: dict):
+        for op in delta["ops"]:
+            handler = getattr(self, "_" + op["op"], None)
+            if handler is None:
+                continue
+            handler(migration, op)
+
+    def _error(self, migration, op):
+        self._warn(migration, f"unparsed statement: {op['text']} ({op['error']})")
+
+    def _create_table(self, migration, op):
+        name = op["table"]
+        if name in self.tables:
+            if not op["if_not_exists"]:
+                self._warn(migration, f"CREATE TABLE {name}: table already exists")
+            self._history(name, migration, "create_skipped")
+            return
+        prior = self.dropped.pop(name, {"history": []})["history"]
+        t = {"columns": {}, "primary_key": [], "unique": [], "foreign_keys": [], "checks": [],
+             "rls_enabled": False, "policies": {}, "triggers": {}, "defined_in": migration, "history": prior}
+        self.tables[name] = t
+        for col in op["columns"]:
+            self._add_column(t, dict(col))
+        for c in op["constraints"]:
+            self._add_constraint(t, c)
+        self._history(name, migration, "create")
+
+    def _add_column(self, t, col):
+        if col.pop("primary_key", False):
+            t["primary_key"] = [col["name"]]
+        if col.pop("unique", False):
+            t["unique"].append([col["name"]])
+        t["columns"][col["name"]] = col
+
+    def _add_constraint(self, t, c):
+        if c["type"] == "primary_key":
+            t["primary_key"] = list(c["columns"])
+            for name in c["columns"]:
+                if name in t["columns"]:
+                    t["columns"][name]["nullable"] = False
+        elif c["type"] == "unique":
+            t["unique"].append(list(c["columns"]))
+        elif c["type"] == "foreign_key":
+            t["foreign_keys"].append({k: v for k, v in c.items() if k != "type"})
+        elif c["type"] == "check":
+            t["checks"].append(c["expression"])
+
+    def _table(self, migration, name, what):
+        t = self.tables.get(name)
+        if t is None:
+            self._warn(migration, f"{what}: table {name} does not exist")
+        return t
+
+    def _alter_table(self, migration, op):
+        t = self._table(migration, op["table"], "ALTER TABLE")
+        if t is None:
+            return
+        name = op["table"]
+        for a in op["actions"]:
+            kind = a["action"]
+            if kind == "enable_rls":
+                t["rls_enabled"] = True
+            elif kind == "disable_rls":
+                t["rls_enabled"] = False
+            elif kind == "add_column":
+                if a["column"]["name"] in t["columns"]:
+                    if not a["if_not_exists"]:
+                        self._warn(migration, f"ADD COLUMN {name}.{a['column']['name']}: column already exists")
+                    continue
+                self._add_column(t, dict(a["column"]))
+                if a["foreign_key"]:
+                    self._add_constraint(t, {"type": "foreign_key", **a["foreign_key"]})
+            elif kind == "drop_column":
+                t["columns"].pop(a["column"], None)
+                self._drop_indexes(lambda ix: ix["table"] == name and a["column"] in ix["columns"])
+            elif kind in ("set_type", "set_default", "set_nullable"):
+                col = t["columns"].get(a["column"])
+                if col is None:
+                    self._warn(migration, f"ALTER COLUMN {name}.{a['column']}: column does not exist")
+                    continue
+                field = {"set_type": "type", "set_default": "default", "set_nullable": "nullable"}[kind]
+                col[field] = a[field]
+            elif kind == "rename_column":
+                cols = t["columns"]
+                if a["column"] in cols:
+                    t["columns"] = {(a["to"] if k == a["column"] else k): v for k, v in cols.items()}
+                    t["columns"][a["to"]]["name"] = a["to"]
+            elif kind == "rename_table":
+                self.tables[a["to"]] = self.tables.pop(name)
+                for ix in self.indexes.values():
+                    if ix["table"] == name:
+                        ix["table"] = a["to"]
+                name = a["to"]
+            elif kind == "add_constraint":
+                self._add_constraint(t, a["constraint"])
+        self._history(name, migration, "alter")
+
+    def _drop_indexes(self, pred):
+        for n in [n for n, ix in self.indexes.items() if pred(ix)]:
+            del self.indexes[n]
+
+    def _create_index(self, migration, op):
+        # Postgres' own default name: <table>_<columns>_idx
+        name = op["name"] or "_".join([op["table"]] + [re.sub(r"\W+", "_", c) for c in op["columns"]] + ["idx"])
+        if name in self.indexes:
+            if not op["if_not_exists"]:
+                self._warn(migration, f"CREATE INDEX {name}: index already exists")
+            return
+        if self._table(migration, op["table"], f"CREATE INDEX {name}") is None:
+            return
+        ix = {k: op[k] for k in ("table", "columns", "unique", "method")}
+        for k in ("include", "where"):
+            if k in op:
+                ix[k] = op[k]
+        ix["defined_in"] = migration
+        self.indexes[name] = ix
+
+    def _create_policy(self, migration, op):
+        t = self._table(migration, op["table"], f"CREATE POLICY \"{op['name']}\"")
+        if t is None:
+            return
+        if op["name"] in t["policies"]:
+            self._warn(migration, f"CREATE POLICY \"{op['name']}\" on {op['table']}: policy already exists")
+        t["policies"][op["name"]] = {k: op[k] for k in ("command", "roles", "permissive", "using", "with_check")}
+        t["policies"][op["name"]]["defined_in"] = migration
+
+    def _create_trigger(self, migration, op):
+        t = self._table(migration, op["table"], f"CREATE TRIGGER {op['name']}")
+        if t is None:
+            return
+        t["triggers"][op["name"]] = {"timing": op["timing"], "events": op["events"], "for_each": op.get("for_each"),
+                                     "function": op["function"], "defined_in": migration}
+        if op["function"] and op["function"] not in self.functions:
+            self._warn(migration, f"CREATE TRIGGER {op['name']}: function {op['function']} is not defined")
+
+    def _create_function(self, migration, op):
+        if op["name"] in self.functions and not op.get("replace"):
+            self._warn(migration, f"CREATE FUNCTION {op['name']}: function already exists")
+        self.functions[op["name"]] = {"arguments": op["arguments"], "returns": op["returns"],
+                                      "language": op["language"], "defined_in": migration}
+
+    def _create_extension(self, migration, op):
+        self.extensions.setdefault(op["name"], {"defined_in": migration})
+
+    def _create_type(self, migration, op):
+        self.types[op["name"]] = {"values": op["values"], "defined_in": migration}
+
+    def _create_view(self, migration, op):
+        self.views[op["name"]] = {"defined_in": migration}
+
+    def _drop(self, migration, op):
+        kind = op["kind"]
+        for name in op["names"]:
+            if kind == "table":
+                if name not in self.tables:
+                    if not op["if_exists"]:
+                        self._warn(migration, f"DROP TABLE {name}: table does not exist")
+                    continue
+                referencing = sorted(n for n, t in self.tables.items() if n != name
+                                     and any(fk["references"] == name for fk in t["foreign_keys"]))
+                if referencing and not op.get("cascade"):
+                    self._warn(migration, f"DROP TABLE {name}: still referenced by {', '.join(referencing)}")
+                for n in referencing:
+                    t = self.tables[n]
+                    t["foreign_keys"] = [fk for fk in t["foreign_keys"] if fk["references"] != name]
+                history = self.tables.pop(name)["history"]
+                self.dropped[name] = {"history": history}
+                self._history(name, migration, "drop")
+                self._drop_indexes(lambda ix: ix["table"] == name)
+            elif kind in ("policy", "trigger"):
+                t = self.tables.get(op["table"])
+                objs = t[kind + "s"] if t is not None else {}
+                if objs.pop(name, None) is None and not op["if_exists"]:
+                    self._warn(migration, f"DROP {kind.upper()} {name}: does not exist")
+            else:
+                objs = {"index": self.indexes, "function": self.functions, "view": self.views,
+                        "type": self.types, "extension": self.extensions}[kind]
+                if objs.pop(name, None) is None and not op["if_exists"]:
+                    self._warn(migration, f"DROP {kind.upper()} {name}: does not exist")
+
+    def objects(self) -> dict:
+        """Lowercase name -> ["kind:qualified name", ...], for constant-time matching."""
+        out = {}
+
+        def add(key, ref):
+            refs = out.setdefault(key.lower(), [])
+            if ref not in refs:
+                refs.append(ref)
+
+        for tname, t in self.tables.items():
+            add(tname, f"table:{tname}")
+            for c in t["columns"]:
+                add(f"{tname}.{c}", f"column:{tname}.{c}")
+                if "_" in c:
+                    add(c, f"column:{tname}.{c}")
+            for trig in t["triggers"]:
+                add(trig, f"trigger:{tname}.{trig}")
+        for kind, objs in (("index", self.indexes), ("function", self.functions), ("view", self.views),
+                           ("type", self.types)):
+            for name in objs:
+                add(name, f"{kind}:{name}")
+        return out
+
+    def to_json(self, migrations: list) -> dict:
+        tables = {}
+        for name, t in self.tables.items():
+            tables[name] = {
+                **{k: v for k, v in t.items() if k not in ("columns", "policies", "triggers", "history")},
+                "columns": list(t["columns"].values()),
+                "indexes": sorted(n for n, ix in self.indexes.items() if ix["table"] == name),
+                "policies": [{"name": n, **p} for n, p in t["policies"].items()],
+                "triggers": [{"name": n, **tr} for n, tr in t["triggers"].items()],
+                "history": t["history"],
+            }
+        return {
+            "catalog_version": CATALOG_VERSION,
+            "migrations": migrations,
+            "tables": tables,
+            "indexes": self.indexes,
+            "functions": self.functions,
+            "views": self.views,
+            "types": self.types,
+            "extensions": self.extensions,
+            "dropped": self.dropped,
+            "objects": self.objects(),
+            "warnings": self.warnings,
+        }
+
+def migration_files(root: Path, migrations_dir: Path = MIGRATIONS_DIR) -> list:
+    """(Path, rel) of the *.sql migrations in timestamp (file name) order."""
+    d = root / migrations_dir
+    if not d.is_dir():
+        return []
+    return [(p, p.relative_to(root).as_posix()) for p in sorted(d.glob("*.sql"), key=lambda p: p.name)]
+
+@perf_trace.traced("db_catalog.build")
+def build_catalog(root: Path, cache: FileFactCache = None, migrations_dir: Path = MIGRATIONS_DIR) -> dict:
+    """Replays every migration's (cached) delta into a Catalog; returns db_catalog.json's content."""
+    cat = Catalog()
+    migrations = []
+    for p, rel in migration_files(root, migrations_dir):
+        if cache is not None:
+            delta = cache.get(p, rel, "migration_delta", parse_migration)
+        else:
+            delta = parse_migration(p.read_text(encoding="utf-8-sig", errors="replace"))
+        cat.apply(rel, delta)
+        counts = {}
+        for op in delta["ops"]:
+            counts[op["op"]] = counts.get(op["op"], 0) + 1
+        migrations.append({"file": rel, "statements": delta["statements"], "ops": counts})
+    return cat.to_json(migrations)
+
+# ---- matching ----
+
+WORD_RE = re.compile(r"[a-z_][a-z0-9_]*(?:\.[a-z_][a-z0-9_]*)?")
+
+# Kinds a single plain word may name; columns need an underscore or a table qualifier.
+WORD_KINDS = ("table:", "view:", "type:")
+
+class SchemaMatcher:
+    """
+    Finds the schema objects a requirement's text names. Every candidate (a word, a
+    snake_case join of 2-3 adjacent words, a simple singular/plural) is one dict lookup in
+    the catalog's `objects` map, so the cost depends on the text, not on the schema size.
+    """
+
+    def __init__(self, catalog: dict):
+        self.objects = catalog.get("objects") or {}
+
+    @classmethod
+    def load(cls, path: Path = OUT_JSON):
+        """None when there is no db_catalog.json yet."""
+        try:
+            return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            return None
+
+    def _refs(self, key: str, plain: bool):
+        refs = self.objects.get(key, ())
+        return [r for r in refs if r.startswith(WORD_KINDS)] if plain else refs
+
+    def match(self, text: str) -> list:
+        words = WORD_RE.findall(text.lower())
+        found = {}
+        for i, w in enumerate(words):
+            plain = "_" not in w and "." not in w
+            cands = [w]
+            if plain:
+                cands += [w + "s", w + "es"] + ([w[:-1]] if w.endswith("s") else [])
+            for n in (2, 3):
+                if i + n <= len(words):
+                    cands.append("_".join(words[i:i + n]))
+            for c in cands:
+                for r in self._refs(c, plain and c in (w, w + "s", w + "es", w[:-1])):
+                    found.setdefault(r, None)
+        return sorted(found)
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay SQL migrations into a schema catalog (AgentInput/db_catalog.json).")
+    ap.add_argument("--migrations", default=str(MIGRATIONS_DIR), help="Migrations directory, relative to the repo root")
+    ap.add_argument("--out", default=str(OUT_JSON))
+    ap.add_argument("--match", metavar="TEXT", help="Print the schema objects TEXT names (after building).")
+    args = ap.parse_args()
+
+    cache = FileFactCache.from_env(ROOT)
+    catalog = build_catalog(ROOT, cache, Path(args.migrations))
+    cache.save()
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(catalog, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"Wrote: {out}")
+    print(f"Catalog: {len(catalog['migrations'])} migration(s), {len(catalog['tables'])} table(s), "
+          f"{len(catalog['indexes'])} index(es), {sum(len(t['policies']) for t in catalog['tables'].values())} "
+          f"polic(ies), {len(catalog['functions'])} function(s)")
+    for w in catalog["warnings"]:
+        print(f"WARN: {w}")
+    if args.match:
+        for ref in SchemaMatcher(catalog).match(args.match):
+            print(ref)
+    if cache.enabled:
+        print(cache.summary())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(perf_trace.run("db_catalog", main))
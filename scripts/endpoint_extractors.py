@@ -0,0 +1,211 @@
+import argparse, os, re, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+from file_fact_cache import MISS, decode_text
+import perf_trace
+from scan_reader import ScanLimits, extract_file, is_ascii, lookup_facts, store_facts
+
+HTTP_METHODS = r"get|post|put|delete|patch"
+
+class RouteGrammar:
+    """
+    One route syntax. `pattern` is a regex fragment whose named groups are prefixed with
+    the grammar name; on_match() turns a match into (method, path) pairs. `state` is a
+    per-file dict shared by all grammars (e.g. the current NestJS controller prefix).
+    `lead` lists every character a match can start with; the scanner uses it as a cheap
+    lookahead so most text positions are rejected without trying each alternative.
+    """
+    name = ""
+    pattern = ""
+    lead = ""
+
+    def on_match(self, m, state):
+        return []
+
+class ExpressGrammar(RouteGrammar):
+    # Express app/Router and Koa router: app.get('/x', ...), router.post("/y", ...)
+    name = "express"
+    lead = "aArR"
+    pattern = rf"(?i:\b(?:app|router)\.(?P<express_m>{HTTP_METHODS})\s*\(\s*['\"](?P<express_p>[^'\"]+)['\"])"
+
+    def on_match(self, m, state):
+        return [(m.group("express_m").upper(), m.group("express_p"))]
+
+class FastifyGrammar(RouteGrammar):
+    name = "fastify"
+    lead = "fF"
+    pattern = rf"(?i:\bfastify\.(?P<fastify_m>{HTTP_METHODS})\s*\(\s*['\"](?P<fastify_p>[^'\"]+)['\"])"
+
+    def on_match(self, m, state):
+        return [(m.group("fastify_m").upper(), m.group("fastify_p"))]
+
+class NestControllerGrammar(RouteGrammar):
+    # @Controller(), @Controller('drivers'), @Controller({ path: 'drivers' })
+    name = "nestctl"
+    lead = "@"
+    pattern = r"@Controller\s*\(\s*(?:\{[^})]*?\bpath\s*:\s*)?(?:['\"](?P<nestctl_p>[^'\"]*)['\"])?"
+
+    def on_match(self, m, state):
+        state["nest_prefix"] = m.group("nestctl_p") or ""
+        return []
+
+class NestRouteGrammar(RouteGrammar):
+    # @Get(), @Post('auth/login') ... only counted inside a file that declared a @Controller
+    name = "nestroute"
+    lead = "@"
+    pattern = r"@(?P<nestroute_m>Get|Post|Put|Delete|Patch|Options|Head|All)\s*\(\s*(?:['\"](?P<nestroute_p>[^'\"]*)['\"])?\s*\)"
+
+    def on_match(self, m, state):
+        if "nest_prefix" not in state:
+            return []
+        parts = [x.strip("/") for x in (state["nest_prefix"], m.group("nestroute_p") or "")]
+        return [(m.group("nestroute_m").upper(), "/" + "/".join(x for x in parts if x))]
+
+DEFAULT_GRAMMARS = [ExpressGrammar(), FastifyGrammar(), NestControllerGrammar(), NestRouteGrammar()]
+
+class RouteScanner:
+    """All grammars merged into one alternation, so each file is scanned in a single pass."""
+
+    def __init__(self, grammars=None):
+        self.grammars = {g.name: g for g in (grammars or DEFAULT_GRAMMARS)}
+        alts = "|".join(f"(?P<{name}>{g.pattern})" for name, g in self.grammars.items())
+        if all(g.lead for g in self.grammars.values()):
+            lead = "".join(sorted({c for g in self.grammars.values() for c in g.lead}))
+            alts = f"(?=[{re.escape(lead)}])(?:{alts})"
+        self.regex = re.compile(alts)
+        # On ASCII input a bytes regex matches like the str one, except that str \s also
+        # matches the \x1c-\x1f separators.
+        self.bytes_regex = re.compile(alts.replace(r"\s", r"[\s\x1c-\x1f]").encode("ascii"))
+
+    def _routes(self, matches):
+        routes = []
+        state = {}
+        for m in matches:
+            for method, path in self.grammars[m.lastgroup].on_match(m, state):
+                routes.append([method, path])
+        return routes
+
+    def scan(self, text: str):
+        return self._routes(self.regex.finditer(text))
+
+    def scan_buffer(self, buf):
+        """
+        scan() of a file's raw bytes. ASCII buffers are matched with the bytes regex and
+        only the captured groups are decoded; anything else is decoded and scanned as text.
+        """
+        if not is_ascii(buf):
+            return self.scan(decode_text(bytes(buf)))
+        decode = decode_text if buf.find(b"\r") >= 0 else bytes.decode
+        return self._routes(_DecodedMatch(m, decode) for m in self.bytes_regex.finditer(buf))
+
+class _DecodedMatch:
+    """A bytes match whose groups read like those of the equivalent str match."""
+    __slots__ = ("m", "decode", "lastgroup")
+
+    def __init__(self, m, decode):
+        self.m = m
+        self.decode = decode
+        self.lastgroup = m.lastgroup
+
+    def group(self, name):
+        g = self.m.group(name)
+        return None if g is None else self.decode(g)
+
+SCANNER = RouteScanner()
+
+def extract_routes(text: str):
+    return SCANNER.scan(text)
+
+def extract_routes_buffer(buf):
+    return SCANNER.scan_buffer(buf)
+
+def _extract_file(path: str, limits: ScanLimits):
+    # worker side: returns (routes, sniff verdict, sha256, size, mtime_ns) so the parent can fill the cache
+    return extract_file(path, extract_routes_buffer, limits)
+
+def default_workers() -> int:
+    v = os.getenv("SCAN_WORKERS", "")
+    return int(v) if v.strip() else (os.cpu_count() or 1)
+
+# Below this many uncached files the process pool costs more than it saves.
+PARALLEL_MIN_FILES = 64
+
+def extract_many(files, cache=None, workers: int = None):
+    """
+    files: list of (Path, rel). Returns {rel: [[method, path], ...]} for every readable file
+    that scan_reader does not skip. Cached files are answered in-process; the rest are
+    fanned out over a process pool.
+    """
+    with perf_trace.span("extract_endpoints") as s:
+        out = _extract_many(files, cache, default_workers() if workers is None else workers)
+        s.set(files=len(files), files_with_routes=sum(1 for r in out.values() if r))
+    return out
+
+def _extract_many(files, cache, workers: int):
+    out = {}
+    todo = []
+    limits = ScanLimits.from_env()
+    for p, rel in files:
+        try:
+            hit = lookup_facts(p, rel, "endpoints", extract_routes_buffer, cache, limits)
+        except OSError:
+            continue
+        if hit is MISS:
+            todo.append((p, rel))
+        elif hit is not None:
+            out[rel] = hit
+
+    if workers > 1 and len(todo) >= PARALLEL_MIN_FILES:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_extract_file, [str(p) for p, _ in todo], repeat(limits, len(todo)),
+                                  chunksize=max(1, len(todo) // (workers * 8))))
+    else:
+        results = [_extract_file(str(p), limits) for p, _ in todo]
+
+    for (p, rel), res in zip(todo, results):
+        if res is None:
+            continue
+        routes = store_facts(cache, rel, "endpoints", extract_routes_buffer, res, limits)
+        if routes is not None:
+            out[rel] = routes
+            perf_trace.count("route_matches", len(routes))
+    return out
+
+def _bench(n_files: int, max_workers: int):
+    body = "\n".join(
+        [f"router.get('/r{i}/:id', h);\napp.post(\"/a{i}\", h);\nconst x{i} = {i};" for i in range(40)]
+        + ["@Controller('bench')", "class C {", "  @Get(':id')", "  get() {}", "}"]
+        + ["// filler " + "x" * 120] * 200
+    )
+    with tempfile.TemporaryDirectory() as td:
+        files = []
+        for i in range(n_files):
+            p = Path(td) / f"f{i}.ts"
+            p.write_text(body, encoding="utf-8")
+            files.append((p, p.name))
+        counts = sorted({1, 2, 4, 8, 16, max_workers} & set(range(1, max_workers + 1)))
+        base = None
+        print(f"endpoint extraction: {n_files} files, {len(body)} bytes each")
+        for w in counts:
+            t0 = time.perf_counter()
+            r = extract_many(files, workers=w)
+            dt = time.perf_counter() - t0
+            base = base or dt
+            print(f"  workers={w:<3} {dt:7.3f}s  {n_files/dt:9.0f} files/s  speedup x{base/dt:.2f}  routes={sum(len(v) for v in r.values())}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Endpoint extractor benchmark (synthetic files).")
+    ap.add_argument("--bench", action="store_true", help="Run the worker-count benchmark.")
+    ap.add_argument("--files", type=int, default=2000)
+    ap.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+    if not args.bench:
+        ap.print_help()
+        return 0
+    _bench(args.files, args.max_workers)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(perf_trace.run("endpoint_extractors", main))
@@ -0,0 +1,135 @@
+import hashlib, json, os, time
+from pathlib import Path
+
+from file_fact_cache import sha256_file
+
+# Bump when the on-disk layout changes; old caches are discarded wholesale.
+CACHE_VERSION = 1
+
+DEFAULT_PATH = Path("Artifacts") / "eval_result_cache.json"
+DEFAULT_MAX_MB = 16
+DEFAULT_MAX_AGE_DAYS = 30
+
+def _canonical(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",",":")).encode("utf-8")
+
+def requirement_hash(req: dict) -> str:
+    return hashlib.sha256(_canonical(req)).hexdigest()
+
+def evidence_hashes(root: Path, paths) -> list:
+    """[[rel, sha256], ...] for each evidence path; unreadable files hash as "missing"."""
+    out = []
+    for rel in paths:
+        try:
+            out.append([rel, sha256_file(root / rel)])
+        except OSError:
+            out.append([rel, "missing"])
+    return out
+
+def result_key(*, req: dict, evidence: list, prompt_version: str, model: str, statuses: list, scan_mode: str) -> str:
+    """
+    Everything that feeds the prompt: the requirement record, the content of each evidence
+    file, the template version, the allowed statuses and whether snippets are included.
+    Paths are repo-relative, so keys are stable across checkouts and CI runners.
+    """
+    return hashlib.sha256(_canonical({
+        "prompt_version": prompt_version,
+        "model": model,
+        "requirement": requirement_hash(req),
+        "evidence": evidence,
+        "statuses": list(statuses),
+        "scan_mode": scan_mode,
+    })).hexdigest()
+
+class EvalResultCache:
+    """
+    Persistent cache of model answers per requirement, keyed by result_key(). A hit is
+    replayed into the scan output without calling the model. Entries unused for
+    `max_age_days` are dropped on save, then the least recently used ones until the file
+    fits in `max_bytes`. The file is plain JSON, meant to be carried between CI runs as a
+    cache artifact.
+    """
+
+    def __init__(self, path: Path = None, max_bytes: int = None, max_age_days: float = None, enabled: bool = True):
+        self.path = Path(path) if path else None
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_MB * 1024 * 1024
+        self.max_age_days = max_age_days if max_age_days is not None else DEFAULT_MAX_AGE_DAYS
+        self.enabled = enabled and self.path is not None
+        self.entries = {}
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+        self._dirty = False
+
+    @classmethod
+    def from_env(cls, root: Path):
+        """
+        EVAL_CACHE=0 disables the cache, any other value overrides the cache path.
+        EVAL_CACHE_MAX_MB and EVAL_CACHE_MAX_AGE_DAYS bound what is kept.
+        """
+        setting = os.getenv("EVAL_CACHE", "")
+        if setting.strip().lower() in {"0","off","false","no"}:
+            return cls(enabled=False)
+        path = Path(setting) if setting.strip() else root / DEFAULT_PATH
+        max_mb = float(os.getenv("EVAL_CACHE_MAX_MB", DEFAULT_MAX_MB) or DEFAULT_MAX_MB)
+        max_age = float(os.getenv("EVAL_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS) or DEFAULT_MAX_AGE_DAYS)
+        return cls.load(path, max_bytes=int(max_mb * 1024 * 1024), max_age_days=max_age)
+
+    @classmethod
+    def load(cls, path: Path, max_bytes: int = None, max_age_days: float = None):
+        c = cls(path, max_bytes=max_bytes, max_age_days=max_age_days)
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except Exception:
+            data = None
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+            c.entries = data.get("entries") or {}
+        return c
+
+    def get(self, key: str):
+        """Cached answer dict (status, evidence, gaps, notes) or None."""
+        e = self.entries.get(key) if self.enabled else None
+        if e is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        e["used"] = int(time.time())
+        self._dirty = True
+        return dict(e["answer"])
+
+    def put(self, key: str, requirement_id: str, answer: dict):
+        if not self.enabled:
+            return
+        now = int(time.time())
+        self.entries[key] = {"requirement_id": requirement_id, "answer": answer, "created": now, "used": now}
+        self.stats["stored"] += 1
+        self._dirty = True
+
+    def _evict(self):
+        cutoff = time.time() - self.max_age_days * 86400
+        for k in [k for k, e in self.entries.items() if e.get("used", 0) < cutoff]:
+            del self.entries[k]
+            self.stats["evicted"] += 1
+        sizes = {k: len(_canonical(v)) + len(k) for k, v in self.entries.items()}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for k in sorted(self.entries, key=lambda k: (self.entries[k].get("used", 0), k)):
+            if total <= self.max_bytes:
+                break
+            total -= sizes[k]
+            del self.entries[k]
+            self.stats["evicted"] += 1
+
+    def save(self):
+        if not self.enabled or not self._dirty:
+            return
+        self._evict()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": CACHE_VERSION, "entries": self.entries},
+                                  ensure_ascii=False, separators=(",",":")), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def summary(self) -> str:
+        s = self.stats
+        return f"eval-result cache: hits={s['hits']} misses={s['misses']} stored={s['stored']} evicted={s['evicted']}"
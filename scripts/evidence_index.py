@@ -0,0 +1,120 @@
+import os, re
+from collections import Counter
+from pathlib import Path
+
+import perf_trace
+from file_fact_cache import decode_text
+from scan_reader import ScanLimits, is_ascii, read_facts
+
+# Search within common code/config extensions only
+EVIDENCE_EXTS = {".ts",".tsx",".js",".jsx",".md",".json",".yml",".yaml",".sql",".prisma"}
+SKIP_DIRS = {"node_modules",".git",".next","dist","build","out",".turbo",".cache","coverage"}
+# The pipeline's own outputs (scans, catalogs, benches, previous status verdicts) are never
+# evidence: repo-relative directory prefixes, skipped outright rather than down-weighted.
+GENERATED_DIRS = ("Artifacts/", "AgentInput/", "AgentOutput/", "Agentic AI Work/AgentOutput/")
+
+def is_generated(rel: str) -> bool:
+    return rel.startswith(GENERATED_DIRS)
+
+# Index terms are the lowercased runs of the characters seed_status.tokenize() keeps;
+# evidence_rank.tokens_of() maps each run to the whole query tokens it stands for.
+RUN_RE = re.compile(r"[a-z0-9\-\_]+")
+
+def term_counts(text: str) -> dict:
+    counts = {}
+    for t in RUN_RE.findall(text.lower()):
+        counts[t] = counts.get(t, 0) + 1
+    return counts
+
+RUN_BYTES_RE = re.compile(rb"[A-Za-z0-9\-\_]+")
+
+# The only non-ASCII characters whose lowercase form is ASCII: U+0130 -> "i\u0307" and
+# U+212A (Kelvin sign) -> "k". Buffers containing them take the decoding path.
+FOLDS_TO_ASCII = re.compile("\u0130|\u212a".encode("utf-8"))
+
+def buffer_term_counts(buf) -> dict:
+    """term_counts() of a file's bytes without decoding the file."""
+    if not is_ascii(buf) and FOLDS_TO_ASCII.search(buf):
+        return term_counts(decode_text(bytes(buf)))
+    return {t.decode("ascii"): n for t, n in Counter(map(bytes.lower, RUN_BYTES_RE.findall(buf))).items()}
+
+def iter_evidence_files(repo_root: Path):
+    for dp, dns, fns in os.walk(repo_root):
+        base = str(Path(dp).relative_to(repo_root)).replace("\\","/")
+        base = "" if base == "." else base + "/"
+        dns[:] = [d for d in dns if d not in SKIP_DIRS and not is_generated(base + d + "/")]
+        for fn in fns:
+            if Path(fn).suffix.lower() not in EVIDENCE_EXTS:
+                continue
+            p = Path(dp) / fn
+            yield p, base + fn
+
+class EvidenceIndex:
+    """
+    Inverted index over the repo, built in one pass: term -> {file_id: count}, plus each
+    file's term count. evidence_rank.BM25Ranker scores queries over it by whole tokens.
+    """
+
+    def __init__(self):
+        self.files = []      # file_id -> repo-relative path
+        self.postings = {}   # term -> {file_id: count}
+        self.lengths = []    # file_id -> number of terms
+
+    def add(self, rel: str, counts: dict):
+        fid = len(self.files)
+        self.files.append(rel)
+        self.lengths.append(sum(counts.values()))
+        for t, n in counts.items():
+            self.postings.setdefault(t, {})[fid] = n
+
+    def remove(self, drop) -> int:
+        """
+        Removes every file whose path satisfies `drop(rel)`; returns how many went. File ids
+        stay dense: the highest surviving ids move into the holes. One sweep over the
+        postings, so batch removals together.
+        """
+        gone = [fid for fid, rel in enumerate(self.files) if drop(rel)]
+        if not gone:
+            return 0
+        keep_n = len(self.files) - len(gone)
+        gone_set = set(gone)
+        holes = [fid for fid in gone if fid < keep_n]
+        movers = [fid for fid in range(keep_n, len(self.files)) if fid not in gone_set]
+        moves = list(zip(movers, holes))
+        for t in list(self.postings):
+            d = self.postings[t]
+            for fid in gone:
+                d.pop(fid, None)
+            for old, new in moves:
+                if old in d:
+                    d[new] = d.pop(old)
+            if not d:
+                del self.postings[t]
+        for old, new in moves:
+            self.files[new] = self.files[old]
+            self.lengths[new] = self.lengths[old]
+        del self.files[keep_n:]
+        del self.lengths[keep_n:]
+        return len(gone)
+
+    def add_files(self, files, cache=None):
+        """Indexes (path, rel) pairs; unreadable and skipped (see scan_reader) files are left out."""
+        own = cache.path.resolve() if cache is not None and cache.path else None
+        limits = ScanLimits.from_env()
+        for p, rel in files:
+            if own is not None and p == own:
+                continue  # never index the cache itself
+            try:
+                counts = read_facts(p, rel, "terms", buffer_term_counts, cache, limits)
+            except Exception:
+                continue
+            if counts is not None:
+                self.add(rel, counts)
+
+    @classmethod
+    @perf_trace.traced("evidence_index.build")
+    def build(cls, repo_root: Path, cache=None):
+        idx = cls()
+        idx.add_files(iter_evidence_files(repo_root), cache)
+        return idx
+
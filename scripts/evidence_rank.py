@@ -0,0 +1,217 @@
+import argparse, heapq, math, os, random, re, time
+
+import perf_trace
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python scoring gives the same ranking, just slower
+    np = None
+
+# Multiplicative score boosts by path prefix (longest prefix wins): implementation
+# directories rank ahead of requirements prose and agent working notes. The pipeline's
+# generated outputs are not indexed at all (evidence_index.GENERATED_DIRS).
+DEFAULT_DIR_BOOSTS = {
+    "services/": 2.0,
+    "apps/": 2.0,
+    "supabase/migrations/": 2.0,
+    "supabase/": 1.5,
+    "Requirements/": 0.5,
+    "Agentic AI Work/": 0.5,
+}
+
+K1 = 1.2
+B = 0.75
+
+# Dense score rows scored per batch: rows * files stays around 4M floats (32 MB).
+BATCH_CELLS = 4_000_000
+
+SPLIT_RE = re.compile(r"[-_]+")
+
+def dir_boosts_from_env() -> dict:
+    """
+    EVIDENCE_DIR_BOOSTS="services/=2,apps/=2,Requirements/=0.5" replaces the defaults;
+    "0"/"off" disables boosting.
+    """
+    setting = os.getenv("EVIDENCE_DIR_BOOSTS", "").strip()
+    if not setting:
+        return dict(DEFAULT_DIR_BOOSTS)
+    if setting.lower() in {"0","off","false","no"}:
+        return {}
+    out = {}
+    for part in setting.split(","):
+        prefix, _, value = part.partition("=")
+        if prefix.strip() and value.strip():
+            out[prefix.strip()] = float(value)
+    return out
+
+def tokens_of(term: str) -> list:
+    """
+    Query tokens an index term (a [a-z0-9_-] run) stands for: the run as
+    seed_status.tokenize() would emit it, plus its -/_ separated parts, all 3+ chars.
+    "trip_planner" -> ["trip_planner", "trip", "planner"]; "strip" never yields "trip".
+    """
+    full = term.lstrip("-_")
+    if len(full) < 3:
+        return []
+    out = [full]
+    for p in SPLIT_RE.split(full):
+        if len(p) >= 3 and p != full and p not in out:
+            out.append(p)
+    return out
+
+class BM25Ranker:
+    """
+    BM25 ranking over an EvidenceIndex. The index postings are the sparse term-document
+    matrix; a token's weighted column is built once on first use. rank() scores a whole
+    batch of keyword queries against every file at once (scatter-add of the query terms'
+    columns into a dense block, i.e. the query x term x document product) and returns
+    the top files per query with their scores.
+    """
+
+    def __init__(self, index, boosts: dict = None, k1: float = K1, b: float = B):
+        self.index = index
+        self.k1 = k1
+        self.b = b
+        self.boosts = DEFAULT_DIR_BOOSTS if boosts is None else boosts
+        n = len(index.files)
+        self.avgdl = (sum(index.lengths) / n) if n else 0.0
+        self._token_terms = None
+        self._columns = {}
+        self._dl = None
+        # longest prefixes first, so the first alternative that matches is the longest
+        prefixes = sorted(self.boosts, key=len, reverse=True)
+        self._boost_re = re.compile("|".join(map(re.escape, prefixes))) if prefixes else None
+        self._boost = [self.boost_for(rel) for rel in index.files]
+
+    def boost_for(self, rel: str) -> float:
+        m = self._boost_re.match(rel) if self._boost_re is not None else None
+        return self.boosts[m.group(0)] if m else 1.0
+
+    def _map_tokens(self):
+        tt = {}
+        for term in self.index.postings:
+            for tok in tokens_of(term):
+                tt.setdefault(tok, []).append(term)
+        self._token_terms = tt
+
+    def warm(self):
+        """Builds the token -> terms map now rather than on the first query."""
+        if self._token_terms is None:
+            self._map_tokens()
+        return self
+
+    def column(self, token: str):
+        """(file ids, BM25 weights) of `token`, ascending by file id."""
+        col = self._columns.get(token)
+        if col is not None:
+            return col
+        if self._token_terms is None:
+            self._map_tokens()
+        tf = {}
+        for term in self._token_terms.get(token, ()):
+            for fid, n in self.index.postings[term].items():
+                tf[fid] = tf.get(fid, 0) + n
+        fids = sorted(tf)
+        n_docs = len(self.index.files)
+        idf = math.log(1.0 + (n_docs - len(fids) + 0.5) / (len(fids) + 0.5))
+        k1, b, avgdl, dl = self.k1, self.b, self.avgdl or 1.0, self.index.lengths
+        if np is not None:
+            f = np.asarray(fids, dtype=np.int64)
+            t = np.asarray([tf[i] for i in fids], dtype=np.float64)
+            if self._dl is None:
+                self._dl = np.asarray(dl, dtype=np.float64)
+            d = self._dl[f]
+            w = idf * (t * (k1 + 1.0)) / (t + k1 * (1.0 - b + b * d / avgdl))
+            col = (f, w)
+        else:
+            col = (fids, [idf * (tf[i] * (k1 + 1.0)) / (tf[i] + k1 * (1.0 - b + b * dl[i] / avgdl)) for i in fids])
+        self._columns[token] = col
+        return col
+
+    @perf_trace.traced("bm25.rank")
+    def rank(self, queries, limit: int = 6) -> list:
+        """
+        For each keyword list in `queries`: up to `limit` (path, score) pairs, best first;
+        equal scores order by path. Files matching no keyword are never returned.
+        """
+        queries = [sorted(set(q)) for q in queries]
+        if not self.index.files:
+            return [[] for _ in queries]
+        if np is not None:
+            return self._rank_numpy(queries, limit)
+        return [self._rank_one(q, limit) for q in queries]
+
+    def _top(self, scores, limit):
+        files = self.index.files
+        return [(files[fid], s) for fid, s in
+                heapq.nsmallest(limit, scores, key=lambda fs: (-fs[1], files[fs[0]]))]
+
+    def _rank_one(self, q, limit):
+        acc = {}
+        for tok in q:
+            fids, ws = self.column(tok)
+            for fid, w in zip(fids, ws):
+                acc[fid] = acc.get(fid, 0.0) + w
+        boost = self._boost
+        return self._top([(fid, s * boost[fid]) for fid, s in acc.items() if s * boost[fid] > 0], limit)
+
+    def _rank_numpy(self, queries, limit):
+        nf = len(self.index.files)
+        boost = np.asarray(self._boost, dtype=np.float64)
+        rows = max(1, BATCH_CELLS // nf)
+        out = []
+        for lo in range(0, len(queries), rows):
+            batch = queries[lo:lo + rows]
+            idx, val = [], []
+            for r, q in enumerate(batch):
+                for tok in q:
+                    f, w = self.column(tok)
+                    idx.append(f + r * nf)
+                    val.append(w)
+            if not idx:
+                out.extend([] for _ in batch)
+                continue
+            dense = np.bincount(np.concatenate(idx), weights=np.concatenate(val),
+                                minlength=len(batch) * nf).reshape(len(batch), nf) * boost
+            for row in dense:
+                hit = np.flatnonzero(row > 0)
+                if len(hit) > limit:
+                    # everything tied with the limit-th best survives, so ties break by path
+                    kth = np.partition(row[hit], len(hit) - limit)[len(hit) - limit]
+                    hit = hit[row[hit] >= kth]
+                out.append(self._top([(int(i), float(row[i])) for i in hit], limit))
+        return out
+
+def _bench(n_files: int, n_queries: int, vocab: int = 200_000, seed: int = 7):
+    from evidence_index import EvidenceIndex
+    rnd = random.Random(seed)
+    words = [f"word{i}" + ("_part" if i % 9 == 0 else "") for i in range(vocab)]
+    cum, acc = [], 0.0
+    for i in range(vocab):
+        acc += 1.0 / (i + 1)  # Zipf-like term frequencies
+        cum.append(acc)
+    t0 = time.perf_counter()
+    idx = EvidenceIndex()
+    dirs = ["services/", "apps/", "supabase/migrations/", "Requirements/", "docs/"]
+    for i in range(n_files):
+        counts = {}
+        for w in rnd.choices(words, cum_weights=cum, k=rnd.randint(20, 400)):
+            counts[w] = counts.get(w, 0) + 1
+        idx.add(f"{dirs[i % len(dirs)]}f{i}.ts", counts)
+    t1 = time.perf_counter()
+    queries = [[w.split("_")[0] for w in rnd.choices(words[:20000], k=10)] for _ in range(n_queries)]
+    ranker = BM25Ranker(idx)
+    res = ranker.rank(queries)
+    t2 = time.perf_counter()
+    print(f"files={n_files} queries={n_queries} backend={'numpy' if np is not None else 'python'}")
+    print(f"index_build_s={t1 - t0:.2f} rank_s={t2 - t1:.2f} top1={res[0][:1]}")
+
+def main():
+    ap = argparse.ArgumentParser(description="BM25 evidence ranking (benchmark).")
+    ap.add_argument("--bench", type=int, default=50000, metavar="FILES", help="Synthetic corpus size")
+    ap.add_argument("--queries", type=int, default=500, help="Synthetic requirements to rank")
+    args = ap.parse_args()
+    _bench(args.bench, args.queries)
+
+if __name__ == "__main__":
+    perf_trace.run("evidence_rank", main)
@@ -0,0 +1,236 @@
+import hashlib, inspect, json, os, time
+from pathlib import Path
+
+import file_lock
+import perf_trace
+
+# Bump when the on-disk layout changes; old caches are discarded wholesale.
+CACHE_VERSION = 1
+
+DEFAULT_PATH = Path("Artifacts") / "file_fact_cache.json"
+DEFAULT_MAX_MB = 64
+
+# Files modified this close to when they were cached can change again without a
+# visible size/mtime change (coarse filesystem timestamps), so verify those by sha256.
+RACY_WINDOW_NS = 2_000_000_000
+
+def sha256_file(p: Path) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def extractor_fingerprint(fn) -> str:
+    """
+    Hash of the source file that defines `fn`, so editing an extractor (or anything it
+    relies on in the same module) invalidates the facts it produced.
+    """
+    h = hashlib.sha256(f"{CACHE_VERSION}:{fn.__module__}.{fn.__qualname__}".encode("utf-8"))
+    try:
+        h.update(Path(inspect.getsourcefile(fn)).read_bytes())
+    except (TypeError, OSError):
+        h.update(inspect.getsource(fn).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+# lookup() result for "not cached" (None is a legitimate fact value)
+MISS = object()
+
+def decode_text(data: bytes) -> str:
+    # same result as Path.read_text(errors="replace"), including universal newlines
+    return data.decode("utf-8", errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+
+class FileFactCache:
+    """
+    Persistent per-file cache of extracted facts (tokens, endpoints, package metadata).
+
+    Entries are keyed by repo-relative path and validated by size + mtime, falling back to
+    sha256 when the stat differs (e.g. fresh CI checkout) or is too recent to trust.
+    Facts are stored per kind together with the fingerprint of the extractor that made them.
+    """
+
+    def __init__(self, path: Path = None, max_bytes: int = None, enabled: bool = True):
+        self.path = Path(path) if path else None
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_MB * 1024 * 1024
+        self.enabled = enabled and self.path is not None
+        self.entries = {}
+        self.extractors = {}
+        self.generation = 0
+        self.stats = {"hits": 0, "misses": 0, "rehashed": 0, "evicted": 0}
+        self._dirty = False
+        self._checked = {}
+
+    @classmethod
+    def from_env(cls, root: Path):
+        """
+        FILE_FACT_CACHE=0 disables the cache, any other value overrides the cache path.
+        FILE_FACT_CACHE_MAX_MB bounds the file size (least recently used entries go first).
+        """
+        setting = os.getenv("FILE_FACT_CACHE", "")
+        if setting.strip().lower() in {"0","off","false","no"}:
+            return cls(enabled=False)
+        path = Path(setting) if setting.strip() else root / DEFAULT_PATH
+        max_mb = float(os.getenv("FILE_FACT_CACHE_MAX_MB", DEFAULT_MAX_MB) or DEFAULT_MAX_MB)
+        return cls.load(path, max_bytes=int(max_mb * 1024 * 1024))
+
+    @classmethod
+    def load(cls, path: Path, max_bytes: int = None):
+        c = cls(path, max_bytes=max_bytes)
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except Exception:
+            data = None
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+            c.entries = data.get("entries") or {}
+            c.extractors = data.get("extractors") or {}
+            c.generation = int(data.get("generation") or 0)
+        c.generation += 1
+        return c
+
+    def _check_extractor(self, kind: str, extractor):
+        if self._checked.get(kind) is extractor:
+            return
+        self._checked[kind] = extractor
+        fingerprint = extractor_fingerprint(extractor)
+        if self.extractors.get(kind) == fingerprint:
+            return
+        # extractor changed: every fact of this kind is stale
+        for e in self.entries.values():
+            e.get("facts", {}).pop(kind, None)
+        self.extractors[kind] = fingerprint
+        self._dirty = True
+
+    def lookup(self, p: Path, rel: str, kind: str, extractor):
+        """
+        Cached extractor(text) for file `p`, or MISS when the file changed or was never seen.
+        """
+        if not self.enabled:
+            return MISS
+        self._check_extractor(kind, extractor)
+        st = p.stat()
+        e = self.entries.get(rel)
+        if e is None or kind not in e.get("facts", {}) or e.get("size") != st.st_size:
+            return MISS
+        if e.get("mtime_ns") != st.st_mtime_ns or e.get("racy"):
+            if e.get("sha256") != sha256_file(p):
+                return MISS
+            self.stats["rehashed"] += 1
+            self._stamp(e, st.st_size, st.st_mtime_ns)
+        self.stats["hits"] += 1
+        if e.get("gen") != self.generation:
+            e["gen"] = self.generation
+            self._dirty = True
+        return e["facts"][kind]
+
+    def peek(self, rel: str, kind: str, extractor):
+        """
+        Another fact of a file whose lookup() just hit, without checking the file again;
+        MISS when that kind was never stored for its current content.
+        """
+        if not self.enabled:
+            return MISS
+        self._check_extractor(kind, extractor)
+        return self.entries.get(rel, {}).get("facts", {}).get(kind, MISS)
+
+    def put(self, rel: str, kind: str, extractor, value, sha256: str, size: int, mtime_ns: int):
+        """Stores a fact computed elsewhere (e.g. in a worker process) for content `sha256`."""
+        self.stats["misses"] += 1
+        if not self.enabled:
+            return
+        self._check_extractor(kind, extractor)
+        e = self.entries.get(rel)
+        if e is None or e.get("sha256") != sha256:
+            e = {"sha256": sha256, "facts": {}}
+            self.entries[rel] = e
+        self._stamp(e, size, mtime_ns)
+        e["facts"][kind] = value
+        e["gen"] = self.generation
+
+    def get(self, p: Path, rel: str, kind: str, extractor):
+        """
+        Returns extractor(text) for file `p`, from cache when the file is unchanged.
+        `extractor` must return a JSON-serializable value.
+        """
+        if not self.enabled:
+            data = p.read_bytes()
+            perf_trace.count("files_read")
+            perf_trace.count("bytes_read", len(data))
+            return extractor(decode_text(data))
+        value = self.lookup(p, rel, kind, extractor)
+        if value is not MISS:
+            return value
+        st = p.stat()
+        data = p.read_bytes()
+        perf_trace.count("files_read")
+        perf_trace.count("bytes_read", len(data))
+        value = extractor(decode_text(data))
+        self.put(rel, kind, extractor, value, hashlib.sha256(data).hexdigest(), st.st_size, st.st_mtime_ns)
+        return value
+
+    def _stamp(self, e: dict, size: int, mtime_ns: int):
+        e["size"] = size
+        e["mtime_ns"] = mtime_ns
+        e["racy"] = (time.time_ns() - mtime_ns) < RACY_WINDOW_NS
+        self._dirty = True
+
+    def _evict(self):
+        sizes = {k: len(json.dumps(v, ensure_ascii=False, separators=(",",":"))) for k, v in self.entries.items()}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for k in sorted(self.entries, key=lambda k: (self.entries[k].get("gen", 0), k)):
+            if total <= self.max_bytes:
+                break
+            total -= sizes[k]
+            del self.entries[k]
+            self.stats["evicted"] += 1
+
+    def _merge_saved(self):
+        """
+        Folds in what other processes saved since this cache was loaded (pipeline stages run
+        concurrently and share the file): their entries for files this process didn't touch,
+        and their facts of other kinds for content both saw. This process wins on conflicts.
+        """
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return
+        theirs = data.get("extractors") or {}
+        stale = {k for k, fp in theirs.items() if k in self.extractors and self.extractors[k] != fp}
+        for k, fp in theirs.items():
+            self.extractors.setdefault(k, fp)
+        for rel, e in (data.get("entries") or {}).items():
+            for k in stale:
+                e.get("facts", {}).pop(k, None)
+            mine = self.entries.get(rel)
+            if mine is None:
+                self.entries[rel] = e
+            elif mine.get("sha256") == e.get("sha256"):
+                for k, v in e.get("facts", {}).items():
+                    mine["facts"].setdefault(k, v)
+                mine["gen"] = max(mine.get("gen", 0), e.get("gen", 0))
+        self.generation = max(self.generation, int(data.get("generation") or 0))
+
+    def save(self):
+        if not self.enabled or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock.locked(self.path.with_name(self.path.name + ".lock")):
+            self._merge_saved()
+            self._evict()
+            data = {
+                "version": CACHE_VERSION,
+                "generation": self.generation,
+                "extractors": self.extractors,
+                "entries": self.entries,
+            }
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(",",":")), encoding="utf-8")
+            os.replace(tmp, self.path)
+        self._dirty = False
+
+    def summary(self) -> str:
+        s = self.stats
+        return f"file-fact cache: hits={s['hits']} misses={s['misses']} rehashed={s['rehashed']} evicted={s['evicted']}"
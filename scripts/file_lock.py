@@ -0,0 +1,35 @@
+import os, time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows runners
+    fcntl = None
+    import msvcrt
+
+# Exclusive inter-process lock on a sidecar lock file, for the read-modify-write of files
+# that concurrent pipeline stages share (usage ledger, file-fact cache, perf trace).
+
+@contextmanager
+def locked(lock_path):
+    """Holds an exclusive lock on `lock_path` (created if missing) for the duration of the block."""
+    os.makedirs(os.path.dirname(str(lock_path)) or ".", exist_ok=True)
+    with open(lock_path, "a+b") as lf:
+        if fcntl is not None:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    lf.seek(0)
+                    msvcrt.locking(lf.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+            else:
+                lf.seek(0)
+                msvcrt.locking(lf.fileno(), msvcrt.LK_UNLCK, 1)
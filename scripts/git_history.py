@@ -0,0 +1,242 @@
+import argparse, gzip, json, os, subprocess, sys, time
+from pathlib import Path
+
+import perf_trace
+
+# Per-path commit history from a single `git log --name-status` pass: each path's last
+# commit, author and commit time, and how many commits touched it in the WINDOW days before
+# HEAD's commit time (anchoring the window on HEAD, not on the clock, keeps the table a pure
+# function of HEAD, so it can be cached by HEAD). The cache is advanced with `git log
+# old..HEAD` when the cached HEAD is an ancestor of the current one and rebuilt otherwise.
+# Only committed history is covered; uncommitted edits do not show up.
+
+HISTORY_VERSION = 1
+# gzip keeps it small and, unlike a .json file, out of the evidence index (which reads Artifacts/).
+DEFAULT_PATH = Path("Artifacts") / "git_history.json.gz"
+DEFAULT_WINDOW_DAYS = 90
+
+# `git log -z --format=` layout: RS before every commit, US between header fields; the
+# --name-status entries follow as NUL-separated status/path pairs.
+LOG_FORMAT = "--format=%x1e%H%x1f%an%x1f%ct"
+
+def iso_utc(ts: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+def _env_settings(root: Path):
+    # (cache path or None when GIT_HISTORY=0, window days)
+    setting = os.getenv("GIT_HISTORY", "")
+    days = os.getenv("GIT_HISTORY_DAYS", "").strip()
+    window_days = int(days) if days else DEFAULT_WINDOW_DAYS
+    if setting.strip().lower() in {"0","off","false","no"}:
+        return None, window_days
+    return (Path(setting) if setting.strip() else root / DEFAULT_PATH), window_days
+
+class GitHistory:
+    """
+    Commits are interned, so each path costs one commit index plus the commit times that
+    fall inside the window; get() is a dict lookup. Paths are relative to `root` (git's
+    --relative), like the repository walkers report them.
+    """
+
+    def __init__(self, root: Path, path: Path = None, window_days: int = DEFAULT_WINDOW_DAYS):
+        self.root = Path(root)
+        self.path = path
+        self.window_days = window_days
+        self.head = None
+        self.head_time = 0
+        self.commits = []  # [sha, author, commit time]
+        self.paths = {}    # rel -> [commit index, [commit times inside the window, oldest first]]
+
+    @classmethod
+    def from_env(cls, root: Path):
+        """
+        The history of `root` brought up to HEAD and saved, or None when disabled or git is
+        unavailable. GIT_HISTORY=0 disables it, any other value overrides the cache path;
+        GIT_HISTORY_DAYS sets the change-count window.
+        """
+        path, window_days = _env_settings(root)
+        if path is None:
+            return None
+        h = cls.load(root, path, window_days)
+        if h.update() is None:
+            return None
+        h.save()
+        return h
+
+    @classmethod
+    def load(cls, root: Path, path: Path, window_days: int = DEFAULT_WINDOW_DAYS):
+        h = cls(root, path, window_days)
+        try:
+            data = json.loads(gzip.decompress(Path(path).read_bytes()).decode("utf-8"))
+        except Exception:
+            data = None
+        if (isinstance(data, dict) and data.get("version") == HISTORY_VERSION
+                and data.get("root") == str(h.root) and data.get("window_days") == window_days):
+            h.head = data.get("head")
+            h.head_time = int(data.get("head_time") or 0)
+            h.commits = data.get("commits") or []
+            h.paths = data.get("paths") or {}
+        return h
+
+    def _git(self, args, timeout=300):
+        try:
+            p = subprocess.run(["git"] + args, cwd=str(self.root), capture_output=True, timeout=timeout, shell=False)
+        except Exception:
+            return None
+        if p.returncode != 0:
+            return None
+        return p.stdout.decode("utf-8", errors="replace")
+
+    def update(self):
+        """
+        Brings the table up to HEAD: "unchanged", "incremental" or "full" (which one ran), or
+        None when `root` is not in a git work tree with commits.
+        """
+        out = self._git(["rev-parse", "HEAD"])
+        if out is None:
+            return None
+        head = out.strip()
+        if head == self.head:
+            return "unchanged"
+        with perf_trace.span("git_history.update") as s:
+            if self.head and self._git(["merge-base", "--is-ancestor", self.head, head]) is not None:
+                mode, commits = "incremental", self._log(f"{self.head}..{head}")
+            else:
+                self.commits, self.paths = [], {}
+                mode, commits = "full", self._log(head)
+            if commits is None:
+                return None
+            self.head = head
+            self.head_time = int(self._git(["show", "-s", "--format=%ct", head]).strip())
+            self._apply(commits)
+            self._trim()
+            s.set(mode=mode, commits=len(commits), paths=len(self.paths))
+        return mode
+
+    def _log(self, rev: str):
+        """Commits in `rev`, oldest first: [(sha, author, time, [(status, path), ...])]."""
+        out = self._git(["log", "--no-renames", "--name-status", "--relative", "-z", LOG_FORMAT, rev])
+        if out is None:
+            return None
+        commits = []
+        for chunk in out.split("\x1e"):
+            if not chunk:
+                continue
+            header, _, rest = chunk.partition("\0")
+            sha, author, ts = header.split("\x1f")
+            toks = rest.lstrip("\n").split("\0")
+            changes = [(toks[i], toks[i + 1]) for i in range(0, len(toks) - 1, 2)]
+            commits.append((sha, author, int(ts), changes))
+        commits.reverse()
+        perf_trace.count("git_commits_read", len(commits))
+        return commits
+
+    def _apply(self, commits):
+        cutoff = self._cutoff()
+        for sha, author, ts, changes in commits:
+            idx = len(self.commits)
+            self.commits.append([sha, author, ts])
+            for status, rel in changes:
+                if status == "D":
+                    self.paths.pop(rel, None)
+                    continue
+                e = self.paths.get(rel)
+                if e is None:
+                    e = self.paths[rel] = [idx, []]
+                elif ts >= self.commits[e[0]][2]:
+                    # an incremental range lists a merged side branch's older commits after
+                    # newer first-parent ones: the latest commit time wins, as in a full log
+                    e[0] = idx
+                if ts >= cutoff:
+                    e[1].append(ts)
+
+    def _cutoff(self) -> int:
+        return self.head_time - self.window_days * 86400
+
+    def _trim(self):
+        # the window moved with HEAD: drop change times that fell out of it, and commits no
+        # path points at any more
+        cutoff = self._cutoff()
+        keep = {}
+        for e in self.paths.values():
+            if e[1]:
+                e[1] = sorted(t for t in e[1] if t >= cutoff)
+            e[0] = keep.setdefault(e[0], len(keep))
+        commits = [None] * len(keep)
+        for old, new in keep.items():
+            commits[new] = self.commits[old]
+        self.commits = commits
+
+    def get(self, rel: str):
+        """Freshness of one path: last commit/author/time and changes in the window; None if untracked."""
+        e = self.paths.get(rel)
+        if e is None:
+            return None
+        sha, author, ts = self.commits[e[0]]
+        return {"last_commit": sha, "last_author": author, "last_changed": iso_utc(ts), "recent_changes": len(e[1])}
+
+    def section(self, rels) -> dict:
+        """The freshness block written into as_is_scan.json for the given paths."""
+        paths = {}
+        for rel in rels:
+            f = self.get(rel)
+            if f is not None:
+                paths[rel] = f
+        return {"head": self.head, "window_days": self.window_days, "paths": paths}
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": HISTORY_VERSION,
+            "root": str(self.root),
+            "window_days": self.window_days,
+            "head": self.head,
+            "head_time": self.head_time,
+            "commits": self.commits,
+            "paths": self.paths,
+        }
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_bytes(gzip.compress(json.dumps(data, ensure_ascii=False, separators=(",",":")).encode("utf-8"), 6))
+        os.replace(tmp, self.path)
+
+def _bench(h: GitHistory, n: int):
+    rels = list(h.paths)
+    if not rels:
+        print("No tracked paths with history.")
+        return
+    probe = [rels[i % len(rels)] for i in range(n)]
+    t0 = time.perf_counter()
+    for rel in probe:
+        h.get(rel)
+    dt = time.perf_counter() - t0
+    print(f"{n} lookups over {len(rels)} paths: {dt * 1000:.1f} ms ({dt / n * 1e9:.0f} ns/lookup)")
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-path git history (last commit, author, recent change count).")
+    ap.add_argument("paths", nargs="*", help="Paths to show (relative to the repository root)")
+    ap.add_argument("--root", default=".", help="Repository root (default: current directory)")
+    ap.add_argument("--rebuild", action="store_true", help="Ignore the cached table and read the whole log.")
+    ap.add_argument("--bench", type=int, metavar="N", help="Time N lookups over the table.")
+    args = ap.parse_args()
+
+    root = Path(args.root).resolve()
+    path, window_days = _env_settings(root)
+    h = GitHistory(root, path, window_days) if args.rebuild or path is None else GitHistory.load(root, path, window_days)
+    t0 = time.perf_counter()
+    mode = h.update()
+    if mode is None:
+        print(f"ERROR: {root} is not a git work tree with commits.", file=sys.stderr)
+        return 1
+    h.save()
+    print(f"History {mode} at {h.head[:12]}: {len(h.paths)} paths, {len(h.commits)} commits referenced "
+          f"({time.perf_counter() - t0:.2f}s, {h.window_days}-day window)")
+    for rel in args.paths:
+        print(f"{rel}\t{json.dumps(h.get(rel.replace(chr(92), '/')))}")
+    if args.bench:
+        _bench(h, args.bench)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(perf_trace.run("git_history", main))
@@ -1,8 +1,12 @@
-﻿import json, re
+﻿import json, sys
 from pathlib import Path
 
+import perf_trace
+from route_trie import RouteTrie
+
 ROOT = Path(".").resolve()
-REQ_MD = ROOT / "Requirements" / "BlackRavenia_RideShare_Canonical_Requirements_v6_1.md"
+# the canonical requirements MD, same default as sync_requirements_from_md.py
+REQ_MD = ROOT / "Requirements" / "BlackRavenia_RideShare_Canonical_Requirements_v6_1_MERGED_REORG_v3.md"
 ASIS  = ROOT / "AgentInput" / "as_is_scan.json"
 OUT   = ROOT / "AgentInput" / "implemented_not_documented_candidates.md"
 
@@ -10,6 +14,8 @@ def main():
     req_text = ""
     if REQ_MD.exists():
         req_text = REQ_MD.read_text(encoding="utf-8", errors="replace").lower()
+    else:
+        print(f"WARN: requirements MD not found: {REQ_MD}; every endpoint will be a candidate", file=sys.stderr)
 
     inv = json.loads(ASIS.read_text(encoding="utf-8", errors="replace"))
     endpoints = inv.get("endpoints", [])
@@ -21,34 +27,35 @@ def main():
     lines.append("This is a *candidate list* for the agentic Artificial Intelligence (AI) to validate semantically.")
     lines.append("")
 
-    # Candidate signals: uncommon package names/scripts + explicit endpoint paths
-    lines.append("## Endpoints not mentioned in requirements text (string match only)")
-    c = 0
+    # Candidate signals: uncommon package names/scripts + endpoint routes. Routes are matched
+    # as templates (/drivers/:id == /drivers/{driverId}) against every route the
+    # requirements mention, one trie step per path segment.
+    routes = RouteTrie.from_text(req_text)
+    by_file = {}
     for e in endpoints:
-        p = str(e.get("path","")).lower()
-        if p and p not in req_text:
-            lines.append(f"- {e.get('method')} {e.get('path')}  ({e.get('file')})")
-            c += 1
-            if c >= 100:
-                lines.append("- ... (truncated at 100)")
-                break
-    if c == 0:
-        lines.append("- (none detected by string match)")
+        p = str(e.get("path",""))
+        if p and p not in routes:
+            by_file.setdefault(str(e.get("file") or "(unknown file)"), []).append(e)
+
+    lines.append("## Endpoints not mentioned in requirements text (route match)")
+    lines.append(f"{sum(len(v) for v in by_file.values())} of {len(endpoints)} endpoints, {len(by_file)} files; {routes.size} documented routes.")
+    for f in sorted(by_file):
+        lines.append("")
+        lines.append(f"### {f}")
+        for e in by_file[f]:
+            lines.append(f"- {e.get('method')} {e.get('path')}")
+    if not by_file:
+        lines.append("- (none detected by route match)")
 
     lines.append("")
     lines.append("## Package scripts / dependencies not mentioned in requirements text (string match only)")
-    shown = 0
     for pj in pkgs:
         name = (pj.get("name") or "").lower()
         if name and name not in req_text:
             lines.append(f"- package: {pj.get('path')}  name={pj.get('name')}")
-            shown += 1
-            if shown >= 40:
-                lines.append("- ... (truncated at 40)")
-                break
 
     OUT.write_text("\n".join(lines) + "\n", encoding="utf-8")
     print(f"Wrote: {OUT}")
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run("implemented_not_documented_candidates", main)
@@ -0,0 +1,495 @@
+import argparse, json, re, sys
+from pathlib import Path
+
+from as_is_scan import SKIP_DIRS
+from file_fact_cache import FileFactCache, decode_text
+from db_catalog import OUT_JSON as CATALOG_JSON, build_catalog
+import perf_trace
+from repo_walker import iter_files
+from scan_reader import ScanLimits, read_facts
+
+# Static index advice for the Supabase queries in the TypeScript services. Every
+# query-builder chain (supabase.from('t').select(...).eq(...).gte(...).order(...)) is
+# reduced to the columns it filters by equality, sorts by and range-filters on, per table
+# (embedded resources such as `vehicles!inner (category)` add their join column), and the
+# ideal btree key for each table is built in ESR order: equality columns, then sort
+# columns, then the first range column. That key is compared with the indexes, primary
+# keys and unique constraints in the migration catalog; query sites the existing indexes
+# only partly serve become ranked CREATE INDEX suggestions, and indexes that a prefix of
+# another index (or a suggestion) already covers are reported as redundant.
+
+ROOT = Path(".").resolve()
+OUT_JSON = ROOT / "AgentInput" / "index_advice.json"
+OUT_MD = ROOT / "AgentInput" / "index_advice.md"
+
+SOURCE_EXTS = {".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs"}
+
+EQ_METHODS = {"eq", "is", "in", "match"}
+RANGE_METHODS = {"gt", "gte", "lt", "lte", "like", "ilike"}
+# filters a btree index cannot serve (or only with a different operator class)
+OTHER_METHODS = {"neq", "not", "or", "contains", "containedBy", "overlaps", "textSearch", "filter",
+                 "rangeGt", "rangeGte", "rangeLt", "rangeLte", "rangeAdjacent"}
+FILTER_OPS = {"eq": "eq", "is": "eq", "in": "eq", "gt": "range", "gte": "range", "lt": "range", "lte": "range",
+              "like": "range", "ilike": "range"}
+WRITE_METHODS = ("insert", "update", "upsert", "delete")
+
+# ---- extraction ----
+
+FROM_RE = re.compile(r"""\.\s*from\(\s*(['"`])([\w.]+)\1\s*\)""")
+CALL_RE = re.compile(r"\s*\.\s*([A-Za-z_]\w*)\s*\(")
+STRING_RE = re.compile(r"""'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)"|`((?:[^`\\]|\\.)*)`""", re.S)
+COMMENT_RE = re.compile(r"\s*(?://[^\n]*|/\*.*?\*/)", re.S)
+KEY_RE = re.compile(r"""(?:^|[{,])\s*(?:(['"])(\w+)\1|(\w+))\s*:""")
+
+def _skip_comments(text: str, i: int) -> int:
+    while True:
+        m = COMMENT_RE.match(text, i)
+        if m is None:
+            return i
+        i = m.end()
+
+def _close_paren(text: str, i: int) -> int:
+    """Index just past the ")" matching the "(" before `i`, skipping strings and comments; -1 if none."""
+    depth = 1
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c in "'\"`":
+            m = STRING_RE.match(text, i)
+            i = m.end() if m else i + 1
+            continue
+        if c == "/" and text.startswith(("//", "/*"), i):
+            i = _skip_comments(text, i)
+            continue
+        if c in "([{":
+            depth += 1
+        elif c in ")]}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return -1
+
+def _strings(args: str) -> list:
+    return [next(g for g in m.groups() if g is not None) for m in STRING_RE.finditer(args)]
+
+def _option(args: str, key: str):
+    m = re.search(rf"\b{key}\s*:\s*(['\"`])(\w+)\1", args)
+    return m.group(2) if m else None
+
+def parse_embeds(select: str) -> list:
+    """
+    PostgREST select string -> embedded resources, [[parent alias, table, alias, hint], ...];
+    the base table's alias is "". `driver:drivers!trips_driver_id_fkey (name)` embeds
+    drivers as "driver" with hint trips_driver_id_fkey ("inner"/"left" are join hints).
+    """
+    toks = re.findall(r"[\w.*]+|[:!(),]", select)
+    out = []
+    stack = [""]
+    i = 0
+    while i < len(toks):
+        t = toks[i]
+        if t == ")":
+            if len(stack) > 1:
+                stack.pop()
+            i += 1
+            continue
+        if not re.match(r"\w", t):
+            i += 1
+            continue
+        alias, table, hint = t, t, None
+        j = i + 1
+        if j + 1 < len(toks) and toks[j] == ":" and toks[j + 1] not in ":(":
+            table = toks[j + 1]
+            j += 2
+        elif j < len(toks) and toks[j] == ":":
+            j += 2  # column::cast
+        while j + 1 < len(toks) and toks[j] == "!":
+            hint = (hint + "!" if hint else "") + toks[j + 1]
+            j += 2
+        if j < len(toks) and toks[j] == "(":
+            out.append([stack[-1], table, alias, hint])
+            stack.append(alias)
+            j += 1
+        i = j
+    return out
+
+def extract_queries(text: str) -> list:
+    """
+    Every supabase .from() chain in a source file: {"line", "table", "op", "select",
+    "filters": [[method, column], ...], "order": [[column, ascending, foreign table], ...],
+    "embeds": parse_embeds(select), "single", "limit"}. Columns are as written ("t.col" for
+    filters on embedded tables).
+    """
+    out = []
+    for m in FROM_RE.finditer(text):
+        q = {"line": text.count("\n", 0, m.start()) + 1, "table": m.group(2).split(".")[-1], "op": None,
+             "select": None, "filters": [], "order": [], "embeds": [], "single": False, "limit": False}
+        i = m.end()
+        while True:
+            i = _skip_comments(text, i)
+            c = CALL_RE.match(text, i)
+            if c is None:
+                break
+            end = _close_paren(text, c.end())
+            if end < 0:
+                break
+            method, args = c.group(1), text[c.end():end - 1]
+            i = end
+            strings = _strings(args)
+            if method == "select":
+                q["op"] = q["op"] or "select"
+                q["select"] = " ".join((strings[0] if strings else "*").split())
+                q["embeds"] = parse_embeds(q["select"])
+            elif method in WRITE_METHODS:
+                q["op"] = method
+            elif method == "rpc":
+                break
+            elif method == "match":
+                q["filters"] += [["eq", k[1] or k[2]] for k in KEY_RE.findall(args)]
+            elif method == "filter" and len(strings) >= 2:
+                q["filters"].append([FILTER_OPS.get(strings[1], "other"), strings[0]])
+            elif method in EQ_METHODS and strings:
+                q["filters"].append(["eq", strings[0]])
+            elif method in RANGE_METHODS and strings:
+                q["filters"].append(["range", strings[0]])
+            elif method in OTHER_METHODS:
+                q["filters"].append(["other", strings[0] if strings else ""])
+            elif method == "order" and strings:
+                asc = re.search(r"\bascending\s*:\s*false\b", args) is None
+                q["order"].append([strings[0], asc, _option(args, "foreignTable") or _option(args, "referencedTable")])
+            elif method in ("single", "maybeSingle"):
+                q["single"] = True
+            elif method in ("limit", "range"):
+                q["limit"] = True
+        out.append(q)
+    return out
+
+def extract_queries_buffer(buf):
+    # most files have no query builder at all: only decode the ones that do
+    if buf.find(b"from(") < 0:
+        return []
+    return extract_queries(decode_text(bytes(buf)))
+
+def collect_queries(root: Path, cache: FileFactCache = None) -> dict:
+    """{rel: [query, ...]} for the source files that contain query-builder chains."""
+    limits = ScanLimits.from_env()
+    out = {}
+    with perf_trace.span("extract_queries") as s:
+        for f in iter_files(root, SKIP_DIRS):
+            if f.suffix not in SOURCE_EXTS:
+                continue
+            try:
+                qs = read_facts(f.path, f.rel, "supabase_queries", extract_queries_buffer, cache, limits)
+            except OSError:
+                continue
+            if qs:
+                out[f.rel] = qs
+        s.set(files=len(out), queries=sum(len(v) for v in out.values()))
+    return out
+
+# ---- analysis ----
+
+class TableIndexes:
+    """The btree keys available on one table: named indexes plus the primary key and unique constraints."""
+
+    def __init__(self, name: str, table: dict, indexes: dict):
+        self.name = name
+        self.columns = {c["name"]: c for c in table.get("columns", [])}
+        self.keys = []  # [name, [columns], unique, partial]
+        if table.get("primary_key"):
+            self.keys.append([f"{name}_pkey", list(table["primary_key"]), True, False])
+        for cols in table.get("unique", []):
+            self.keys.append([f"{name}_{'_'.join(cols)}_key", list(cols), True, False])
+        for ix_name, ix in sorted(indexes.items()):
+            if ix["table"] == name and ix.get("method", "btree") == "btree":
+                self.keys.append([ix_name, list(ix["columns"]), bool(ix.get("unique")), bool(ix.get("where"))])
+
+    def is_boolean(self, col: str) -> bool:
+        return self.columns.get(col, {}).get("type", "").startswith("bool")
+
+def served_columns(key: list, eq: list, sort: list, rng: list) -> list:
+    """The needed columns a btree key serves: an equality prefix, then the sort columns, then one range column."""
+    served = []
+    k = 0
+    while k < len(key) and key[k] in eq and key[k] not in served:
+        served.append(key[k])
+        k += 1
+    if sort and key[k:k + len(sort)] == sort:
+        served += sort
+        k += len(sort)
+    if rng and k < len(key) and key[k] in rng:
+        served.append(key[k])
+    return served
+
+class Need:
+    """What one query site asks of one table."""
+
+    def __init__(self, table: str):
+        self.table = table
+        self.eq = []
+        self.sort = []
+        self.range = []
+        self.other = []
+        self.join = None  # column the join from the parent resource looks up, when it is a foreign key here
+
+    def add(self, kind: str, col: str):
+        bucket = {"eq": self.eq, "range": self.range, "sort": self.sort}.get(kind, self.other)
+        if col not in bucket:
+            bucket.append(col)
+
+    def empty(self) -> bool:
+        return not (self.eq or self.sort or self.range)
+
+    def ideal(self, t: TableIndexes) -> list:
+        # equality columns first, booleans (low selectivity) last among them; then sort; then one range column
+        eq = sorted(self.eq, key=lambda c: (t.is_boolean(c), self.eq.index(c)))
+        key = eq + [c for c in self.sort if c not in eq]
+        rng = [c for c in self.range if c not in key]
+        return key + rng[:1]
+
+class IndexAdvisor:
+    """Cross-checks extracted query sites against a migration catalog (db_catalog.json content)."""
+
+    def __init__(self, catalog: dict):
+        self.catalog = catalog
+        self.tables = {name: TableIndexes(name, t, catalog.get("indexes", {}))
+                       for name, t in catalog.get("tables", {}).items()}
+        self.warnings = []
+
+    def _warn(self, site: str, msg: str):
+        w = f"{site}: {msg}"
+        if w not in self.warnings:
+            self.warnings.append(w)
+
+    def _join_column(self, parent: str, child: str, hint: str, site: str):
+        """
+        Column of `child` the join from `parent` looks up by, when it is not the child's
+        primary key (which always has an index): the child's foreign key to the parent.
+        """
+        fks = self.catalog.get("tables", {}).get(child, {}).get("foreign_keys", [])
+        mine = [fk for fk in fks if fk["references"] == parent]
+        theirs = [fk for fk in self.catalog.get("tables", {}).get(parent, {}).get("foreign_keys", [])
+                  if fk["references"] == child]
+        if hint and hint not in ("inner", "left"):
+            named = [fk for fk in mine if hint in (fk.get("name"), *fk["columns"]) or hint.startswith(f"{child}_")]
+            mine = named or mine
+        if theirs and not mine:
+            return None  # many-to-one: looked up by the child's primary key
+        if not mine:
+            self._warn(site, f"no foreign key between {parent} and {child} for the embedded resource")
+            return None
+        return mine[0]["columns"][0]
+
+    def needs(self, rel: str, q: dict) -> dict:
+        """{table: Need} for one query site."""
+        site = f"{rel}:{q['line']}"
+        base = q["table"]
+        aliases = {"": base, base: base}
+        needs = {base: Need(base)}
+        for parent_alias, table, alias, hint in q["embeds"]:
+            parent = aliases.get(parent_alias, parent_alias)
+            aliases[alias] = table
+            aliases.setdefault(table, table)
+            n = needs.setdefault(table, Need(table))
+            if table in self.tables and parent in self.tables:
+                n.join = self._join_column(parent, table, hint, site)
+                if n.join:
+                    n.add("eq", n.join)
+        for kind, col in q["filters"]:
+            table, _, name = col.rpartition(".") if "." in col else ("", "", col)
+            table = aliases.get(table, table)
+            needs.setdefault(table, Need(table)).add(kind, name)
+        for col, _asc, foreign in q["order"]:
+            table = aliases.get(foreign or "", foreign)
+            needs.setdefault(table, Need(table)).add("sort", col)
+        for table, n in needs.items():
+            t = self.tables.get(table)
+            if t is None:
+                self._warn(site, f"table {table} is not defined by any migration")
+                continue
+            for col in n.eq + n.sort + n.range + n.other:
+                if col and col not in t.columns:
+                    self._warn(site, f"column {table}.{col} is not defined by any migration")
+        return needs
+
+    def check(self, n: Need) -> dict:
+        """How well the table's best existing key serves one Need."""
+        t = self.tables[n.table]
+        ideal = n.ideal(t)
+        best, served = None, []
+        for name, key, unique, partial in t.keys:
+            if partial:
+                continue
+            if unique and key and all(c in n.eq for c in key):
+                return {"table": n.table, "eq": n.eq, "sort": n.sort, "range": n.range, "other": n.other,
+                        "join": n.join, "ideal": ideal, "best_index": name, "served": list(key), "missing": []}
+            s = served_columns(key, n.eq, n.sort, n.range)
+            if len(s) > len(served):
+                best, served = name, s
+        missing = [c for c in ideal if c not in served]
+        return {"table": n.table, "eq": n.eq, "sort": n.sort, "range": n.range, "other": n.other, "join": n.join,
+                "ideal": ideal, "best_index": best, "served": served, "missing": missing}
+
+    def analyze(self, queries: dict) -> dict:
+        sites = []
+        for rel in sorted(queries):
+            for q in queries[rel]:
+                if q["op"] in ("insert", "upsert"):
+                    continue  # no lookup beyond the primary key / conflict target
+                checks = [self.check(n) for n in self.needs(rel, q).values()
+                          if not n.empty() and n.table in self.tables]
+                if not checks:
+                    continue
+                gap = sum(len(c["missing"]) for c in checks)
+                sites.append({"file": rel, "line": q["line"], "table": q["table"], "op": q["op"] or "select",
+                              "single": q["single"], "limit": q["limit"], "tables": checks, "gap": gap})
+        sites.sort(key=lambda s: (-s["gap"], s["file"], s["line"]))
+        suggestions = self._suggestions(sites)
+        return {
+            "catalog_version": self.catalog.get("catalog_version"),
+            "sites": sites,
+            "suggestions": suggestions,
+            "redundant": self._redundant(suggestions),
+            "warnings": self.warnings,
+        }
+
+    def _suggestions(self, sites: list) -> list:
+        by_key = {}
+        for s in sites:
+            for c in s["tables"]:
+                if not c["missing"]:
+                    continue
+                k = (c["table"], tuple(c["ideal"]))
+                e = by_key.setdefault(k, {"table": c["table"], "columns": list(c["ideal"]), "sites": [], "score": 0,
+                                          "eq": sum(1 for col in c["ideal"] if col in c["eq"])})
+                e["sites"].append(f"{s['file']}:{s['line']}")
+                e["score"] += len(c["missing"])
+        # a key that is a prefix of another suggested key on the same table is served by it; so is
+        # an equality-only key whose columns the other key's equality part can be reordered to lead with
+        for k in sorted(by_key, key=lambda k: len(k[1])):
+            if k not in by_key:
+                continue
+            e = by_key[k]
+            n = len(k[1])
+            longer = [o for o in by_key if o[0] == k[0] and len(o[1]) > n and (
+                o[1][:n] == k[1] or (e["eq"] == n and set(k[1]) <= set(o[1][:by_key[o]["eq"]])))]
+            if not longer:
+                continue
+            o = max(longer, key=lambda o: by_key[o]["score"])
+            target = by_key.pop(o)
+            target["columns"] = list(k[1]) + [c for c in target["columns"] if c not in k[1]]
+            target["sites"] += [x for x in by_key.pop(k)["sites"] if x not in target["sites"]]
+            target["score"] += e["score"]
+            by_key[(k[0], tuple(target["columns"]))] = target
+        out = []
+        for e in by_key.values():
+            del e["eq"]
+            t = self.tables[e["table"]]
+            name = "idx_" + "_".join([e["table"]] + e["columns"])
+            e["name"] = name
+            e["sql"] = f"CREATE INDEX IF NOT EXISTS {name} ON {e['table']} ({', '.join(e['columns'])});"
+            e["supersedes"] = [k[0] for k in t.keys if not k[2] and not k[3] and k[1] == e["columns"][:len(k[1])]]
+            e["low_selectivity"] = [c for c in e["columns"] if t.is_boolean(c)]
+            out.append(e)
+        out.sort(key=lambda e: (-e["score"], -len(e["sites"]), e["name"]))
+        for rank, e in enumerate(out, 1):
+            e["rank"] = rank
+        return out
+
+    def _redundant(self, suggestions: list) -> list:
+        out = []
+        for table, t in sorted(self.tables.items()):
+            for name, key, unique, partial in t.keys:
+                if unique or partial:
+                    continue
+                for other, okey, ounique, opartial in t.keys:
+                    # of two identical plain indexes only the later-named one is reported
+                    if other != name and not opartial and len(okey) >= len(key) and okey[:len(key)] == key \
+                            and (len(okey) > len(key) or ounique or other < name):
+                        out.append({"index": name, "table": table, "columns": key, "covered_by": other,
+                                    "reason": "duplicate" if okey == key else "prefix"})
+                        break
+                else:
+                    sup = [s["name"] for s in suggestions if name in s["supersedes"]]
+                    if sup:
+                        out.append({"index": name, "table": table, "columns": key, "covered_by": sup[0],
+                                    "reason": "prefix of suggested index"})
+        return out
+
+def write_outputs(advice: dict, out_json: Path = OUT_JSON, out_md: Path = OUT_MD):
+    out_json.parent.mkdir(parents=True, exist_ok=True)
+    out_json.write_text(json.dumps(advice, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    md = []
+    md.append("# Index Advice (static, Supabase query builder vs migrations)")
+    md.append("")
+    md.append(f"- Query sites checked: {len(advice['sites'])}")
+    md.append(f"- Sites not fully served by an index: {sum(1 for s in advice['sites'] if s['gap'])}")
+    md.append("")
+    md.append("## Suggested indexes (ranked)")
+    if not advice["suggestions"]:
+        md.append("- (none: every query site has a supporting index)")
+    for s in advice["suggestions"]:
+        md.append(f"{s['rank']}. `{s['sql']}`  (score {s['score']}, {len(s['sites'])} site(s))")
+        for site in s["sites"]:
+            md.append(f"   - {site}")
+        if s["supersedes"]:
+            md.append(f"   - Makes redundant: {', '.join(s['supersedes'])}")
+        if s["low_selectivity"]:
+            md.append(f"   - Low-selectivity (boolean) columns: {', '.join(s['low_selectivity'])}")
+    md.append("")
+    md.append("## Redundant indexes")
+    if not advice["redundant"]:
+        md.append("- (none)")
+    for r in advice["redundant"]:
+        md.append(f"- {r['index']} on {r['table']} ({', '.join(r['columns'])}): {r['reason']}, covered by {r['covered_by']}")
+    md.append("")
+    md.append("## Query sites")
+    for s in advice["sites"]:
+        md.append(f"### {s['file']}:{s['line']} — {s['op']} {s['table']}" + ("" if s["gap"] else " (served)"))
+        for c in s["tables"]:
+            need = ", ".join(f"{k}={'/'.join(c[k])}" for k in ("eq", "sort", "range") if c[k])
+            best = f"{c['best_index']} serves {', '.join(c['served'])}" if c["best_index"] else "no usable index"
+            miss = f"; missing {', '.join(c['missing'])}" if c["missing"] else ""
+            md.append(f"- {c['table']}: {need}; {best}{miss}")
+    md.append("")
+    if advice["warnings"]:
+        md.append("## Warnings")
+        for w in advice["warnings"]:
+            md.append(f"- {w}")
+        md.append("")
+    out_md.write_text("\n".join(md) + "\n", encoding="utf-8")
+
+def main():
+    ap = argparse.ArgumentParser(description="Static index advice: Supabase query-builder chains vs migration indexes.")
+    ap.add_argument("--catalog", default=str(CATALOG_JSON), help="db_catalog.json (built from the migrations if missing)")
+    ap.add_argument("--out-json", default=str(OUT_JSON))
+    ap.add_argument("--out-md", default=str(OUT_MD))
+    ap.add_argument("--top", type=int, default=10, help="Suggestions to print")
+    args = ap.parse_args()
+
+    cache = FileFactCache.from_env(ROOT)
+    try:
+        catalog = json.loads(Path(args.catalog).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        catalog = build_catalog(ROOT, cache)
+    queries = collect_queries(ROOT, cache)
+    cache.save()
+
+    advice = IndexAdvisor(catalog).analyze(queries)
+    write_outputs(advice, Path(args.out_json), Path(args.out_md))
+    print(f"Wrote: {args.out_json}")
+    print(f"Wrote: {args.out_md}")
+    print(f"Index advice: {len(advice['sites'])} query site(s), {len(advice['suggestions'])} suggestion(s), "
+          f"{len(advice['redundant'])} redundant index(es)")
+    for s in advice["suggestions"][:args.top]:
+        print(f"  {s['rank']:>2}. {s['sql']}  score={s['score']} sites={len(s['sites'])}")
+    for w in advice["warnings"]:
+        print(f"WARN: {w}")
+    if cache.enabled:
+        print(cache.summary())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(perf_trace.run("index_advisor", main))
@@ -1,8 +1,18 @@
 ﻿import json
 import html
+import heapq
 import argparse
+import os
+import shutil
+import tempfile
 from pathlib import Path
-from collections import defaultdict
+from datetime import datetime, timezone
+
+import perf_trace
+from requirements_store import RequirementsStore
+
+NEXT_UP_LIMIT = 25
+DETERMINANTS = ["route", "db", "test", "ui", "ci", "file", "other"]
 
 def norm(s: str) -> str:
     return (s or "").strip().lower()
@@ -19,7 +29,7 @@ def load_complete_statuses(taxonomy_path: Path) -> set[str]:
     if not taxonomy_path or not taxonomy_path.exists():
         return set()
 
-    data = json.loads(taxonomy_path.read_text(encoding="utf-8"))
+    data = json.loads(taxonomy_path.read_text(encoding="utf-8-sig"))
     complete = set()
 
     if isinstance(data, dict):
@@ -67,56 +77,257 @@ def is_complete(status: str, complete_set: set[str]) -> bool:
     # Fallback (should rarely be used once taxonomy is present)
     return any(k in s for k in ["done", "complete", "completed", "implemented", "pass", "passing"])
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--jsonl", required=True, help="Path to requirements_status.jsonl (JSONL (JavaScript Object Notation Lines))")
-    ap.add_argument("--out", required=True, help="Path to dashboard.html (HTML (HyperText Markup Language))")
-    ap.add_argument("--taxonomy", required=False, default="", help="Path to status_taxonomy.json (JSON (JavaScript Object Notation))")
-    args = ap.parse_args()
+def status_bucket(status: str) -> str:
+    """Milestone-summary column for a status: "tested", "implemented", "blocked" or ""."""
+    s = norm(status).replace(" ", "_")
+    if s in {"tested", "implemented_with_tests"}:
+        return "tested"
+    if s.startswith("implemented"):
+        return "implemented"
+    if s.startswith("blocked"):
+        return "blocked"
+    return ""
 
-    jsonl_path = Path(args.jsonl)
-    out_html = Path(args.out)
-    taxonomy_path = Path(args.taxonomy) if args.taxonomy else None
+def determinant(ev) -> str:
+    prefix = str(ev).split(":", 1)[0].strip().lower() if ":" in str(ev) else ""
+    return prefix if prefix in DETERMINANTS else "other"
 
-    complete_set = load_complete_statuses(taxonomy_path) if taxonomy_path else set()
+def evidence_items(ev) -> list:
+    if isinstance(ev, dict):
+        return [f"{k}: {v}" for k, v in ev.items()]
+    if isinstance(ev, list):
+        return [str(x) for x in ev]
+    return [str(ev)] if ev else []
 
-    rows = []
-    with jsonl_path.open("r", encoding="utf-8") as f:
+def md_cell(x) -> str:
+    return ("" if x is None else str(x)).replace("|", "\\|").replace("\n", " ")
+
+def iter_jsonl(path: Path):
+    with path.open("r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
-            rows.append(json.loads(line))
+            yield json.loads(line)
 
-    total = len(rows)
-    done = sum(1 for r in rows if is_complete(r.get("status",""), complete_set))
-    overall_pct = (done / total * 100.0) if total else 0.0
+class _Desc:
+    """Reverses ordering so heapq's min-heap keeps the N smallest keys (largest on top)."""
+    __slots__ = ("key",)
 
-    by_m = defaultdict(list)
-    for r in rows:
-        by_m[r.get("milestone","(none)")].append(r)
+    def __init__(self, key):
+        self.key = key
 
-    milestones = []
-    for m, items in by_m.items():
-        t = len(items)
-        d = sum(1 for r in items if is_complete(r.get("status",""), complete_set))
-        pct = (d / t * 100.0) if t else 0.0
-        milestones.append((m, t, d, pct))
-    milestones.sort(key=lambda x: (x[0] or ""))
+    def __lt__(self, other):
+        return other.key < self.key
 
-    next_up = [r for r in rows if not is_complete(r.get("status",""), complete_set)]
-    next_up.sort(key=lambda r: (r.get("milestone",""), r.get("title","")))
-    next_up = next_up[:25]
+class StatusAggregator:
+    """
+    One-pass rollup of requirements_status rows: overall and per-milestone counts, status
+    buckets, evidence determinants, and the first `next_up_limit` incomplete rows by
+    (milestone, title) kept in a bounded heap. Memory is O(milestones + next_up_limit).
+    """
 
-    taxonomy_note = ""
-    if taxonomy_path and taxonomy_path.exists() and complete_set:
-        taxonomy_note = f"Taxonomy: {taxonomy_path.name} (complete states: {len(complete_set)})"
-    elif taxonomy_path and taxonomy_path.exists():
-        taxonomy_note = f"Taxonomy: {taxonomy_path.name} (loaded, but no explicit complete states found — using fallback)"
-    else:
-        taxonomy_note = "Taxonomy: (none) — using fallback"
+    def __init__(self, complete_set: set[str], next_up_limit: int = NEXT_UP_LIMIT):
+        self.complete_set = complete_set
+        self.next_up_limit = next_up_limit
+        self.total = 0
+        self.done = 0
+        self.by_m = {}
+        self._complete = {}
+        self._heap = []
+
+    def add(self, r: dict):
+        status = r.get("status", "")
+        if status not in self._complete:
+            self._complete[status] = (is_complete(status, self.complete_set), status_bucket(status))
+        complete, bucket = self._complete[status]
+
+        self.total += 1
+        m = r.get("milestone", "(none)")
+        st = self.by_m.get(m)
+        if st is None:
+            st = self.by_m[m] = {"total": 0, "done": 0, "tested": 0, "implemented": 0, "blocked": 0,
+                                 "determinants": dict.fromkeys(DETERMINANTS, 0)}
+        st["total"] += 1
+        if bucket:
+            st[bucket] += 1
+        for ev in evidence_items(r.get("evidence")):
+            st["determinants"][determinant(ev)] += 1
+        if complete:
+            self.done += 1
+            st["done"] += 1
+            return
+
+        # ties keep input order, as the stable sort did
+        key = (r.get("milestone") or "", r.get("title") or "", self.total)
+        if len(self._heap) < self.next_up_limit:
+            heapq.heappush(self._heap, (_Desc(key), self._row(r)))
+        elif key < self._heap[0][0].key:
+            heapq.heapreplace(self._heap, (_Desc(key), self._row(r)))
+
+    @staticmethod
+    def _row(r: dict) -> dict:
+        return {k: r.get(k, "") for k in ("requirement_id", "milestone", "status", "title")}
+
+    @property
+    def overall_pct(self) -> float:
+        return (self.done / self.total * 100.0) if self.total else 0.0
+
+    def milestones(self):
+        out = []
+        for m, st in self.by_m.items():
+            t, d = st["total"], st["done"]
+            out.append((m, t, d, (d / t * 100.0) if t else 0.0))
+        out.sort(key=lambda x: (x[0] or ""))
+        return out
+
+    def next_up(self):
+        return [row for _, row in sorted(self._heap, key=lambda x: x[0].key)]
+
+def _open_atomic(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return open(path.with_name(path.name + ".tmp"), "w", encoding="utf-8")
+
+def _commit_atomic(f, path: Path):
+    f.close()
+    os.replace(f.name, path)
+
+class StatusMarkdownWriter:
+    """
+    Streams requirements_status.md: table rows are written as rows arrive, the per-item
+    notes go to a disk-backed spool and are appended when the table is complete.
+    """
+
+    def __init__(self, path: Path, meta: dict):
+        self.path = path
+        self.f = _open_atomic(path)
+        self.notes = tempfile.TemporaryFile("w+", encoding="utf-8")
+        generated = meta.get("generated_at_utc") or datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        self.f.write("# Requirements Status (evidence-based)\n")
+        self.f.write(f"- Generated: {generated}\n")
+        self.f.write(f"- Run mode: `{meta.get('run_mode', '')}` | Model: `{meta.get('model', '')}` | Batch size: `{meta.get('batch_size', '')}`\n\n")
+        self.f.write("| Requirement ID | Milestone | Status | Title | Evidence (count) |\n")
+        self.f.write("|---|---|---|---|---:|\n")
+
+    def add(self, r: dict):
+        evidence = evidence_items(r.get("evidence"))
+        gaps = [str(g) for g in (r.get("gaps") or [])]
+        notes = str(r.get("notes") or "").strip()
+        self.f.write(f"| `{md_cell(r.get('requirement_id'))}` | {md_cell(r.get('milestone'))} | **{md_cell(r.get('status'))}** "
+                     f"| {md_cell(r.get('title'))} | {len(evidence)} |\n")
+        if not (evidence or gaps or notes):
+            return
+        out = [f"### {r.get('requirement_id', '')} — {r.get('title', '')}"]
+        if evidence:
+            out += ["**Evidence:**"] + [f"- {x}" for x in evidence]
+        if gaps:
+            out += ["**Gaps:**"] + [f"- {x}" for x in gaps]
+        if notes:
+            out += ["**Notes:**", notes]
+        self.notes.write(("\n" if self.notes.tell() else "") + "\n".join(out) + "\n")
+
+    def close(self):
+        self.f.write("\n## Notes (only items with evidence/gaps/notes)\n")
+        self.notes.seek(0)
+        shutil.copyfileobj(self.notes, self.f)
+        self.notes.close()
+        _commit_atomic(self.f, self.path)
+
+def write_milestone_summary(path: Path, agg: StatusAggregator):
+    f = _open_atomic(path)
+    f.write("# Milestone Summary (Definition of Done (DoD) rollups)\n\n")
+    f.write("| Milestone | Total | Tested | Implemented | Blocked | Determinants of truth (" + "/".join(DETERMINANTS) + ") |\n")
+    f.write("|---|---:|---:|---:|---:|---|\n")
+    for m, _, _, _ in agg.milestones():
+        st = agg.by_m[m]
+        dets = "/".join(str(st["determinants"][k]) for k in DETERMINANTS)
+        f.write(f"| {md_cell(m or '(none)')} | {st['total']} | {st['tested']} | {st['implemented']} | {st['blocked']} | {dets} |\n")
+    f.write("\n**Milestone Done rule (current):** Done when `Tested == Total` (all requirements in milestone are Tested) "
+            "and each Tested item has at least one `test:` evidence line.\n")
+    _commit_atomic(f, path)
+
+def burnup_svg(points, width: int = 220, height: int = 48) -> str:
+    """Inline SVG: total (grey) and done (green) over runs. points: [(total, done), ...]."""
+    if not points:
+        return ""
+    top = max(t for t, _ in points) or 1
+    step = width / max(1, len(points) - 1)
+
+    def line(vals, color):
+        xy = " ".join(f"{i * step:.1f},{height - v / top * (height - 2) - 1:.1f}" for i, v in enumerate(vals))
+        return f'<polyline fill="none" stroke="{color}" stroke-width="2" points="{xy}"/>'
+
+    return (f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+            + line([t for t, _ in points], "#bbb") + line([d for _, d in points], "#2a9d48") + "</svg>")
+
+def history_trends(history_path: Path, complete_set: set[str], last_runs: int = 30) -> dict:
+    """Burn-up series per milestone and time-in-status rows from the status history store."""
+    from status_history import StatusHistory
+    h = StatusHistory(history_path)
+    try:
+        runs, counts = h.status_counts(last_runs)
+        tis = h.time_in_status(last_runs)
+    finally:
+        h.close()
+    burnup = {}
+    for m, per_run in sorted(counts.items()):
+        burnup[m] = [(sum(c.values()), sum(n for st, n in c.items() if is_complete(st, complete_set)))
+                     for c in (per_run.get(r["run_id"], {}) for r in runs)]
+    stuck = [r for r in tis if not is_complete(r["status"], complete_set)]
+    by_status = {}
+    for r in tis:
+        by_status.setdefault(r["status"], []).append(r["runs"])
+    return {"runs": runs, "burnup": burnup, "stuck": stuck[:NEXT_UP_LIMIT],
+            "by_status": {st: (len(v), sorted(v)[len(v) // 2], max(v)) for st, v in sorted(by_status.items())}}
+
+def _trends_html(trends: dict) -> str:
+    runs = trends["runs"]
+    out = [f"""
+  <div class="row">
+    <div class="card">
+      <h2>Burn-up (last {len(runs)} runs)</h2>
+      <table>
+        <thead><tr><th>Milestone</th><th>Done / Total</th><th>Trend</th></tr></thead>
+        <tbody>
+          """]
+    for m, pts in trends["burnup"].items():
+        t, d = pts[-1] if pts else (0, 0)
+        out.append(f"<tr><td>{esc(m)}</td><td>{d} / {t}</td><td>{burnup_svg(pts)}</td></tr>")
+    out.append("""
+        </tbody>
+      </table>
+    </div>
 
-    html_out = f"""<!doctype html>
+    <div class="card">
+      <h2>Time in status (runs)</h2>
+      <table>
+        <thead><tr><th>Status</th><th>Requirements</th><th>Median</th><th>Max</th></tr></thead>
+        <tbody>
+          """)
+    for st, (n, med, mx) in trends["by_status"].items():
+        out.append(f"<tr><td>{esc(st)}</td><td>{n}</td><td>{med}</td><td>{mx}</td></tr>")
+    out.append("""
+        </tbody>
+      </table>
+      <h3>Longest without progress</h3>
+      <table>
+        <thead><tr><th>ID</th><th>Status</th><th>Since</th><th>Runs</th></tr></thead>
+        <tbody>
+          """)
+    for r in trends["stuck"]:
+        out.append(f"<tr><td><code>{esc(r['requirement_id'])}</code></td><td>{esc(r['status'])}</td>"
+                   f"<td>{esc(r['since_generated_at'])}</td><td>{r['runs']}</td></tr>")
+    out.append("""
+        </tbody>
+      </table>
+    </div>
+  </div>
+""")
+    return "".join(out)
+
+def write_dashboard(path: Path, agg: StatusAggregator, source_name: str, taxonomy_note: str, trends: dict = None):
+    f = _open_atomic(path)
+    f.write(f"""<!doctype html>
 <html>
 <head>
   <meta charset="utf-8"/>
@@ -139,10 +350,10 @@ def main():
 <body>
   <div class="card">
     <h1>RideShare — Requirements Dashboard</h1>
-    <div class="muted">Source: {esc(jsonl_path.name)} (generated by GitHub Actions (GitHub Actions))</div>
+    <div class="muted">Source: {esc(source_name)} (generated by GitHub Actions (GitHub Actions))</div>
     <div class="muted">{esc(taxonomy_note)}</div>
-    <div style="margin-top:12px" class="kpi">{overall_pct:.1f}% complete</div>
-    <div class="muted">{done} done / {total} total</div>
+    <div style="margin-top:12px" class="kpi">{agg.overall_pct:.1f}% complete</div>
+    <div class="muted">{agg.done} done / {agg.total} total</div>
   </div>
 
   <div class="row">
@@ -151,33 +362,160 @@ def main():
       <table>
         <thead><tr><th>Milestone</th><th>Total</th><th>Done</th><th>%</th></tr></thead>
         <tbody>
-          {''.join(f'<tr><td>{esc(m)}</td><td>{t}</td><td>{d}</td><td>{pct:.1f}%</td></tr>' for m,t,d,pct in milestones)}
+          """)
+    for m, t, d, pct in agg.milestones():
+        f.write(f'<tr><td>{esc(m)}</td><td>{t}</td><td>{d}</td><td>{pct:.1f}%</td></tr>')
+    f.write(f"""
         </tbody>
       </table>
     </div>
 
     <div class="card">
-      <h2>Next up (first 25 incomplete)</h2>
+      <h2>Next up (first {agg.next_up_limit} incomplete)</h2>
       <table>
         <thead><tr><th>ID</th><th>Milestone</th><th>Status</th><th>Title</th></tr></thead>
         <tbody>
-          {''.join(
-            f"<tr><td><code>{esc(r.get('requirement_id',''))}</code></td>"
-            f"<td>{esc(r.get('milestone',''))}</td>"
-            f"<td>{esc(r.get('status',''))}</td>"
-            f"<td>{esc(r.get('title',''))}</td></tr>"
-            for r in next_up
-          )}
+          """)
+    for r in agg.next_up():
+        f.write(f"<tr><td><code>{esc(r.get('requirement_id',''))}</code></td>"
+                f"<td>{esc(r.get('milestone',''))}</td>"
+                f"<td>{esc(r.get('status',''))}</td>"
+                f"<td>{esc(r.get('title',''))}</td></tr>")
+    f.write("""
         </tbody>
       </table>
     </div>
   </div>
-</body>
+""")
+    if trends and trends["runs"]:
+        f.write(_trends_html(trends))
+    f.write("""</body>
 </html>
-"""
-    out_html.parent.mkdir(parents=True, exist_ok=True)
-    out_html.write_text(html_out, encoding="utf-8")
-    print("Wrote:", out_html)
+""")
+    _commit_atomic(f, path)
+
+def taxonomy_note_for(taxonomy_path: Path, complete_set: set[str]) -> str:
+    if taxonomy_path and taxonomy_path.exists() and complete_set:
+        return f"Taxonomy: {taxonomy_path.name} (complete states: {len(complete_set)})"
+    if taxonomy_path and taxonomy_path.exists():
+        return f"Taxonomy: {taxonomy_path.name} (loaded, but no explicit complete states found — using fallback)"
+    return "Taxonomy: (none) — using fallback"
+
+@perf_trace.traced("build_reports")
+def build_reports(jsonl_path: Path, out_html: Path = None, taxonomy_path: Path = None,
+                  status_md: Path = None, milestone_md: Path = None, meta: dict = None,
+                  history_path: Path = None, history_runs: int = 30,
+                  store: RequirementsStore = None) -> StatusAggregator:
+    """
+    Reads `jsonl_path` once and writes every requested report from that single pass.
+    `meta` (run_metadata.json contents) fills the requirements_status.md header; an
+    existing `history_path` (status_history.py store) adds trend cards to the dashboard.
+    With a `store` that does not hold this file yet, the same pass loads its rows there.
+    """
+    complete_set = load_complete_statuses(taxonomy_path) if taxonomy_path else set()
+    agg = StatusAggregator(complete_set)
+    md = StatusMarkdownWriter(status_md, meta or {}) if status_md else None
+    ingest = store.status_writer(jsonl_path) if store is not None and not store.current("status", jsonl_path) else None
+    try:
+        for r in iter_jsonl(jsonl_path):
+            agg.add(r)
+            if md:
+                md.add(r)
+            if ingest:
+                ingest.add(r)
+    except BaseException:
+        if md:
+            md.f.close()
+            md.notes.close()
+            os.unlink(md.f.name)
+        if ingest:
+            ingest.abort()
+        raise
+    if md:
+        md.close()
+    if ingest:
+        ingest.close()
+    if milestone_md:
+        write_milestone_summary(milestone_md, agg)
+    if out_html:
+        trends = history_trends(history_path, complete_set, history_runs) if history_path and history_path.exists() else None
+        write_dashboard(out_html, agg, jsonl_path.name, taxonomy_note_for(taxonomy_path, complete_set), trends)
+    return agg
+
+def _bench(max_rows: int):
+    """Peak traced memory of build_reports() at growing input sizes; flat = streaming."""
+    import time, tracemalloc
+    milestones = ["Core/Other", "Dispatch Console", "Driver App", "Payments/Payouts", "Rider App", "Tenant Admin"]
+    statuses = ["NOT_STARTED", "PARTIAL", "IMPLEMENTED_NO_TESTS", "IMPLEMENTED_WITH_TESTS", "BLOCKED_DEPENDENCY"]
+    sizes = sorted({max(1, max_rows // 100), max(1, max_rows // 10), max_rows})
+    with tempfile.TemporaryDirectory() as td:
+        td = Path(td)
+        print(f"{'rows':>10} {'seconds':>9} {'rows/s':>10} {'peak KiB':>10}")
+        for n in sizes:
+            src = td / f"rows_{n}.jsonl"
+            with src.open("w", encoding="utf-8") as f:
+                for i in range(n):
+                    f.write(json.dumps({
+                        "requirement_id": f"BRRS-{i:07d}", "title": f"Requirement {i % 997}",
+                        "milestone": milestones[i % len(milestones)], "status": statuses[(i * 7) % len(statuses)],
+                        "evidence": [f"file:src/m{i % 50}.ts", "route:GET /x"][: i % 3],
+                        "gaps": ["missing tests"] if i % 4 == 0 else [], "notes": "",
+                    }) + "\n")
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            build_reports(src, td / "dashboard.html", None, td / "requirements_status.md", td / "milestone_summary.md")
+            dt = time.perf_counter() - t0
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{n:>10} {dt:>9.2f} {n / dt:>10.0f} {peak / 1024:>10.0f}")
+            src.unlink()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jsonl", required=False, default="", help="Path to requirements_status.jsonl (JSONL (JavaScript Object Notation Lines))")
+    ap.add_argument("--out", required=False, default="", help="Path to dashboard.html (HTML (HyperText Markup Language))")
+    ap.add_argument("--taxonomy", required=False, default="", help="Path to status_taxonomy.json (JSON (JavaScript Object Notation))")
+    ap.add_argument("--status-md", required=False, default="", help="requirements_status.md to write (default: next to --jsonl; 'none' to skip)")
+    ap.add_argument("--milestone-md", required=False, default="", help="milestone_summary.md to write (default: next to --jsonl; 'none' to skip)")
+    ap.add_argument("--history", required=False, default="", help="status_history.sqlite for burn-up / time-in-status cards")
+    ap.add_argument("--history-runs", type=int, default=30, help="How many recent runs the trend cards cover")
+    ap.add_argument("--bench", type=int, default=0, metavar="ROWS", help="Benchmark memory/throughput on synthetic inputs up to ROWS rows.")
+    args = ap.parse_args()
+
+    if args.bench:
+        _bench(args.bench)
+        return
+    if not args.jsonl or not args.out:
+        ap.error("--jsonl and --out are required")
+
+    jsonl_path = Path(args.jsonl)
+    out_html = Path(args.out)
+    taxonomy_path = Path(args.taxonomy) if args.taxonomy else None
+
+    def md_path(arg: str, default_name: str):
+        if arg.strip().lower() == "none":
+            return None
+        return Path(arg) if arg else jsonl_path.with_name(default_name)
+
+    status_md = md_path(args.status_md, "requirements_status.md")
+    milestone_md = md_path(args.milestone_md, "milestone_summary.md")
+    meta_path = jsonl_path.with_name("run_metadata.json")
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8-sig")) if meta_path.exists() else {}
+    except ValueError:
+        meta = {}
+
+    store = RequirementsStore.from_env(Path("."))
+    try:
+        build_reports(jsonl_path, out_html, taxonomy_path, status_md, milestone_md, meta,
+                      history_path=Path(args.history) if args.history else None, history_runs=args.history_runs,
+                      store=store)
+    finally:
+        if store is not None:
+            store.close()
+    for p in (out_html, status_md, milestone_md):
+        if p:
+            print("Wrote:", p)
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run("make_dashboard", main)
@@ -1,5 +1,8 @@
 ﻿import json, os, time
 
+import file_lock
+import perf_trace
+
 # Standard pricing (per 1M tokens)
 RATES = {
   "gpt-5-mini": {"in": 0.25, "out": 2.00},
@@ -7,35 +10,101 @@ RATES = {
   "gpt-5.2":    {"in": 1.75, "out": 14.00},
 }
 
+# Live ledger records are folded into rollups once there are this many of them.
+COMPACT_EVERY = int(os.getenv("OPENAI_LEDGER_COMPACT_EVERY", "5000") or "5000")
+
+# Reservations older than this belong to a process that died mid-call and no longer count.
+RESERVATION_TTL_S = 3600
+
+# Files next to the ledger:
+#   <ledger>.lock          lock file (fcntl/msvcrt), guards everything below
+#   <ledger>.total.json    running total + how many bytes of the live ledger it covers
+#   <ledger>.rollup.json   compacted spend per (day, model, work_tag)
+#   <ledger>.archive.jsonl raw records moved out of the live ledger by compaction
+#   <ledger>.reserved.json estimated cost of calls in flight (reserve() .. settle())
+def _side(ledger_path: str, suffix: str) -> str:
+  return ledger_path + suffix
+
 def cost_usd(model: str, input_tokens: int, output_tokens: int) -> float:
   r = RATES.get(model, RATES["gpt-5-mini"])
   return (input_tokens * r["in"] + output_tokens * r["out"]) / 1_000_000.0
 
-def read_total(ledger_path: str) -> float:
+def _locked(ledger_path: str):
+  return file_lock.locked(_side(ledger_path, ".lock"))
+
+def _write_json_atomic(path: str, obj) -> None:
+  tmp = path + ".tmp"
+  with open(tmp, "w", encoding="utf-8") as f:
+    json.dump(obj, f, ensure_ascii=False)
+    f.flush()
+    os.fsync(f.fileno())
+  os.replace(tmp, path)
+
+def _read_json(path: str):
+  try:
+    with open(path, "r", encoding="utf-8") as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return None
+
+def _iter_records(ledger_path: str, offset: int = 0):
   if not os.path.exists(ledger_path):
-    return 0.0
-  total = 0.0
-  with open(ledger_path, "r", encoding="utf-8") as f:
-    for line in f:
-      line=line.strip()
+    return
+  with open(ledger_path, "rb") as f:
+    f.seek(offset)
+    for raw in f:
+      if not raw.endswith(b"\n"):
+        break  # torn tail from a writer that died mid-line; picked up once completed
+      line = raw.decode("utf-8", errors="replace").strip()
       if not line: continue
       try:
-        total += float(json.loads(line).get("cost_usd", 0.0))
+        yield json.loads(line)
       except Exception:
         pass
+
+def _sum_cost(ledger_path: str, offset: int = 0) -> float:
+  total = 0.0
+  for rec in _iter_records(ledger_path, offset):
+    try:
+      total += float(rec.get("cost_usd", 0.0))
+    except Exception:
+      pass
   return total
 
+def _state(ledger_path: str) -> dict:
+  """
+  Running total, caught up with any records the sidecar doesn't cover yet (e.g. a ledger
+  written before the sidecar existed). Caller must hold the lock.
+  """
+  st = _read_json(_side(ledger_path, ".total.json"))
+  size = os.path.getsize(ledger_path) if os.path.exists(ledger_path) else 0
+  if not isinstance(st, dict) or st.get("offset", 0) > size:
+    rollup = _read_json(_side(ledger_path, ".rollup.json")) or {}
+    st = {"total_usd": float(rollup.get("total_usd", 0.0)), "offset": 0, "live_records": 0}
+  if st["offset"] < size:
+    with open(ledger_path, "rb") as f:
+      f.seek(st["offset"])
+      tail = f.read()
+    complete = tail[:tail.rfind(b"\n") + 1]
+    st["total_usd"] += _sum_cost(ledger_path, st["offset"])
+    st["live_records"] = st.get("live_records", 0) + complete.count(b"\n")
+    st["offset"] += len(complete)
+  return st
+
+def read_total(ledger_path: str) -> float:
+  if not os.path.exists(ledger_path) and not os.path.exists(_side(ledger_path, ".total.json")):
+    return 0.0
+  with _locked(ledger_path):
+    return _state(ledger_path)["total_usd"]
+
 def append(ledger_path: str, rec: dict) -> None:
   os.makedirs(os.path.dirname(ledger_path), exist_ok=True)
   with open(ledger_path, "a", encoding="utf-8") as f:
     f.write(json.dumps(rec, ensure_ascii=False) + "\n")
 
-def record_or_raise(*, ledger_path: str, budget_usd: float, purpose: str, model: str,
-                    input_tokens: int, output_tokens: int, work_tag: str="") -> float:
+def _record_locked(ledger_path: str, st: dict, purpose: str, model: str,
+                   input_tokens: int, output_tokens: int, work_tag: str) -> float:
   c = cost_usd(model, input_tokens, output_tokens)
-  spent = read_total(ledger_path)
-  if spent + c >= budget_usd:
-    raise RuntimeError(f"Budget cap reached: spent=${spent:.2f} + next=${c:.2f} >= cap=${budget_usd:.2f}")
   rec = {
     "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
     "purpose": purpose,
@@ -47,4 +116,190 @@ def record_or_raise(*, ledger_path: str, budget_usd: float, purpose: str, model:
     "work_tag": work_tag,
   }
   append(ledger_path, rec)
-  return read_total(ledger_path)
+  st["total_usd"] += c
+  st["offset"] = os.path.getsize(ledger_path)
+  st["live_records"] = st.get("live_records", 0) + 1
+  _write_json_atomic(_side(ledger_path, ".total.json"), st)
+  if st["live_records"] >= COMPACT_EVERY:
+    _compact_locked(ledger_path, st)
+  return st["total_usd"]
+
+def record_or_raise(*, ledger_path: str, budget_usd: float, purpose: str, model: str,
+                    input_tokens: int, output_tokens: int, work_tag: str="") -> float:
+  c = cost_usd(model, input_tokens, output_tokens)
+  # check + append + total update is one critical section, so parallel workers can't
+  # both pass the check and overspend the cap
+  with _locked(ledger_path):
+    st = _state(ledger_path)
+    spent = st["total_usd"] + sum(r["usd"] for r in _reservations(ledger_path).values())
+    if spent + c >= budget_usd:
+      raise RuntimeError(f"Budget cap reached: spent=${spent:.2f} + next=${c:.2f} >= cap=${budget_usd:.2f}")
+    return _record_locked(ledger_path, st, purpose, model, input_tokens, output_tokens, work_tag)
+
+def _reservations(ledger_path: str) -> dict:
+  # live reservations (expired ones dropped); caller must hold the lock
+  held = _read_json(_side(ledger_path, ".reserved.json")) or {}
+  cutoff = time.time() - RESERVATION_TTL_S
+  return {k: v for k, v in held.items() if v.get("ts", 0) >= cutoff}
+
+def reserve(*, ledger_path: str, budget_usd: float, model: str, input_tokens: int, output_tokens: int,
+            work_tag: str="") -> str:
+  """
+  Holds the estimated cost of a call before it is made: raises RuntimeError when the spend
+  so far plus every call in flight plus this one would reach the cap. Returns a reservation
+  id for settle() (after the call) or release() (when nothing was billed).
+  """
+  c = cost_usd(model, input_tokens, output_tokens)
+  with _locked(ledger_path):
+    held = _reservations(ledger_path)
+    spent = _state(ledger_path)["total_usd"]
+    pending = sum(r["usd"] for r in held.values())
+    if spent + pending + c >= budget_usd:
+      raise RuntimeError(f"Budget cap reached: spent=${spent:.2f} + in flight=${pending:.2f} + next=${c:.2f} "
+                         f">= cap=${budget_usd:.2f}")
+    rid = f"{os.getpid()}-{time.time_ns()}-{len(held)}"
+    held[rid] = {"usd": c, "ts": time.time(), "work_tag": work_tag}
+    _write_json_atomic(_side(ledger_path, ".reserved.json"), held)
+    return rid
+
+def release(ledger_path: str, reservation: str) -> None:
+  with _locked(ledger_path):
+    held = _reservations(ledger_path)
+    if held.pop(reservation, None) is not None:
+      _write_json_atomic(_side(ledger_path, ".reserved.json"), held)
+
+def settle(*, ledger_path: str, reservation: str, purpose: str, model: str,
+           input_tokens: int, output_tokens: int, work_tag: str="") -> float:
+  """
+  Replaces a reservation with the call's actual cost. The record is always appended (the
+  call has been paid for), even when the actual cost overruns the estimate.
+  """
+  with _locked(ledger_path):
+    held = _reservations(ledger_path)
+    held.pop(reservation, None)
+    _write_json_atomic(_side(ledger_path, ".reserved.json"), held)
+    return _record_locked(ledger_path, _state(ledger_path), purpose, model, input_tokens, output_tokens, work_tag)
+
+def _rollup_key(rec: dict) -> str:
+  return "\t".join([str(rec.get("ts", ""))[:10], str(rec.get("model", "")), str(rec.get("work_tag", ""))])
+
+def _add_to_rollup(rows: dict, key: str, cost: float, input_tokens: int, output_tokens: int, n: int = 1) -> None:
+  r = rows.setdefault(key, {"cost_usd": 0.0, "input_tokens": 0, "output_tokens": 0, "requests": 0})
+  r["cost_usd"] += cost
+  r["input_tokens"] += input_tokens
+  r["output_tokens"] += output_tokens
+  r["requests"] += n
+
+def _compact_locked(ledger_path: str, st: dict) -> None:
+  rollup = _read_json(_side(ledger_path, ".rollup.json")) or {"total_usd": 0.0, "rows": {}}
+  lines = []
+  for rec in _iter_records(ledger_path):
+    lines.append(json.dumps(rec, ensure_ascii=False) + "\n")
+    try:
+      _add_to_rollup(rollup["rows"], _rollup_key(rec), float(rec.get("cost_usd", 0.0)),
+                     int(rec.get("input_tokens", 0)), int(rec.get("output_tokens", 0)))
+    except Exception:
+      pass
+  rollup["total_usd"] = st["total_usd"]
+  # archive first: a crash after this point leaves the records in both places, and the
+  # rollup/sidecar (written next) are what totals are read from
+  with open(_side(ledger_path, ".archive.jsonl"), "a", encoding="utf-8") as f:
+    f.writelines(lines)
+  _write_json_atomic(_side(ledger_path, ".rollup.json"), rollup)
+  with open(ledger_path, "w", encoding="utf-8"):
+    pass
+  st.update({"offset": 0, "live_records": 0})
+  _write_json_atomic(_side(ledger_path, ".total.json"), st)
+
+def compact(ledger_path: str) -> None:
+  """Folds the live ledger into per-day/model/work_tag rollups and archives the raw records."""
+  with _locked(ledger_path):
+    _compact_locked(ledger_path, _state(ledger_path))
+
+def spend_report(ledger_path: str, by=("day",), since: str = "") -> list:
+  """
+  Spend grouped by any of "day", "model", "work_tag" (rollups + live records), e.g.
+  spend_report(p, by=("day","model"), since="2026-02-01"). Sorted by the group keys.
+  """
+  dims = ("day", "model", "work_tag")
+  with _locked(ledger_path):
+    rows = dict((_read_json(_side(ledger_path, ".rollup.json")) or {}).get("rows", {}))
+    rows = {k: dict(v) for k, v in rows.items()}
+    for rec in _iter_records(ledger_path):
+      try:
+        _add_to_rollup(rows, _rollup_key(rec), float(rec.get("cost_usd", 0.0)),
+                       int(rec.get("input_tokens", 0)), int(rec.get("output_tokens", 0)))
+      except Exception:
+        pass
+  out = {}
+  for key, r in rows.items():
+    parts = dict(zip(dims, key.split("\t")))
+    if since and parts["day"] < since:
+      continue
+    gk = tuple(parts[d] for d in by)
+    _add_to_rollup(out, gk, r["cost_usd"], r["input_tokens"], r["output_tokens"], r["requests"])
+  return [dict(zip(by, k), **v) for k, v in sorted(out.items())]
+
+def _stress_worker(ledger_path: str, budget_usd: float, seed: int) -> int:
+  import random
+  rnd = random.Random(seed)
+  n = 0
+  while True:
+    tin, tout = rnd.randint(1_000, 50_000), rnd.randint(100, 5_000)
+    tag = f"w{seed % 3}"
+    try:
+      if n % 2:
+        record_or_raise(ledger_path=ledger_path, budget_usd=budget_usd, purpose="stress", model="gpt-5",
+                        input_tokens=tin, output_tokens=tout, work_tag=tag)
+      else:
+        # reserve an upper bound, "make the call", settle the actual (smaller) usage
+        rid = reserve(ledger_path=ledger_path, budget_usd=budget_usd, model="gpt-5",
+                      input_tokens=tin, output_tokens=5_000, work_tag=tag)
+        time.sleep(rnd.random() * 0.002)
+        settle(ledger_path=ledger_path, reservation=rid, purpose="stress", model="gpt-5",
+               input_tokens=tin, output_tokens=tout, work_tag=tag)
+      n += 1
+    except RuntimeError:
+      return n
+
+def main() -> int:
+  import argparse, sys, tempfile
+  from concurrent.futures import ProcessPoolExecutor
+
+  ap = argparse.ArgumentParser(description="OpenAI usage ledger: spend reports, compaction, budget stress check.")
+  sub = ap.add_subparsers(dest="cmd", required=True)
+  rp = sub.add_parser("report", help="Print spend grouped by day/model/work_tag.")
+  rp.add_argument("ledger")
+  rp.add_argument("--by", default="day", help="Comma-separated: day,model,work_tag")
+  rp.add_argument("--since", default="", help="YYYY-MM-DD")
+  cp = sub.add_parser("compact", help="Fold the live ledger into rollups.")
+  cp.add_argument("ledger")
+  sp = sub.add_parser("stress", help="Hammer a scratch ledger from many processes and check the cap holds.")
+  sp.add_argument("--workers", type=int, default=8)
+  sp.add_argument("--budget", type=float, default=5.0)
+  args = ap.parse_args()
+
+  if args.cmd == "report":
+    for r in spend_report(args.ledger, by=tuple(x.strip() for x in args.by.split(",") if x.strip()), since=args.since):
+      print(json.dumps(r, ensure_ascii=False))
+    return 0
+  if args.cmd == "compact":
+    compact(args.ledger)
+    print(f"OK: compacted {args.ledger} (total=${read_total(args.ledger):.4f})")
+    return 0
+
+  with tempfile.TemporaryDirectory() as td:
+    ledger = os.path.join(td, "ledger.jsonl")
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+      counts = list(ex.map(_stress_worker, [ledger] * args.workers, [args.budget] * args.workers, range(args.workers)))
+    total = read_total(ledger)
+    raw = _sum_cost(ledger) + _sum_cost(_side(ledger, ".archive.jsonl"))
+    print(f"workers={args.workers} records={sum(counts)} total=${total:.4f} cap=${args.budget:.2f}")
+    if total >= args.budget or abs(total - raw) > 1e-6:
+      print(f"FAIL: cap exceeded or running total drifted (raw sum=${raw:.4f})", file=sys.stderr)
+      return 1
+    print("OK: budget cap held under concurrency.")
+    return 0
+
+if __name__ == "__main__":
+  raise SystemExit(perf_trace.run("openai_usage_ledger", main))
@@ -0,0 +1,242 @@
+import argparse, cProfile, functools, io, json, os, pstats, sys, threading, time
+from pathlib import Path
+
+import file_lock
+
+# Shared instrumentation for the pipeline scripts: span timers, counters, optional
+# tracemalloc peaks and per-stage cProfile. Everything is off unless switched on:
+#
+#   PERF_TRACE=1           append this process's events to Artifacts/perf_trace.json
+#   PERF_TRACE=<path>      ... to <path> instead (Chrome trace format; open in Perfetto
+#                          or chrome://tracing)
+#   PERF_TRACEMALLOC=1     also record the tracemalloc peak of every span (slow)
+#   PERF_PROFILE=<stages>  cProfile the named stages ("all" for every stage) into
+#                          Artifacts/profile_<stage>.pstats plus a .txt top-40 listing
+#
+# Disabled, span() returns a shared no-op context manager and count() returns at once.
+
+DEFAULT_PATH = Path("Artifacts") / "perf_trace.json"
+PROFILE_DIR = Path("Artifacts")
+
+def _env_path(name: str, default: Path):
+    setting = os.getenv(name, "").strip()
+    if not setting or setting.lower() in {"0","off","false","no"}:
+        return None
+    return default if setting.lower() in {"1","on","true","yes"} else Path(setting)
+
+TRACE_PATH = _env_path("PERF_TRACE", DEFAULT_PATH)
+ENABLED = TRACE_PATH is not None
+TRACEMALLOC = ENABLED and os.getenv("PERF_TRACEMALLOC", "").strip() not in {"", "0"}
+
+_events = []
+_counters = {}
+_local = threading.local()
+
+def _now_us() -> int:
+    # wall-clock microseconds, so events from successive processes line up on one timeline
+    return time.time_ns() // 1000
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+_NULL = _NullSpan()
+
+class _Span:
+    __slots__ = ("name", "args", "t0", "frame")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+    def set(self, **args):
+        """Attaches values known only inside the span (counts, sizes) to its event."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.frame = None
+        if TRACEMALLOC and threading.current_thread() is threading.main_thread():
+            self.frame = _malloc_enter()
+        self.t0 = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        t1 = _now_us()
+        if self.frame is not None:
+            self.args["tracemalloc_peak_kib"] = _malloc_exit(self.frame) // 1024
+        _events.append({"name": self.name, "cat": "span", "ph": "X", "ts": self.t0, "dur": t1 - self.t0,
+                        "pid": os.getpid(), "tid": threading.get_ident(), "args": self.args})
+        return False
+
+def span(name: str, **args):
+    """Times a block: `with span("walk", root=str(root)): ...`. A no-op unless tracing is on."""
+    if not ENABLED:
+        return _NULL
+    return _Span(name, args)
+
+def traced(name: str = None):
+    """
+    Decorator form of span() for whole functions. With tracing off the function is
+    returned unchanged, so decorated hot paths cost nothing.
+    """
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__qualname__
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with _Span(label, {}):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def count(name: str, n: int = 1):
+    """Adds `n` to a process-wide counter (files_read, bytes_read, route_matches, tokens_sent...)."""
+    if ENABLED:
+        _counters[name] = _counters.get(name, 0) + n
+
+# tracemalloc keeps one process-wide peak; nested spans each reset it on entry and fold
+# their own peak back into the enclosing span on exit.
+
+def _malloc_enter():
+    import tracemalloc
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    stack = getattr(_local, "malloc", None)
+    if stack is None:
+        stack = _local.malloc = []
+    if stack:
+        stack[-1][0] = max(stack[-1][0], tracemalloc.get_traced_memory()[1])
+    frame = [0]
+    stack.append(frame)
+    tracemalloc.reset_peak()
+    return frame
+
+def _malloc_exit(frame) -> int:
+    import tracemalloc
+    peak = max(tracemalloc.get_traced_memory()[1], frame[0])
+    stack = _local.malloc
+    stack.pop()
+    if stack:
+        stack[-1][0] = max(stack[-1][0], peak)
+    return peak
+
+def _profiled(stage: str) -> bool:
+    wanted = {s.strip() for s in os.getenv("PERF_PROFILE", "").split(",") if s.strip()}
+    return "all" in wanted or stage in wanted
+
+def run(stage: str, fn, *args, **kwargs):
+    """
+    Runs a script's entry point as pipeline stage `stage`: one top-level span, the
+    counters as a counter track, and a profile when PERF_PROFILE names the stage. The
+    trace is written even when `fn` raises (SystemExit included).
+    """
+    profile = cProfile.Profile() if _profiled(stage) else None
+    if not ENABLED and profile is None:
+        return fn(*args, **kwargs)
+    # profiling alone still runs the stage, just without a span to record
+    s = _Span(stage, {"argv": sys.argv[1:]}) if ENABLED else _NULL
+    try:
+        with s:
+            if profile is not None:
+                return profile.runcall(fn, *args, **kwargs)
+            return fn(*args, **kwargs)
+    finally:
+        if profile is not None:
+            _write_profile(stage, profile)
+        if ENABLED:
+            s.args["counters"] = dict(_counters)
+            _flush(stage)
+
+def _write_profile(stage: str, profile: cProfile.Profile):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    out = PROFILE_DIR / f"profile_{stage}.pstats"
+    profile.dump_stats(str(out))
+    buf = io.StringIO()
+    pstats.Stats(profile, stream=buf).sort_stats("cumulative").print_stats(40)
+    out.with_suffix(".txt").write_text(buf.getvalue(), encoding="utf-8")
+    print(f"INFO: cProfile for {stage}: {out}", file=sys.stderr)
+
+def _flush(stage: str):
+    pid = os.getpid()
+    end = _now_us()
+    events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": stage}}]
+    events += _events
+    if _counters:
+        events.append({"name": "counters", "ph": "C", "ts": end, "pid": pid, "args": dict(_counters)})
+    _events.clear()
+    TRACE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # stages run concurrently: without the lock two that finish together lose each other's events
+    with file_lock.locked(TRACE_PATH.with_name(TRACE_PATH.name + ".lock")):
+        try:
+            data = json.loads(TRACE_PATH.read_text(encoding="utf-8"))
+            prior = data.get("traceEvents", []) if isinstance(data, dict) else []
+        except (OSError, ValueError):
+            prior = []
+        tmp = TRACE_PATH.with_name(f"{TRACE_PATH.name}.{pid}.tmp")
+        tmp.write_text(json.dumps({"traceEvents": prior + events, "displayTimeUnit": "ms"}), encoding="utf-8")
+        os.replace(tmp, TRACE_PATH)
+
+def summarize(trace: dict) -> list:
+    """Plain-text table lines: one row per stage run, then the slowest spans overall."""
+    events = trace.get("traceEvents", [])
+    stages = {e["pid"]: e["args"]["name"] for e in events if e.get("ph") == "M" and e.get("name") == "process_name"}
+    lines = ["=== PERF SUMMARY ===",
+             f"{'stage':<34} {'wall_ms':>10} {'peak_kib':>10}  counters"]
+    spans = {}
+    for e in events:
+        if e.get("ph") != "X":
+            continue
+        args = e.get("args") or {}
+        if stages.get(e["pid"]) == e["name"] and "counters" in args:
+            ctr = " ".join(f"{k}={v}" for k, v in sorted(args["counters"].items()))
+            peak = args.get("tracemalloc_peak_kib", "")
+            lines.append(f"{e['name']:<34} {e['dur'] / 1000:>10.1f} {peak:>10}  {ctr}")
+        else:
+            agg = spans.setdefault((stages.get(e["pid"], "?"), e["name"]), [0, 0, 0])
+            agg[0] += 1
+            agg[1] += e["dur"]
+            agg[2] = max(agg[2], e["dur"])
+    if spans:
+        lines.append(f"{'span (stage)':<48} {'calls':>6} {'total_ms':>10} {'max_ms':>10}")
+        for (stage, name), (n, total, mx) in sorted(spans.items(), key=lambda kv: -kv[1][1])[:25]:
+            label = f"{name} ({stage})"
+            lines.append(f"{label:<48} {n:>6} {total / 1000:>10.1f} {mx / 1000:>10.1f}")
+    return lines
+
+def main():
+    ap = argparse.ArgumentParser(description="Pipeline trace tools.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("summary", help="Print a per-stage table of a perf trace.")
+    s.add_argument("--trace", default=str(TRACE_PATH or DEFAULT_PATH))
+    s.add_argument("--append", default="", help="Also append the table to this log (e.g. Artifacts/audit_log.txt)")
+    r = sub.add_parser("reset", help="Start a new trace (deletes the trace file).")
+    r.add_argument("--trace", default=str(TRACE_PATH or DEFAULT_PATH))
+    args = ap.parse_args()
+
+    path = Path(args.trace)
+    if args.cmd == "reset":
+        path.unlink(missing_ok=True)
+        return 0
+    try:
+        trace = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        print(f"No perf trace at {path} (set PERF_TRACE=1 to record one).")
+        return 0
+    lines = summarize(trace)
+    print("\n".join(lines))
+    if args.append:
+        with open(args.append, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+import argparse, json, os, platform, random, statistics, subprocess, sys, tempfile, time
+from pathlib import Path
+
+# Benchmarks the requirements pipeline stages end to end on deterministic synthetic
+# repositories. Each stage runs as its own process (as in CI), so wall time and peak RSS
+# are the stage's own. Results are JSON; `compare` fails when a stage got slower or
+# bigger than a baseline by more than the threshold. Baselines are machine-specific and
+# not committed: ci_pipeline_bench.yml times the base commit's scripts with
+# `run --update-baseline --skip-failed` on the same runner, then the change's, then
+# compares. This file is copied into the base tree for that, so it imports nothing
+# from scripts/; stages an older script can't run (different CLI) are left out of
+# the baseline and so not compared.
+
+SCRIPTS = Path(__file__).resolve().parent
+RESULT_VERSION = 1
+DEFAULT_SCALES = [1000, 10000, 100000]
+DEFAULT_BASELINE = Path("Artifacts") / "bench" / "pipeline_baseline.json"
+
+STATUSES = ["NOT_STARTED", "PARTIAL", "IMPLEMENTED_NO_TESTS", "IMPLEMENTED_WITH_TESTS", "BLOCKED_DEPENDENCY",
+            "NEEDS_REFACTOR", "DEPRECATED", "UNKNOWN_REVIEW_NEEDED"]
+RESOURCES = ["drivers", "riders", "trips", "payments", "offers", "payouts", "vehicles", "documents",
+             "ratings", "promotions", "dispatch", "zones", "fares", "invoices", "support", "fleet"]
+VERBS = ["create", "list", "update", "cancel", "approve", "assign", "refund", "verify", "export", "sync"]
+WORDS = ["driver", "rider", "trip", "payment", "offer", "payout", "vehicle", "document", "rating", "zone",
+         "fare", "invoice", "support", "fleet", "dispatch", "audit", "webhook", "schedule", "surge", "wallet"]
+
+# stage -> (script, args, what "items" counts)
+STAGES = [
+    ("sync_requirements_from_md", "sync_requirements_from_md.py",
+     ["--md", "Requirements/CANONICAL.md", "--json", "Requirements/CANONICAL.json", "--jsonl", "Requirements/requirements.jsonl"],
+     "requirements"),
+    ("as_is_scan", "as_is_scan.py", [], "files"),
+    ("seed_status", "seed_status.py", [], "files"),
+    ("make_dashboard", "make_dashboard.py",
+     ["--jsonl", "AgentOutput/requirements_status.jsonl", "--out", "AgentOutput/dashboard.html"],
+     "requirements"),
+    ("validate_agent_output", "validate_agent_output.py", [], "requirements"),
+]
+
+def scale_shape(files: int) -> dict:
+    """N route files plus the migrations, tests and ### sections that go with them."""
+    return {
+        "files": files,
+        "migrations": max(10, files // 20),
+        "tests": max(10, files // 10),
+        "requirements": max(50, min(files // 20, 5000)),
+    }
+
+def _write(root: Path, rel: str, text: str, sizes: list):
+    p = root / rel
+    p.parent.mkdir(parents=True, exist_ok=True)
+    data = text.encode("utf-8")
+    p.write_bytes(data)
+    sizes.append(len(data))
+
+def _nest_controller(rnd, res: str, i: int) -> str:
+    lines = ["import { Controller, Get, Post, Put, Param, Body } from '@nestjs/common';", "",
+             f"@Controller('{res}')", f"export class {res.title()}{i}Controller {{"]
+    for k in range(rnd.randint(2, 6)):
+        verb = rnd.choice(VERBS)
+        deco = rnd.choice(["Get", "Post", "Put"])
+        route = rnd.choice([f"{verb}", f":id/{verb}", f"{verb}/:{res[:-1]}Id", f"v{k}/{verb}"])
+        lines += [f"  @{deco}('{route}')", f"  {verb}{k}(@Param('id') id: string, @Body() body: any) {{",
+                  f"    return this.service.{verb}({res!r}, id, body);", "  }", ""]
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def _express_router(rnd, res: str) -> str:
+    lines = ["const express = require('express');", "const router = express.Router();", ""]
+    for _ in range(rnd.randint(2, 6)):
+        verb = rnd.choice(VERBS)
+        method = rnd.choice(["get", "post", "put", "delete"])
+        route = rnd.choice([f"/{res}/{verb}", f"/{res}/:id/{verb}", f"/{res}/:id"])
+        lines.append(f"router.{method}('{route}', async (req, res) => res.json({{ ok: true, op: '{verb}' }}));")
+    lines += ["", "module.exports = router;"]
+    return "\n".join(lines) + "\n"
+
+def _lockfile(files: int) -> str:
+    deps = {f"node_modules/@synthetic/{RESOURCES[i % len(RESOURCES)]}-{i}": {
+        "version": f"1.{i % 10}.{i % 7}", "resolved": f"https://registry.npmjs.org/@synthetic/pkg-{i}.tgz",
+        "integrity": f"sha512-{i:064x}"} for i in range(max(50, files // 4))}
+    return json.dumps({"name": "synthetic-rideshare", "lockfileVersion": 3, "packages": deps}, indent=2) + "\n"
+
+def _bundle(rnd, group: int) -> str:
+    # one long line, as bundlers emit; routes inside it must not be reported
+    calls = [f"app.{rnd.choice(['get', 'post'])}('/{rnd.choice(RESOURCES)}/{rnd.choice(VERBS)}',h{k})" for k in range(1500)]
+    return f"!function(){{var app=require('express')();{';'.join(calls)};module.exports=app}}();/* app{group} */\n"
+
+def _generated_types(rnd, group: int) -> str:
+    lines = ["// @generated by supabase gen types -- DO NOT EDIT", "export type Database = {"]
+    for k in range(400):
+        res = rnd.choice(RESOURCES)
+        lines.append(f"  {res}_{group}_{k}: {{ Row: {{ id: string; {rnd.choice(WORDS)}_id: string | null }} }};")
+    return "\n".join(lines + ["};"]) + "\n"
+
+def _prose(rnd, n: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(n))
+
+def generate(root: Path, files: int, migrations: int, tests: int, requirements: int, seed: int = 1) -> dict:
+    """
+    Writes a synthetic repository under `root`: `files` TS/JS route files (NestJS
+    controllers and Express routers, <=200 per directory), `migrations` SQL migrations,
+    `tests` spec files, Requirements/CANONICAL.md with `requirements` ### sections, and the
+    AgentInput/AgentOutput files the later stages read. Like a real checkout it also holds
+    content scans should skip: a package-lock.json, and per directory group a minified
+    bundle and a generated types file. Same arguments, same bytes.
+    """
+    rnd = random.Random(seed)
+    sizes = []
+    _write(root, "package.json", json.dumps({"name": "synthetic-rideshare", "private": True}, indent=2) + "\n", sizes)
+    _write(root, "package-lock.json", _lockfile(files), sizes)
+    for group in range((files + 199) // 200):
+        _write(root, f"apps/app{group}/public/vendor.min.js", _bundle(rnd, group), sizes)
+        _write(root, f"services/svc{group}/src/generated/database.types.ts", _generated_types(rnd, group), sizes)
+    for i in range(files):
+        res = RESOURCES[i % len(RESOURCES)]
+        group = i // 200
+        if i % 2 == 0:
+            _write(root, f"services/svc{group}/src/controllers/{res}{i}.controller.ts", _nest_controller(rnd, res, i), sizes)
+        else:
+            _write(root, f"apps/app{group}/src/routes/{res}{i}.js", _express_router(rnd, res), sizes)
+    for i in range(migrations):
+        res = RESOURCES[i % len(RESOURCES)]
+        _write(root, f"supabase/migrations/{20240101000000 + i}_{res}.sql",
+               f"create table if not exists {res}_{i} (\n  id uuid primary key,\n  note text\n);\n"
+               f"create index on {res}_{i} (id);\n", sizes)
+    for i in range(tests):
+        res = RESOURCES[i % len(RESOURCES)]
+        _write(root, f"services/svc{i // 200}/test/{res}{i}.spec.ts",
+               f"describe('{res} {i}', () => {{\n  it('{rnd.choice(VERBS)}s', () => expect(true).toBe(true));\n}});\n", sizes)
+
+    md = ["# Synthetic RideShare requirements", ""]
+    seed_rows, status_rows = [], []
+    for r in range(requirements):
+        res = RESOURCES[r % len(RESOURCES)]
+        verb = rnd.choice(VERBS)
+        rid = f"BRRS-{r + 1:04d}"
+        title = f"{res.title()} {verb} flow {r}"
+        body = _prose(rnd, rnd.randint(30, 120))
+        md += [f"### {title}", f"milestone: M{r % 6}", f"priority: P{r % 3}", "", body, "",
+               f"Endpoint: `POST /{res}/{verb}`", "", "acceptance:", f"- {res} can {verb}", f"- audit entry for {verb}", ""]
+        seed_rows.append({"requirement_id": rid, "title": title, "description": body,
+                          "missing_acceptance_criteria": False})
+        status_rows.append({
+            "requirement_id": rid, "title": title, "milestone": f"M{r % 6}", "status": rnd.choice(STATUSES),
+            "evidence": [f"POST /{res}/{verb}", f"services/svc0/src/controllers/{res}{r % max(files, 1)}.controller.ts"],
+            "gaps": [] if r % 3 else [f"no test for {verb}"], "notes": f"implement {verb}",
+        })
+    _write(root, "Requirements/CANONICAL.md", "\n".join(md) + "\n", sizes)
+    _write(root, "AgentInput/requirements.jsonl", "".join(json.dumps(x) + "\n" for x in seed_rows), sizes)
+    _write(root, "AgentOutput/requirements_status.jsonl", "".join(json.dumps(x) + "\n" for x in status_rows), sizes)
+    _write(root, "AgentOutput/requirements_status.md", "# Requirements Status\n", sizes)
+    _write(root, "AgentOutput/implemented_not_documented.md", "# Implemented-But-Not-Documented\n", sizes)
+    return {"files": files, "migrations": migrations, "tests": tests, "requirements": requirements,
+            "written": len(sizes), "bytes": sum(sizes)}
+
+def run_stage(script: str, args: list, cwd: Path, env: dict) -> dict:
+    """Runs one pipeline script in `cwd`; wall time and the process's own peak RSS."""
+    with tempfile.TemporaryFile() as err:
+        t0 = time.perf_counter()
+        p = subprocess.Popen([sys.executable, str(SCRIPTS / script)] + args, cwd=cwd, env=env,
+                             stdout=subprocess.DEVNULL, stderr=err)
+        rss_kb = None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(p.pid, 0)
+            p.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            rss_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        else:
+            p.wait()
+        wall = time.perf_counter() - t0
+        if p.returncode != 0:
+            err.seek(0)
+            tail = err.read().decode("utf-8", errors="replace")[-2000:]
+            raise SystemExit(f"Stage {script} failed (exit {p.returncode}) in {cwd}:\n{tail}")
+    return {"wall_s": round(wall, 4), "peak_rss_kb": rss_kb}
+
+def bench_scale(files: int, repeat: int, keep: Path = None, skip_failed: bool = False) -> dict:
+    shape = scale_shape(files)
+    env = dict(os.environ)
+    # measure the work itself, not a warm fact cache left over from a previous stage/run
+    env.update({"FILE_FACT_CACHE": "0", "EVAL_CACHE": "0", "PYTHONDONTWRITEBYTECODE": "1"})
+    with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as td:
+        root = keep / f"repo_{files}" if keep else Path(td)
+        t0 = time.perf_counter()
+        repo = generate(root, **shape)
+        repo["generate_s"] = round(time.perf_counter() - t0, 2)
+        total_files = shape["files"] + shape["migrations"] + shape["tests"]
+        counts = {"files": total_files, "requirements": shape["requirements"]}
+        stages = {}
+        for name, script, args, unit in STAGES:
+            try:
+                runs = [run_stage(script, args, root, env) for _ in range(repeat)]
+            except SystemExit as e:
+                if not skip_failed:
+                    raise
+                print(f"  {name:<26} skipped: {str(e).splitlines()[0]}")
+                continue
+            wall = statistics.median(r["wall_s"] for r in runs)
+            rss = [r["peak_rss_kb"] for r in runs if r["peak_rss_kb"] is not None]
+            stages[name] = {
+                "wall_s": round(wall, 4),
+                "peak_rss_kb": max(rss) if rss else None,
+                "items": counts[unit],
+                "unit": unit,
+                "items_per_s": round(counts[unit] / wall, 1) if wall > 0 else None,
+            }
+            print(f"  {name:<26} {wall:8.3f}s  {stages[name]['peak_rss_kb'] or 0:>9} KiB  "
+                  f"{stages[name]['items_per_s'] or 0:>10.1f} {unit}/s")
+    return {"repo": repo, "stages": stages}
+
+def run(scales, repeat: int, out: Path, keep: Path = None, skip_failed: bool = False) -> dict:
+    result = {
+        "version": RESULT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": repeat,
+        "scales": {},
+    }
+    for files in scales:
+        print(f"scale: {files} route files")
+        result["scales"][str(files)] = bench_scale(files, repeat, keep, skip_failed)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(out.name + ".tmp")
+    tmp.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, out)
+    print(f"Wrote: {out}")
+    return result
+
+def compare(baseline: dict, current: dict, threshold: float, rss_threshold: float, min_seconds: float) -> list:
+    """
+    Regressions of `current` against `baseline`, for every scale/stage present in both:
+    wall time more than `threshold` slower (stages faster than `min_seconds` in both runs
+    are noise and skipped), or peak RSS more than `rss_threshold` larger.
+    """
+    out = []
+    for scale, cur in sorted(current.get("scales", {}).items(), key=lambda kv: int(kv[0])):
+        base = baseline.get("scales", {}).get(scale)
+        if base is None:
+            continue
+        for stage, c in cur["stages"].items():
+            b = base["stages"].get(stage)
+            if b is None:
+                continue
+            if max(b["wall_s"], c["wall_s"]) >= min_seconds and c["wall_s"] > b["wall_s"] * (1 + threshold):
+                out.append(f"{scale}/{stage}: wall {b['wall_s']:.3f}s -> {c['wall_s']:.3f}s "
+                           f"(+{(c['wall_s'] / b['wall_s'] - 1) * 100:.0f}%)")
+            if b.get("peak_rss_kb") and c.get("peak_rss_kb") and c["peak_rss_kb"] > b["peak_rss_kb"] * (1 + rss_threshold):
+                out.append(f"{scale}/{stage}: peak RSS {b['peak_rss_kb']} KiB -> {c['peak_rss_kb']} KiB "
+                           f"(+{(c['peak_rss_kb'] / b['peak_rss_kb'] - 1) * 100:.0f}%)")
+    return out
+
+def _load(path: Path) -> dict:
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        hint = " (write one with `run --update-baseline`)" if Path(path) == DEFAULT_BASELINE else ""
+        raise SystemExit(f"Benchmark result not found: {path}{hint}")
+    if data.get("version") != RESULT_VERSION:
+        raise SystemExit(f"Unsupported benchmark result version in {path}: {data.get('version')}")
+    return data
+
+def main():
+    ap = argparse.ArgumentParser(description="Requirements pipeline benchmarks on synthetic repositories.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="Generate synthetic repos and time every pipeline stage.")
+    r.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES),
+                   help="Comma-separated route-file counts (default: 1000,10000,100000)")
+    r.add_argument("--repeat", type=int, default=1, help="Runs per stage; the median wall time is kept")
+    r.add_argument("--out", default=str(Path("Artifacts") / "bench" / "pipeline_latest.json"))
+    r.add_argument("--keep", default="", help="Keep the generated repos under this directory")
+    r.add_argument("--update-baseline", action="store_true", help=f"Also write the result to {DEFAULT_BASELINE}")
+    r.add_argument("--skip-failed", action="store_true",
+                   help="Leave out stages whose script fails instead of aborting (for timing older trees)")
+
+    c = sub.add_parser("compare", help="Fail if a result regressed against a baseline.")
+    c.add_argument("current", nargs="?", default=str(Path("Artifacts") / "bench" / "pipeline_latest.json"))
+    c.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    c.add_argument("--threshold", type=float, default=0.25, help="Allowed wall-time slowdown (0.25 = 25%%)")
+    c.add_argument("--rss-threshold", type=float, default=0.25, help="Allowed peak-RSS growth")
+    c.add_argument("--min-seconds", type=float, default=0.2, help="Ignore wall-time changes of stages faster than this")
+
+    g = sub.add_parser("generate", help="Only write a synthetic repo.")
+    g.add_argument("root")
+    g.add_argument("--files", type=int, default=1000)
+    g.add_argument("--seed", type=int, default=1)
+
+    args = ap.parse_args()
+    if args.cmd == "generate":
+        info = generate(Path(args.root), seed=args.seed, **scale_shape(args.files))
+        print(json.dumps(info))
+        return 0
+    if args.cmd == "run":
+        scales = [int(s) for s in args.scales.split(",") if s.strip()]
+        result = run(scales, max(1, args.repeat), Path(args.out), Path(args.keep) if args.keep else None,
+                     args.skip_failed)
+        if args.update_baseline:
+            DEFAULT_BASELINE.parent.mkdir(parents=True, exist_ok=True)
+            DEFAULT_BASELINE.write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+            print(f"Wrote: {DEFAULT_BASELINE}")
+        return 0
+    regressions = compare(_load(args.baseline), _load(args.current), args.threshold, args.rss_threshold, args.min_seconds)
+    if regressions:
+        print(f"FAIL: {len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"OK: no regressions beyond {args.threshold:.0%} wall / {args.rss_threshold:.0%} RSS against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,493 @@
+import argparse, ctypes, ctypes.util, errno, json, os, select, socket, socketserver, struct, sys, threading, time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import as_is_scan
+from evidence_index import EVIDENCE_EXTS, SKIP_DIRS as EVIDENCE_SKIP_DIRS, EvidenceIndex, is_generated
+from evidence_rank import BM25Ranker, dir_boosts_from_env
+from file_fact_cache import FileFactCache
+from git_history import GitHistory
+import perf_trace
+from repo_walker import iter_files, iter_paths, walk, walk_key
+import seed_status
+
+# Long-running repository inventory for local work. `serve` builds the as_is_scan
+# collectors and the evidence index once, keeps them in memory and patches them from
+# filesystem change notifications; `query` asks it things over a Unix socket:
+#
+#   python scripts/repo_daemon.py serve &
+#   python scripts/repo_daemon.py query evidence BRRS-0001
+#   python scripts/repo_daemon.py query endpoints services/api/src/trips.controller.ts
+#   python scripts/repo_daemon.py query emit        # rewrite AgentInput/as_is_scan.{json,md}
+#   python scripts/repo_daemon.py query seed        # rewrite AgentInput/requirements_status_seed.*
+#   python scripts/repo_daemon.py query stop
+#
+# The protocol is one JSON object per line each way: {"op": ..., ...} -> {"ok": ..., "result": ..., "ms": ...}.
+
+ROOT = Path(".").resolve()
+DEFAULT_SOCKET = Path("Artifacts") / "repo_daemon.sock"
+
+# Directories neither the scan nor the evidence index descends into are not watched.
+WATCH_SKIP_DIRS = as_is_scan.SKIP_DIRS & EVIDENCE_SKIP_DIRS
+
+# Events arriving within this window of each other are applied as one batch.
+DEBOUNCE_S = 0.1
+
+# Minimum seconds between fact cache writes while serving (it is also written on exit).
+CACHE_SAVE_S = 300
+
+def socket_path(arg: str = "") -> Path:
+    return Path(arg or os.getenv("REPO_DAEMON_SOCKET", "") or DEFAULT_SOCKET)
+
+def now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+# inotify(7) constants
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+EVENT = struct.Struct("iIII")
+
+class InotifyWatcher:
+    """
+    Linux inotify through libc, one watch per directory. poll() returns the changed
+    repo-relative paths (directories with a trailing "/"), or None when the kernel queue
+    overflowed and everything must be rescanned.
+    """
+    kind = "inotify"
+
+    def __init__(self, root: Path, skip_dirs):
+        self.root = root
+        self.skip_dirs = skip_dirs
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.wds = {}
+        try:
+            self._add_tree("")
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def _add_dir(self, rel: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(str(self.root / rel)), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return  # gone again before we got to it
+            raise OSError(err, f"inotify_add_watch {rel or '.'}: {os.strerror(err)} (raise fs.inotify.max_user_watches or use --poll)")
+        self.wds[wd] = rel
+
+    def _add_tree(self, rel: str):
+        stack = [rel]
+        while stack:
+            d = stack.pop()
+            self._add_dir(d)
+            try:
+                with os.scandir(self.root / d) as it:
+                    for e in it:
+                        if e.name not in self.skip_dirs and e.is_dir(follow_symlinks=False):
+                            stack.append(f"{d}/{e.name}" if d else e.name)
+            except OSError:
+                continue
+
+    def _drop_tree(self, rel: str):
+        for wd, r in list(self.wds.items()):
+            if r == rel or r.startswith(rel + "/"):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.wds[wd]
+
+    def poll(self, timeout: float):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            off = 0
+            while off < len(data):
+                wd, mask, _cookie, n = EVENT.unpack_from(data, off)
+                name = os.fsdecode(data[off + EVENT.size: off + EVENT.size + n].rstrip(b"\0"))
+                off += EVENT.size + n
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if mask & IN_IGNORED:
+                    self.wds.pop(wd, None)
+                    continue
+                base = self.wds.get(wd)
+                if base is None:
+                    continue
+                if not name:
+                    changed.add(base + "/" if base else "")
+                    continue
+                rel = f"{base}/{name}" if base else name
+                if mask & IN_ISDIR:
+                    if name in self.skip_dirs:
+                        continue
+                    if mask & IN_MOVED_FROM:
+                        self._drop_tree(rel)
+                    elif mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add_tree(rel)
+                    changed.add(rel + "/")
+                else:
+                    changed.add(rel)
+        if "" in changed:
+            return None  # the root itself moved or went away
+        return changed
+
+class PollWatcher:
+    """Fallback watcher: re-stats the tree every `interval` seconds and diffs size/mtime."""
+    kind = "poll"
+
+    def __init__(self, root: Path, skip_dirs, interval: float = 1.0):
+        self.root = root
+        self.skip_dirs = skip_dirs
+        self.interval = interval
+        self.snap = self._snapshot()
+
+    def _snapshot(self) -> dict:
+        out = {}
+        for f in iter_files(self.root, self.skip_dirs):
+            try:
+                st = os.lstat(f.path)
+            except OSError:
+                continue
+            out[f.rel] = (st.st_size, st.st_mtime_ns)
+        return out
+
+    def poll(self, timeout: float):
+        time.sleep(max(timeout, self.interval))
+        snap = self._snapshot()
+        changed = {rel for rel, st in snap.items() if self.snap.get(rel) != st}
+        changed.update(rel for rel in self.snap if rel not in snap)
+        self.snap = snap
+        return changed
+
+def make_watcher(root: Path, poll: bool, interval: float):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, WATCH_SKIP_DIRS)
+        except (OSError, AttributeError) as e:
+            print(f"INFO: inotify unavailable ({e}); polling every {interval}s.", file=sys.stderr)
+    return PollWatcher(root, WATCH_SKIP_DIRS, interval)
+
+class RepoState:
+    """
+    The in-memory inventory: the as_is_scan collector results, endpoints by file, the
+    evidence index with a warm BM25 ranker, and the requirements with their keywords.
+    Every read and update holds `lock`.
+    """
+
+    def __init__(self, cache: FileFactCache):
+        self.cache = cache
+        self.lock = threading.RLock()
+        self.ignore = set()
+        if cache.enabled:
+            # the daemon's own cache writes are not repository changes
+            own = os.path.relpath(cache.path.resolve(), ROOT).replace("\\", "/")
+            self.ignore = {own, own + ".tmp"}
+        self.updates = 0
+        self.last_update = None
+        self.saved_at = 0.0
+        self.history = None
+        self.rebuild()
+
+    def rebuild(self):
+        with self.lock, perf_trace.span("daemon.rebuild"):
+            found, _ = as_is_scan.full_scan(self.cache, limit=None)
+            self.index = EvidenceIndex.build(ROOT, cache=self.cache)
+            self.endpoints_by_file = {}
+            for e in found.pop("endpoints"):
+                self.endpoints_by_file.setdefault(e["file"], []).append(e)
+            self._endpoints = None
+            self.found = found
+            self._refresh_ranker()
+            self.load_requirements()
+            self.save_cache(force=True)
+            self.last_update = now()
+
+    def load_requirements(self):
+        try:
+            reqs = seed_status.load_jsonl(seed_status.REQ_JSONL)
+        except (OSError, ValueError):
+            reqs = []
+        self.reqs = reqs
+        # synced requirements carry "id", agent-facing ones "requirement_id"
+        self.keywords = {r.get("requirement_id") or r.get("id"): seed_status.best_keywords(r) for r in reqs}
+
+    def _refresh_ranker(self):
+        self.ranker = BM25Ranker(self.index, boosts=dir_boosts_from_env()).warm()
+
+    def save_cache(self, force: bool = False):
+        # a large fact cache takes seconds to write: persist it now and then, not per edit
+        if force or time.monotonic() - self.saved_at >= CACHE_SAVE_S:
+            self.cache.save()
+            self.saved_at = time.monotonic()
+
+    def git_history(self):
+        """The git history, loaded on first use and advanced when HEAD has moved."""
+        if self.history is None:
+            self.history = GitHistory.from_env(ROOT)
+        elif self.history.update() not in (None, "unchanged"):
+            self.history.save()
+        return self.history
+
+    def endpoints(self) -> list:
+        """All endpoints in as_is_scan order; rebuilt from the per-file lists after changes."""
+        if self._endpoints is None:
+            code, nextjs = [], []
+            for rel in sorted(self.endpoints_by_file, key=walk_key):
+                for e in self.endpoints_by_file[rel]:
+                    (nextjs if e["method"] == "NEXTJS" else code).append(e)
+            # stable: Next.js routes grouped by API base, walk order within a base
+            nextjs.sort(key=lambda e: as_is_scan.NEXTJS_API_BASES.index(e["file"][:-len(e["path"])]))
+            self._endpoints = code + nextjs
+        return self._endpoints
+
+    def inventory_found(self) -> dict:
+        """The collector results exactly as as_is_scan.full_scan() would return them."""
+        found = dict(self.found, endpoints=self.endpoints())
+        for k in ("migrations", "tests"):
+            found[k] = found[k][:as_is_scan.MAX_LISTED]
+        return found
+
+    def apply(self, changed: set) -> int:
+        """Patches everything from the changed paths, as as_is_scan --incremental does from git."""
+        changed = {c for c in changed if c.rstrip("/") not in self.ignore}
+        if not changed:
+            return 0
+        prefixes = tuple(c if c.endswith("/") else c + "/" for c in changed)
+
+        def dropped(rel):
+            return rel in changed or rel.startswith(prefixes)
+
+        with self.lock, perf_trace.span("daemon.apply", paths=len(changed)):
+            # migrations/tests are kept uncapped here, so merging never needs a full rescan
+            collectors = as_is_scan.make_collectors(self.cache, limit=None)
+            fresh, _ = walk(ROOT, collectors, as_is_scan.SKIP_DIRS,
+                            files=list(iter_paths(ROOT, changed, as_is_scan.SKIP_DIRS)))
+            for c in collectors:
+                if c.name != "endpoints":
+                    self.found[c.name] = c.merge(self.found[c.name], fresh[c.name], dropped)
+            for rel in [rel for rel in self.endpoints_by_file if dropped(rel)]:
+                del self.endpoints_by_file[rel]
+            for e in fresh["endpoints"]:
+                self.endpoints_by_file.setdefault(e["file"], []).append(e)
+            self._endpoints = None
+
+            self.index.remove(dropped)
+            self.index.add_files((f.path, f.rel) for f in iter_paths(ROOT, changed, EVIDENCE_SKIP_DIRS)
+                                 if f.suffix.lower() in EVIDENCE_EXTS and not is_generated(f.rel))
+            self._refresh_ranker()
+            if dropped(seed_status.REQ_JSONL.relative_to(ROOT).as_posix()):
+                self.load_requirements()
+            self.save_cache()
+            self.updates += 1
+            self.last_update = now()
+        return len(changed)
+
+    # ---- queries ----
+
+    def q_status(self, req):
+        return {
+            "root": str(ROOT),
+            "evidence_files": len(self.index.files),
+            "endpoints": sum(len(v) for v in self.endpoints_by_file.values()),
+            "packages": len(self.found["packages"]),
+            "requirements": len(self.reqs),
+            "updates": self.updates,
+            "last_update_utc": self.last_update,
+        }
+
+    def q_evidence(self, req):
+        limit = int(req.get("limit") or 6)
+        rid = req.get("requirement_id")
+        if rid:
+            if rid not in self.keywords:
+                raise KeyError(f"unknown requirement {rid!r}")
+            kws = self.keywords[rid]
+        elif req.get("keywords"):
+            kws = seed_status.tokenize(" ".join(req["keywords"]))
+        else:
+            raise KeyError("evidence needs a requirement_id or keywords")
+        hits = self.ranker.rank([kws], limit=limit)[0]
+        return {"requirement_id": rid, "keywords": kws, "evidence": [[p, round(s, 4)] for p, s in hits]}
+
+    def q_endpoints(self, req):
+        f = req.get("file") or ""
+        if f.endswith("/") or not f:
+            rels = sorted((rel for rel in self.endpoints_by_file if rel.startswith(f)), key=walk_key)
+        else:
+            rels = [f]
+        return {rel: [{"method": e["method"], "path": e["path"]} for e in self.endpoints_by_file.get(rel, [])]
+                for rel in rels}
+
+    def q_emit(self, req):
+        inv = as_is_scan.build_inventory(self.inventory_found(), as_is_scan.run(["git","rev-parse","HEAD"]),
+                                         as_is_scan.git_dirty_paths(), self.git_history())
+        as_is_scan.write_outputs(inv)
+        return {"wrote": [str(as_is_scan.OUT_JSON), str(as_is_scan.OUT_MD)]}
+
+    def q_seed(self, req):
+        if not self.reqs:
+            raise KeyError(f"no requirements loaded from {seed_status.REQ_JSONL}")
+        seed_status.write_seed(self.reqs, self.index, history=self.git_history(),
+                               schema=seed_status.SchemaMatcher.load(seed_status.CATALOG_JSON))
+        return {"wrote": [str(seed_status.OUT_SEED_JSONL), str(seed_status.OUT_SEED_MD)]}
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path, state: RepoState):
+        self.state = state
+        self.stopping = threading.Event()
+        super().__init__(str(path), Handler)
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            t0 = time.perf_counter()
+            try:
+                req = json.loads(line)
+                op = req.get("op", "")
+                if op == "stop":
+                    self.server.stopping.set()
+                    resp = {"ok": True, "result": "stopping"}
+                else:
+                    fn = getattr(self.server.state, f"q_{op}", None)
+                    if fn is None:
+                        raise KeyError(f"unknown op {op!r}")
+                    with self.server.state.lock, perf_trace.span(f"daemon.{op}"):
+                        resp = {"ok": True, "result": fn(req)}
+            except Exception as e:
+                resp = {"ok": False, "error": str(e.args[0]) if isinstance(e, KeyError) and e.args else str(e)}
+            resp["ms"] = round((time.perf_counter() - t0) * 1000, 3)
+            self.wfile.write((json.dumps(resp, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+def claim_socket(path: Path):
+    """Removes a stale socket file; fails if a daemon is already answering on it."""
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(str(path))
+    except OSError:
+        path.unlink()
+        return
+    finally:
+        s.close()
+    raise SystemExit(f"ERROR: a daemon is already listening on {path}")
+
+def serve(args):
+    path = socket_path(args.socket)
+    claim_socket(path)
+    t0 = time.perf_counter()
+    # watch first, so edits made while the initial build runs are not lost
+    watcher = make_watcher(ROOT, args.poll, args.interval)
+    state = RepoState(FileFactCache.from_env(ROOT))
+    state.ignore.add(str(path))
+    print(f"INFO: ready in {time.perf_counter() - t0:.2f}s: {len(state.index.files)} evidence files, "
+          f"{len(state.endpoints())} endpoints, {len(state.reqs)} requirements; "
+          f"watching with {watcher.kind}; socket {path}", flush=True)
+
+    server = Server(path, state)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        while not server.stopping.is_set():
+            changed = watcher.poll(0.5)
+            more = watcher.poll(DEBOUNCE_S) if changed else set()
+            while more:
+                changed |= more
+                more = watcher.poll(DEBOUNCE_S)
+            if changed is None or more is None:
+                print("INFO: watcher overflow; rebuilding.", flush=True)
+                state.rebuild()
+                continue
+            if not changed:
+                continue
+            t1 = time.perf_counter()
+            n = state.apply(changed)
+            if n:
+                print(f"INFO: applied {n} changed path(s) in {(time.perf_counter() - t1) * 1000:.0f} ms", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        path.unlink(missing_ok=True)
+        with state.lock:
+            state.save_cache(force=True)
+    return 0
+
+def send(path: Path, req: dict) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(str(path))
+        f = s.makefile("rwb")
+        f.write((json.dumps(req) + "\n").encode("utf-8"))
+        f.flush()
+        return json.loads(f.readline())
+
+def query(args):
+    req = {"op": args.op}
+    if args.op == "evidence":
+        if args.keywords:
+            req["keywords"] = args.keywords
+        elif args.args:
+            req["requirement_id"] = args.args[0]
+        req["limit"] = args.limit
+    elif args.op == "endpoints" and args.args:
+        req["file"] = args.args[0]
+    path = socket_path(args.socket)
+    try:
+        times = []
+        for _ in range(max(1, args.repeat)):
+            t0 = time.perf_counter()
+            resp = send(path, req)
+            times.append((time.perf_counter() - t0) * 1000)
+    except OSError as e:
+        raise SystemExit(f"ERROR: no daemon on {path} ({e}); start one with: python scripts/repo_daemon.py serve")
+    print(json.dumps(resp, indent=2, ensure_ascii=False))
+    if args.repeat > 1:
+        times.sort()
+        print(f"round trip over {len(times)} queries: p50={times[len(times) // 2]:.2f}ms "
+              f"p95={times[int(len(times) * 0.95) - 1]:.2f}ms max={times[-1]:.2f}ms", file=sys.stderr)
+    return 0 if resp.get("ok") else 1
+
+def main():
+    ap = argparse.ArgumentParser(description="Repository inventory daemon (local development).")
+    ap.add_argument("--socket", default="", help=f"Unix socket path (default: REPO_DAEMON_SOCKET or {DEFAULT_SOCKET})")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("serve", help="Build the inventory, then watch the tree and answer queries.")
+    s.add_argument("--poll", action="store_true", help="Poll for changes instead of using inotify.")
+    s.add_argument("--interval", type=float, default=1.0, help="Polling interval in seconds.")
+    q = sub.add_parser("query", help="Ask a running daemon.")
+    q.add_argument("op", choices=["status","evidence","endpoints","emit","seed","stop"])
+    q.add_argument("args", nargs="*", help="evidence: REQUIREMENT_ID; endpoints: FILE or DIR/")
+    q.add_argument("--keywords", nargs="+", default=[], help="evidence: rank these words instead of a requirement's keywords")
+    q.add_argument("--limit", type=int, default=6)
+    q.add_argument("--repeat", type=int, default=1, help="Send the query N times and report round-trip latency.")
+    args = ap.parse_args()
+    return serve(args) if args.cmd == "serve" else query(args)
+
+if __name__ == "__main__":
+    sys.exit(perf_trace.run("repo_daemon", main))
@@ -0,0 +1,140 @@
+import os, time
+from pathlib import Path
+
+import perf_trace
+
+class RepoFile:
+    """One file seen by the walker. `rel` is repo-relative with forward slashes."""
+    __slots__ = ("rel", "name", "_path")
+
+    def __init__(self, rel: str, path: str):
+        self.rel = rel
+        self.name = rel.rsplit("/", 1)[-1]
+        self._path = path
+
+    @property
+    def path(self) -> Path:
+        return Path(self._path)
+
+    @property
+    def suffix(self) -> str:
+        return os.path.splitext(self.name)[1]
+
+class Collector:
+    """
+    Base class for walker collectors. visit() is called for every file in walk order,
+    finish() once at the end; its return value is the collector's result.
+    merge(old, fresh, dropped) combines a previous result with the result of re-walking only
+    changed paths; `dropped(rel)` is true for every path whose old entries are stale.
+    """
+    name = "collector"
+
+    def visit(self, f: RepoFile):
+        pass
+
+    def finish(self):
+        return None
+
+    def merge(self, old, fresh, dropped):
+        raise NotImplementedError
+
+def iter_files(root: Path, skip_dirs, prefix: str = ""):
+    """
+    Pre-order depth-first walk using os.scandir, entries sorted by name: a directory's
+    files come before its subdirectories, so the order is exactly walk_key() order.
+    `skip_dirs` are pruned without descending; symlinked directories are skipped, not followed.
+    `prefix` is prepended to every rel path (for walking a subtree of the repo).
+    """
+    stack = [(str(root), prefix)]
+    while stack:
+        dp, prefix = stack.pop()
+        try:
+            with os.scandir(dp) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for e in entries:
+            try:
+                is_dir = e.is_dir()
+                is_link = is_dir and e.is_symlink()
+            except OSError:
+                is_dir = is_link = False
+            if is_link:
+                continue  # symlinked directory: neither followed nor a file
+            if is_dir:
+                if e.name not in skip_dirs:
+                    subdirs.append((e.path, prefix + e.name + "/"))
+                continue
+            yield RepoFile(prefix + e.name, e.path)
+        stack.extend(reversed(subdirs))
+
+def walk_key(rel: str):
+    """Sort key that reproduces iter_files() order for repo-relative paths."""
+    parts = rel.split("/")
+    return tuple((1, d) for d in parts[:-1]) + ((0, parts[-1]),)
+
+def iter_paths(root: Path, rels, skip_dirs):
+    """
+    Files for a set of repo-relative paths, in walk order. Entries ending in "/" are
+    directories and are walked recursively; missing paths, symlinked directories and
+    anything under `skip_dirs` are dropped.
+    """
+    found = []
+    for rel in sorted(set(rels)):
+        rel = rel.rstrip("/") if rel.endswith("/") else rel
+        p = root / rel
+        is_dir = p.is_dir()
+        parts = rel.split("/")
+        if (is_dir and p.is_symlink()) or any(part in skip_dirs for part in (parts if is_dir else parts[:-1])):
+            continue
+        if is_dir:
+            found.extend(iter_files(p, skip_dirs, prefix=rel + "/"))
+        elif os.path.lexists(p):
+            found.append(RepoFile(rel, str(p)))
+    seen = set()
+    for f in sorted(found, key=lambda f: walk_key(f.rel)):
+        if f.rel not in seen:
+            seen.add(f.rel)
+            yield f
+
+def walk(root: Path, collectors, skip_dirs, files=None):
+    """
+    Walks `root` once, routing each file to every collector (or only `files`, if given).
+    Returns ({collector.name: result}, timings) where timings maps each collector name
+    (plus "walk" for the traversal itself, which also carries the file count) to seconds.
+    """
+    with perf_trace.span("walk", root=str(root)) as s:
+        results, timings = _walk(root, collectors, skip_dirs, files)
+        s.set(files=timings["walk"]["files"], collector_seconds={k: round(v["seconds"], 4) for k, v in timings.items()})
+    return results, timings
+
+def _walk(root: Path, collectors, skip_dirs, files):
+    clock = time.perf_counter
+    spent = {c.name: 0.0 for c in collectors}
+    seen = 0
+    t_start = clock()
+    for f in (iter_files(root, skip_dirs) if files is None else files):
+        seen += 1
+        for c in collectors:
+            t0 = clock()
+            c.visit(f)
+            spent[c.name] += clock() - t0
+    t_walk = clock() - t_start - sum(spent.values())
+
+    results = {}
+    for c in collectors:
+        t0 = clock()
+        results[c.name] = c.finish()
+        spent[c.name] += clock() - t0
+
+    timings = {"walk": {"seconds": t_walk, "files": seen}}
+    for c in collectors:
+        timings[c.name] = {"seconds": spent[c.name]}
+    return results, timings
+
+def format_timings(timings) -> str:
+    lines = [f"Scan timings ({timings['walk']['files']} files walked):"]
+    for name, t in timings.items():
+        lines.append(f"  {name:<12} {t['seconds']*1000:9.1f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,119 @@
+import json, os
+from pathlib import Path
+
+from eval_result_cache import evidence_hashes, requirement_hash
+
+# Bump when the on-disk layout changes; old graphs are discarded wholesale.
+GRAPH_VERSION = 1
+
+DEFAULT_PATH = Path("Artifacts") / "requirement_deps.json"
+
+def evidence_files(record: dict) -> list:
+    """Repo paths named by "file:<path>" entries of a requirements_status record."""
+    out = []
+    for ev in record.get("evidence") or []:
+        ev = str(ev)
+        if ev.startswith("file:"):
+            out.append(ev[5:].split("#", 1)[0].strip())
+    return [p for p in out if p]
+
+def _touches(files, changed: set, changed_dirs: list) -> list:
+    return sorted(f for f in files if f in changed or any(f.startswith(d) for d in changed_dirs))
+
+class DependencyGraph:
+    """
+    Persistent requirement -> evidence-file graph. For every requirement it keeps the hash
+    of the requirement record, the seed evidence paths, the files cited by the last answer
+    and that answer itself, so requirements untouched by a change set can be carried
+    forward without re-evaluation. `git_head` is the commit the graph was last updated at;
+    `files` holds the content hash of every evidence file as last evaluated, so a path git
+    reports as changed (e.g. still dirty from the previous run) only counts if its content
+    differs. `context` identifies the model/prompt the answers came from; answers from a
+    different context are never carried forward.
+    """
+
+    def __init__(self, path: Path = None, root: Path = None, context: str = ""):
+        self.path = Path(path) if path else None
+        self.root = Path(root) if root else Path(".")
+        self.context = context
+        self.git_head = ""
+        self.nodes = {}
+        self.files = {}
+        self._current = {}
+
+    @classmethod
+    def load(cls, path: Path, root: Path = None, context: str = ""):
+        g = cls(path, root, context)
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except Exception:
+            data = None
+        if isinstance(data, dict) and data.get("version") == GRAPH_VERSION and data.get("context", "") == context:
+            g.git_head = data.get("git_head") or ""
+            g.nodes = data.get("requirements") or {}
+            g.files = data.get("files") or {}
+        return g
+
+    def seed_from_output(self, records):
+        """Adds files cited by an existing requirements_status.jsonl to the graph."""
+        for rec in records:
+            node = self.nodes.get(rec.get("requirement_id"))
+            if node is not None:
+                node["cited"] = sorted(set(node.get("cited", [])) | set(evidence_files(rec)))
+
+    def reasons(self, req: dict, seed_paths, changed: set) -> list:
+        """
+        Why `req` must be re-evaluated given the changed paths (entries ending in "/" are
+        directories); an empty list means its previous answer still holds.
+        """
+        node = self.nodes.get(req["requirement_id"])
+        if node is None or not node.get("record"):
+            return ["no previous result"]
+        out = []
+        if node.get("req_hash") != requirement_hash(req):
+            out.append("requirement changed")
+        if sorted(seed_paths) != node.get("seed", []):
+            out.append("evidence set changed")
+        changed_dirs = [c for c in changed if c.endswith("/")]
+        hits = _touches(set(node.get("seed", [])) | set(node.get("cited", [])), changed, changed_dirs)
+        hits = [f for f in hits if self._sha(f) != self.files.get(f)]
+        if hits:
+            out.append("evidence changed: " + ", ".join(hits))
+        return out
+
+    def _sha(self, rel: str) -> str:
+        if rel not in self._current:
+            self._current[rel] = evidence_hashes(self.root, [rel])[0][1]
+        return self._current[rel]
+
+    def record(self, rid: str):
+        node = self.nodes.get(rid)
+        return dict(node["record"]) if node and node.get("record") else None
+
+    def update(self, req: dict, seed_paths, record: dict):
+        node = {
+            "req_hash": requirement_hash(req),
+            "seed": sorted(seed_paths),
+            "cited": sorted(set(evidence_files(record))),
+            "record": record,
+        }
+        self.nodes[req["requirement_id"]] = node
+        for rel in set(node["seed"]) | set(node["cited"]):
+            self.files[rel] = self._sha(rel)
+
+    def save(self, git_head: str, keep=None):
+        """Writes the graph atomically; `keep` (requirement ids) drops retired requirements."""
+        if self.path is None:
+            return
+        if keep is not None:
+            keep = set(keep)
+            self.nodes = {k: v for k, v in self.nodes.items() if k in keep}
+        live = {f for n in self.nodes.values() for f in n.get("seed", []) + n.get("cited", [])}
+        self.files = {f: h for f, h in self.files.items() if f in live}
+        self.git_head = git_head
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": GRAPH_VERSION, "context": self.context, "git_head": git_head,
+                                  "files": self.files, "requirements": self.nodes},
+                                  ensure_ascii=False, separators=(",",":")), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,503 @@
+import argparse, contextlib, glob, io, json, os, re, subprocess, sys, tempfile, types
+from pathlib import Path
+
+from file_fact_cache import FileFactCache
+import perf_trace
+
+# One parser for the canonical requirements Markdown. parse() walks the document line by
+# line once and produces an outline (every ATX heading, with and without fenced code),
+# the fenced-code spans, and the MACHINE_READABLE_JSONL block. The result is cached per
+# file content in the file-fact cache; the generate/sync/extract scripts are views over it
+# and reproduce their historical output byte for byte.
+
+MARKER_RE = re.compile(r"MACHINE_READABLE_JSONL", re.IGNORECASE)
+MARKER_STOP_RE = re.compile(r"^(HUMAN_READABLE_TXT|MACHINE_READABLE_JSONL)\b", re.IGNORECASE)
+PREVIEW_LINES = 80
+
+class _HeadingScanner:
+    """
+    Collects heading candidates: a line of n '#' followed by whitespace (or nothing).
+    A bare "###" takes its title from the next non-blank line, like `^###\\s+(.+?)` does;
+    which levels actually count is decided per view (see Document.outline).
+    """
+
+    def __init__(self):
+        self.items = []
+        self._pending = None
+
+    def feed(self, lineno: int, line: str, start: int):
+        if self._pending is not None and line.strip():
+            self._pending["cont"] = [lineno, line.strip(), start + len(line)]
+            self._pending = None
+        if not line.startswith("#"):
+            return
+        n = len(line) - len(line.lstrip("#"))
+        rest = line[n:]
+        if rest and not rest[0].isspace():
+            return
+        h = {"line": lineno, "level": n, "title": rest.strip() or None, "start": start,
+             "title_end": start + len(line), "cont": None}
+        self.items.append(h)
+        if h["title"] is None:
+            self._pending = h
+
+    def finish(self, text: str):
+        # Nothing but whitespace follows a bare heading: the regex still matches if that
+        # whitespace holds a non-newline character after the first one (title "").
+        h = self._pending
+        if h is not None and any(c != "\n" for c in text[h["start"] + h["level"] + 1:]):
+            h["title"] = ""
+            h["title_end"] = len(text)
+
+class _JsonlScanner:
+    """Single-line JSON objects after the MACHINE_READABLE_JSONL marker (splitlines() lines)."""
+
+    def __init__(self):
+        self.n = 0
+        self.marker = -1
+        self.done = False
+        self.lines = []
+        self.preview = []
+
+    def feed(self, seg: str):
+        j = self.n
+        self.n += 1
+        if j < PREVIEW_LINES:
+            self.preview.append(seg)
+        if self.done:
+            return
+        if self.marker < 0:
+            if MARKER_RE.search(seg):
+                self.marker = j
+            return
+        t = seg.strip()
+        # stop if we hit another major section marker
+        if MARKER_STOP_RE.match(t) and j > self.marker + 1:
+            self.done = True
+            return
+        if not t or t.startswith("```"):
+            return
+        # keep only single-line JSON objects
+        if t.startswith("{") and t.endswith("}"):
+            self.lines.append(seg.rstrip("\n"))
+
+def parse(text: str) -> dict:
+    """
+    Parses decoded Markdown into a JSON-serializable tree:
+      headings           every heading candidate in the raw text
+      fences             [start, end) spans of ```...``` code, paired left to right
+      unfenced_headings  heading candidates in the text with those spans removed
+      jsonl              {"marker", "lines", "preview"} for the MACHINE_READABLE_JSONL block
+    Offsets of unfenced_headings refer to the fence-stripped text.
+    """
+    raw = _HeadingScanner()
+    jl = _JsonlScanner()
+    fences = []
+    opener = None
+    lines = text.split("\n")
+    off = 0
+    for lineno, line in enumerate(lines):
+        raw.feed(lineno, line, off)
+        nl = "\n" if lineno < len(lines) - 1 else ""
+        for seg in (line + nl).splitlines(True):
+            jl.feed(seg)
+        pos = 0
+        while True:
+            k = line.find("```", pos)
+            if k < 0:
+                break
+            if opener is None:
+                opener = off + k
+            else:
+                fences.append([opener, off + k + 3])
+                opener = None
+            pos = k + 3
+        off += len(line) + 1
+    raw.finish(text)
+    # an unclosed ``` at EOF strips nothing, so the unfenced outline is only known now
+
+    unf = _HeadingScanner()
+    s_off = 0
+    stripped = strip_spans(text, fences)
+    for lineno, line in enumerate(stripped.split("\n")):
+        unf.feed(lineno, line, s_off)
+        s_off += len(line) + 1
+    unf.finish(stripped)
+
+    return {
+        "headings": raw.items,
+        "fences": fences,
+        "unfenced_headings": unf.items,
+        "jsonl": {"marker": jl.marker, "lines": jl.lines, "preview": "".join(jl.preview)},
+        "text": text,
+    }
+
+def strip_spans(text: str, spans) -> str:
+    out = []
+    pos = 0
+    for a, b in spans:
+        out.append(text[pos:a])
+        pos = b
+    out.append(text[pos:])
+    return "".join(out)
+
+def norm_ws(s: str) -> str:
+    s = s.replace("\r\n", "\n")
+    s = re.sub(r"[ \t]+$", "", s, flags=re.M)
+    return s.strip()
+
+def extract_numbered_prefix(title: str):
+    # Titles like: "1.2 Definition of Done (DoD) ..."
+    m = re.match(r"^(\d+(\.\d+)+)\s+(.*)$", title)
+    if m:
+        return m.group(1), m.group(3).strip()
+    return None, title
+
+def extract_acceptance(body: str):
+    # Heuristics:
+    # 1) If there's an "Acceptance:" label, capture bullets after it until blank line or next bold header.
+    # 2) Otherwise capture explicit Given/When/Then lines if present.
+    lines = [ln.rstrip() for ln in body.splitlines()]
+    acc = []
+
+    # Find "Acceptance:" marker
+    acc_idx = None
+    for i, ln in enumerate(lines):
+        if re.search(r"\bAcceptance\b\s*:", ln, flags=re.I):
+            acc_idx = i
+            break
+
+    if acc_idx is not None:
+        for j in range(acc_idx+1, len(lines)):
+            t = lines[j].strip()
+            if not t:
+                if acc:
+                    break
+                continue
+            # stop on a new bold section label like **Evidence gates**
+            if re.match(r"^\*\*.+\*\*\s*:?\s*$", t):
+                break
+            if t.startswith("- ") or t.startswith("* "):
+                acc.append(t[2:].strip())
+            elif re.match(r"^(Given|When|Then)\b", t, flags=re.I):
+                acc.append(t)
+        if acc:
+            return acc
+
+    # Given/When/Then anywhere
+    for ln in lines:
+        t = ln.strip()
+        if re.match(r"^(Given|When|Then)\b", t, flags=re.I):
+            acc.append(t)
+    return acc
+
+def block_metadata(body: str):
+    """
+    (milestone, priority, acceptance) from a requirement block body:
+      milestone: X / priority: P1 within the first 25 lines,
+      "acceptance:" on its own line followed by "- ..." bullets.
+    """
+    milestone = None
+    priority = None
+    acceptance = []
+    meta_lines = body.splitlines()
+
+    for line in meta_lines[:25]:
+        lm = re.match(r'^\s*milestone\s*:\s*(.+?)\s*$', line, re.IGNORECASE)
+        if lm: milestone = lm.group(1).strip()
+        lp = re.match(r'^\s*priority\s*:\s*(.+?)\s*$', line, re.IGNORECASE)
+        if lp: priority = lp.group(1).strip()
+
+    acc_start = None
+    for idx, line in enumerate(meta_lines):
+        if re.match(r'^\s*acceptance\s*:\s*$', line, re.IGNORECASE):
+            acc_start = idx + 1
+            break
+    if acc_start is not None:
+        for line in meta_lines[acc_start:]:
+            if re.match(r'^\s*-\s+.+$', line):
+                acceptance.append(re.sub(r'^\s*-\s+','',line).strip())
+            elif line.strip()=="":
+                continue
+            else:
+                break
+    return milestone, priority, acceptance
+
+class Document:
+    """A parsed requirements Markdown file plus the three views the scripts consume."""
+
+    def __init__(self, tree: dict):
+        self.tree = tree
+        self.text = tree["text"]
+        self._stripped = None
+
+    @property
+    def stripped(self) -> str:
+        if self._stripped is None:
+            self._stripped = strip_spans(self.text, self.tree["fences"])
+        return self._stripped
+
+    def outline(self, levels, unfenced: bool = False) -> list:
+        """
+        Headings at `levels`, in order: [{"level", "title", "start", "title_end"}]. A bare
+        heading at one of these levels consumes the next non-blank line as its title.
+        Offsets are into `stripped` when `unfenced`, else into `text`.
+        """
+        out = []
+        consumed = -1
+        for h in self.tree["unfenced_headings" if unfenced else "headings"]:
+            if h["line"] <= consumed or h["level"] not in levels:
+                continue
+            if h["title"] is not None:
+                out.append({"level": h["level"], "title": h["title"], "start": h["start"], "title_end": h["title_end"]})
+            elif h["cont"] is not None:
+                cont_line, title, title_end = h["cont"]
+                out.append({"level": h["level"], "title": title, "start": h["start"], "title_end": title_end})
+                consumed = cont_line
+        return out
+
+    def requirements(self, source_file: str) -> list:
+        """generate_requirements_from_md view: one record per ### heading outside code fences."""
+        md = self.stripped
+        secs = self.outline({2, 3, 4}, unfenced=True)
+        reqs = []
+        for i, s in enumerate(secs):
+            if s["level"] != 3:
+                continue
+            end = secs[i+1]["start"] if i+1 < len(secs) else len(md)
+            num, clean_title = extract_numbered_prefix(s["title"])
+            body = norm_ws(md[s["title_end"]:end])
+            acceptance = extract_acceptance(body)
+
+            req_id = f"BRRS-{num}" if num else f"BRRS-{len(reqs)+1:04d}"
+
+            reqs.append({
+                "requirement_id": req_id,
+                "section_number": num,
+                "title": clean_title,
+                "description": body,
+                "acceptance_criteria": acceptance,
+                "missing_acceptance_criteria": (len(acceptance) == 0),
+                "source_file": source_file
+            })
+        return reqs
+
+    def blocks(self) -> list:
+        """sync_requirements_from_md view: one record per ### heading, fences included."""
+        md = self.text
+        hits = self.outline({3})
+        reqs = []
+        used_ids = set()
+
+        def alloc_id(n: int):
+            return f"BRRS-{n:04d}"
+
+        next_auto = 1
+
+        for i, h in enumerate(hits):
+            end = hits[i+1]["start"] if i+1 < len(hits) else len(md)
+            block = md[h["start"]:end].strip()
+
+            # Optional explicit ID in heading: "BRRS-0001 - Title" or "BRRS-0001: Title"
+            m = re.match(r'^(BRRS-\d{4,})\s*[:\-]\s*(.+)$', h["title"])
+            if m:
+                rid = m.group(1).strip()
+                title = m.group(2).strip()
+            else:
+                rid = None
+                title = h["title"]
+
+            body = block.split("\n", 1)[1].strip() if "\n" in block else ""
+            milestone, priority, acceptance = block_metadata(body)
+
+            if rid is None:
+                # Auto ID (stable if you only append new requirements at the end)
+                while alloc_id(next_auto) in used_ids:
+                    next_auto += 1
+                rid = alloc_id(next_auto)
+                next_auto += 1
+
+            used_ids.add(rid)
+
+            reqs.append({
+                "id": rid,
+                "title": title,
+                "milestone": milestone,
+                "priority": priority,
+                "acceptance_criteria": acceptance,
+                "body_md": body
+            })
+        return reqs
+
+    def machine_jsonl(self):
+        """extract_requirements view: (marker line or -1, JSONL lines, first-80-lines preview)."""
+        jl = self.tree["jsonl"]
+        return jl["marker"], jl["lines"], jl["preview"]
+
+@perf_trace.traced("requirements_md.load_document")
+def load_document(path: Path, cache: FileFactCache = None) -> Document:
+    """
+    Parses `path`, reusing the cached tree when the file content is unchanged. Without an
+    explicit cache the file-fact cache from the environment is used (FILE_FACT_CACHE=0
+    turns it off).
+    """
+    path = Path(path)
+    own = cache is None
+    if own:
+        cache = FileFactCache.from_env(Path("."))
+    try:
+        rel = path.resolve().relative_to(Path(".").resolve()).as_posix()
+    except ValueError:
+        rel = path.resolve().as_posix()
+    tree = cache.get(path, rel, "md_document", parse)
+    if own:
+        cache.save()
+    return Document(tree)
+
+# Renderers: the exact bytes each script writes.
+
+def render_generate(reqs) -> dict:
+    return {
+        "jsonl": "\n".join(json.dumps(r, ensure_ascii=False) for r in reqs) + "\n",
+        "json": json.dumps(reqs, indent=2, ensure_ascii=False) + "\n",
+    }
+
+def render_sync(reqs) -> dict:
+    return {
+        "json": json.dumps(reqs, ensure_ascii=False, indent=2) + "\n",
+        "jsonl": "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in reqs),
+    }
+
+def render_extract(jsonl_lines) -> dict:
+    objs = [json.loads(l) for l in jsonl_lines]
+    return {
+        "jsonl": "\n".join(jsonl_lines) + "\n",
+        "json": json.dumps(objs, indent=2),
+    }
+
+# Golden check: each script's main() run on one Markdown file, outputs sent to a temp dir.
+# Goldens are recorded from the scripts as they were before this parser existed.
+GOLDEN_SCRIPTS = (
+    ("generate", "generate_requirements_from_md"),
+    ("sync", "sync_requirements_from_md"),
+    ("extract", "extract_requirements"),
+)
+
+# The canonical requirements MDs (sync's default input and CANONICAL.md) are the ones with
+# committed goldens. No repo file has a MACHINE_READABLE_JSONL block the old extract
+# accepts, so extract has no golden.
+GOLDEN_DIR = Path("Artifacts") / "md_golden"
+GOLDEN_FILES = (
+    "Requirements/BlackRavenia_RideShare_Canonical_Requirements_v6_1_MERGED_REORG_v3.md",
+    "Requirements/CANONICAL.md",
+)
+
+def baseline_ref() -> str:
+    """The commit just before requirements_md.py was added: the pre-parser scripts."""
+    added = subprocess.run(["git", "log", "--diff-filter=A", "--format=%H", "--", "scripts/requirements_md.py"],
+                           capture_output=True, text=True, check=True).stdout.split()
+    if not added:
+        raise SystemExit("requirements_md.py is not committed; pass --ref")
+    return added[-1] + "^"
+
+def _load_script(name: str, ref: str = ""):
+    """Module for scripts/<name>.py, from the working tree or from git at `ref`."""
+    if ref:
+        src = subprocess.run(["git", "show", f"{ref}:scripts/{name}.py"], capture_output=True, check=True).stdout
+    else:
+        src = (Path(__file__).parent / f"{name}.py").read_bytes()
+    mod = types.ModuleType(name)
+    mod.__file__ = f"{ref}:{name}.py" if ref else str(Path(__file__).parent / f"{name}.py")
+    exec(compile(src.decode("utf-8-sig"), mod.__file__, "exec"), mod.__dict__)
+    return mod
+
+def _run_script(view: str, mod, path: Path, tmp: Path) -> dict:
+    out_jsonl, out_json = tmp / f"{view}.jsonl", tmp / f"{view}.json"
+    argv = [view]
+    if view == "extract":
+        argv += ["--input-md", str(path), "--out-jsonl", str(out_jsonl), "--out-json", str(out_json)]
+    elif view == "generate":
+        mod.CANONICAL, mod.OUT_JSONL, mod.OUT_JSON = path, out_jsonl, out_json
+    else:
+        mod.REQ_MD, mod.OUT_JSONL, mod.OUT_JSON = path, out_jsonl, out_json
+    saved = sys.argv
+    sys.argv = argv
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            mod.main()
+    except (SystemExit, Exception) as e:
+        return {f"{view}.error": f"{type(e).__name__}: {e}\n"}
+    finally:
+        sys.argv = saved
+    return {f"{view}.{p.suffix[1:]}": p.read_text(encoding="utf-8") for p in (out_jsonl, out_json)}
+
+def _golden_outputs(path: Path, ref: str = "") -> dict:
+    out = {}
+    with tempfile.TemporaryDirectory() as td:
+        for view, name in GOLDEN_SCRIPTS:
+            out.update(_run_script(view, _load_script(name, ref), path, Path(td)))
+    return out
+
+def golden(mode: str, golden_dir: Path, files, ref: str = "") -> int:
+    """
+    record: runs the scripts at git `ref` (default baseline_ref()) on each file and writes
+            the outputs of the ones that succeed under `golden_dir`.
+    check:  runs the working-tree scripts and compares every recorded golden byte for
+            byte; returns the number of mismatches (a file without goldens is one).
+    """
+    if mode == "record":
+        ref = ref or baseline_ref()
+    bad = 0
+    # Hermetic runs: no file-fact cache reuse, no requirements store writes.
+    env = {k: os.environ.get(k) for k in ("FILE_FACT_CACHE", "REQUIREMENTS_STORE")}
+    os.environ.update(FILE_FACT_CACHE="0", REQUIREMENTS_STORE="0")
+    try:
+        for f in files:
+            f = Path(f)
+            slot = golden_dir / re.sub(r"[^A-Za-z0-9_.-]+", "_", f.as_posix())
+            outputs = _golden_outputs(f, ref if mode == "record" else "")
+            if mode == "record":
+                kept = {name: text for name, text in outputs.items() if not name.endswith(".error")}
+                for name, text in sorted(kept.items()):
+                    p = slot.with_name(slot.name + "." + name)
+                    p.parent.mkdir(parents=True, exist_ok=True)
+                    p.write_bytes(text.encode("utf-8"))
+                if not kept:
+                    print(f"SKIP: {f} (every script failed on it at {ref})")
+                continue
+            recorded = sorted(golden_dir.glob(glob.escape(slot.name) + ".*"))
+            if not recorded:
+                bad += 1
+                print(f"MISMATCH: {f} -> no goldens in {golden_dir}")
+            for p in recorded:
+                name = p.name[len(slot.name) + 1:]
+                text = outputs.get(name)
+                if text is None or p.read_bytes() != text.encode("utf-8"):
+                    bad += 1
+                    err = outputs.get(name.split(".")[0] + ".error", "").strip()
+                    print(f"MISMATCH: {f} -> {name}" + (f" ({err})" if err else ""))
+    finally:
+        for k, v in env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+    return bad
+
+def main():
+    ap = argparse.ArgumentParser(description="Requirements Markdown parser: golden output checks for the three views.")
+    ap.add_argument("mode", choices=["record", "check"])
+    ap.add_argument("--dir", default=str(GOLDEN_DIR), help="Golden output directory")
+    ap.add_argument("--ref", default="", help="git ref of the scripts to record from (default: the commit before requirements_md.py)")
+    ap.add_argument("files", nargs="*", help="Markdown files (default: the canonical requirements MDs)")
+    args = ap.parse_intermixed_args()
+    files = args.files or list(GOLDEN_FILES)
+    bad = golden(args.mode, Path(args.dir), files, args.ref)
+    if args.mode == "record":
+        print(f"OK: recorded golden outputs for {len(files)} files in {args.dir}")
+        return 0
+    print(f"{'FAIL' if bad else 'OK'}: {len(files)} files checked, {bad} mismatches")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(perf_trace.run("requirements_md", main))
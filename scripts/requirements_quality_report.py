@@ -1,6 +1,9 @@
 ﻿import json
 from pathlib import Path
 
+import perf_trace
+from requirements_store import RequirementsStore
+
 REQ = Path("AgentInput/Requirements/requirements.jsonl")
 OUT = Path("AgentInput/requirements_quality_report.md")
 
@@ -8,15 +11,22 @@ def main():
     if not REQ.exists():
         raise SystemExit(f"Missing: {REQ}")
 
-    reqs = []
-    for line in REQ.read_text(encoding="utf-8", errors="replace").splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        reqs.append(json.loads(line))
-
-    missing = [r for r in reqs if r.get("missing_acceptance_criteria") or not r.get("acceptance_criteria")]
-    total = len(reqs)
+    store = RequirementsStore.from_env(Path("."))
+    if store is not None:
+        # indexed: missing_acceptance is a column of the store's requirements table
+        store.load_requirements(REQ)
+        missing = store.missing_acceptance()
+        total = store.count("requirements")
+        store.close()
+    else:
+        reqs = []
+        for line in REQ.read_text(encoding="utf-8", errors="replace").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            reqs.append(json.loads(line))
+        missing = [r for r in reqs if r.get("missing_acceptance_criteria") or not r.get("acceptance_criteria")]
+        total = len(reqs)
 
     md = []
     md.append("# Requirements Quality Report")
@@ -38,4 +48,4 @@ def main():
     print(f"Wrote: {OUT}")
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run("requirements_quality_report", main)
@@ -0,0 +1,570 @@
+import argparse, hashlib, json, os, sqlite3, sys, time
+from pathlib import Path
+
+from evidence_index import iter_evidence_files
+from file_fact_cache import RACY_WINDOW_NS, decode_text, sha256_file
+import perf_trace
+from scan_reader import ScanLimits, sniff
+
+DEFAULT_PATH = Path("Artifacts") / "requirements_store.sqlite"
+
+# Bump when the tables change; an older store is dropped and rebuilt from its sources.
+STORE_VERSION = 1
+
+# Rows per executemany() batch when ingesting streamed records.
+BATCH_ROWS = 1000
+
+# Every dataset keeps each record verbatim (`record`, JSON) so exports reproduce the
+# original JSON/JSONL byte for byte; the other columns are the indexed projections the
+# scripts query. `datasets` stamps which file (size/mtime, sha256 fallback) a dataset was
+# loaded from, so a reader handed an unchanged file never re-parses it.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS datasets (
+    name TEXT PRIMARY KEY,
+    source TEXT NOT NULL DEFAULT '',
+    size INTEGER,
+    mtime_ns INTEGER,
+    racy INTEGER NOT NULL DEFAULT 0,
+    sha256 TEXT NOT NULL DEFAULT '',
+    rows INTEGER NOT NULL,
+    updated_utc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS requirements (
+    ord INTEGER PRIMARY KEY,
+    requirement_id TEXT,
+    title TEXT NOT NULL DEFAULT '',
+    milestone TEXT,
+    priority TEXT,
+    missing_acceptance INTEGER NOT NULL,
+    body TEXT NOT NULL DEFAULT '',
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requirements_by_id ON requirements (requirement_id);
+CREATE INDEX IF NOT EXISTS requirements_by_milestone ON requirements (milestone);
+CREATE INDEX IF NOT EXISTS requirements_missing_acceptance ON requirements (missing_acceptance, ord);
+CREATE TABLE IF NOT EXISTS acceptance_criteria (
+    req_ord INTEGER NOT NULL,
+    ord INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (req_ord, ord)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS milestones (
+    milestone TEXT PRIMARY KEY,
+    name TEXT,
+    target_status TEXT,
+    requirements INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS seed (
+    ord INTEGER PRIMARY KEY,
+    requirement_id TEXT,
+    seed_status TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS seed_by_id ON seed (requirement_id);
+CREATE TABLE IF NOT EXISTS seed_evidence (
+    seed_ord INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    score REAL,
+    PRIMARY KEY (seed_ord, rank)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS seed_evidence_by_path ON seed_evidence (path);
+CREATE TABLE IF NOT EXISTS statuses (
+    ord INTEGER PRIMARY KEY,
+    requirement_id TEXT,
+    milestone TEXT,
+    status TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS statuses_by_id ON statuses (requirement_id);
+CREATE INDEX IF NOT EXISTS statuses_by_milestone ON statuses (milestone, status);
+CREATE TABLE IF NOT EXISTS status_evidence (
+    status_ord INTEGER NOT NULL,
+    ord INTEGER NOT NULL,
+    ref TEXT NOT NULL,
+    PRIMARY KEY (status_ord, ord)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS status_evidence_by_ref ON status_evidence (ref);
+CREATE TABLE IF NOT EXISTS inventory (
+    kind TEXT NOT NULL,
+    ord INTEGER NOT NULL,
+    name TEXT,
+    record TEXT NOT NULL,
+    PRIMARY KEY (kind, ord)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS inventory_by_name ON inventory (name);
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    racy INTEGER NOT NULL DEFAULT 0,
+    sha256 TEXT NOT NULL
+);
+"""
+
+# rowid of requirements_fts = requirements.ord; rowid of sources_fts = sources.id
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS requirements_fts USING fts5(title, body);
+CREATE VIRTUAL TABLE IF NOT EXISTS sources_fts USING fts5(body);
+"""
+
+# as_is_scan.json lists stored as inventory rows, and the field that names each row
+INVENTORY_LISTS = {"lockfiles": None, "packages": "path", "workflows": None, "migrations": None,
+                   "tests": None, "endpoints": "path"}
+
+def load_jsonl(p: Path) -> list:
+    out = []
+    for line in p.read_text(encoding="utf-8-sig", errors="replace").splitlines():
+        line = line.strip()
+        if line:
+            out.append(json.loads(line))
+    return out
+
+def fts_query(text: str) -> str:
+    """Free text -> an FTS5 query matching rows that contain every word (no operators)."""
+    words = [w for w in text.replace('"', " ").split() if w]
+    return " ".join(f'"{w}"' for w in words)
+
+def _dumps(r) -> str:
+    return json.dumps(r, ensure_ascii=False)
+
+def _utc() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+def _racy(mtime_ns: int) -> int:
+    return int(time.time_ns() - mtime_ns < RACY_WINDOW_NS)
+
+def _seed_evidence_rows(records):
+    for i, r in enumerate(records):
+        scores = r.get("evidence_scores") or []
+        for k, p in enumerate(r.get("evidence_paths") or []):
+            yield i, k, p, scores[k] if k < len(scores) else None
+
+def _requirement_row(ord_: int, r: dict) -> tuple:
+    # both record shapes: sync (id/body_md) and generate (requirement_id/description)
+    acceptance = r.get("acceptance_criteria") or []
+    missing = bool(r.get("missing_acceptance_criteria")) or not acceptance
+    body = r.get("description") or r.get("body_md") or ""
+    return (ord_, r.get("requirement_id") or r.get("id"), str(r.get("title") or ""), r.get("milestone"),
+            r.get("priority"), int(missing), str(body), _dumps(r))
+
+class RequirementsStore:
+    """
+    Local SQLite store of requirements, acceptance criteria, milestones, seed evidence,
+    agent statuses and as-is inventory, with FTS5 indexes over requirement bodies and
+    scanned source text. The sync step writes requirements here first and exports the
+    JSON/JSONL from it; readers load a dataset through load_*(path), which only parses
+    the file when it differs from what the store already holds.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connect()
+        if self._version() not in (None, STORE_VERSION):
+            # a derived store: start over rather than migrate
+            self.db.close()
+            for suffix in ("", "-wal", "-shm"):
+                Path(str(self.path) + suffix).unlink(missing_ok=True)
+            self._connect()
+        with self.db:
+            self.db.executescript(SCHEMA)
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(STORE_VERSION),))
+        try:
+            self.db.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:  # SQLite built without FTS5: the rest still works
+            self.fts = False
+
+    @classmethod
+    def from_env(cls, root: Path):
+        """REQUIREMENTS_STORE=0 disables the store, any other value overrides its path."""
+        setting = os.getenv("REQUIREMENTS_STORE", "")
+        if setting.strip().lower() in {"0","off","false","no"}:
+            return None
+        return cls(Path(setting) if setting.strip() else root / DEFAULT_PATH)
+
+    def close(self):
+        self.db.close()
+
+    def _connect(self):
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+
+    def _version(self):
+        try:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return int(row[0]) if row else None
+
+    # ---- dataset stamps ----
+
+    def current(self, name: str, path: Path) -> bool:
+        """True when dataset `name` was loaded from a file with `path`'s content."""
+        row = self.db.execute("SELECT size, mtime_ns, racy, sha256 FROM datasets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return False
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        size, mtime_ns, racy, sha = row
+        if size == st.st_size and mtime_ns == st.st_mtime_ns and not racy:
+            return True
+        if sha != sha256_file(path):
+            return False
+        self._stamp(name, path, st, sha, rows=None)
+        return True
+
+    def _stamp(self, name: str, path: Path, st, sha: str, rows: int = None):
+        with self.db:
+            if rows is None:
+                self.db.execute("UPDATE datasets SET source = ?, size = ?, mtime_ns = ?, racy = ?, sha256 = ? WHERE name = ?",
+                                (path.as_posix(), st.st_size, st.st_mtime_ns, _racy(st.st_mtime_ns), sha, name))
+            else:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO datasets (name, source, size, mtime_ns, racy, sha256, rows, updated_utc) "
+                    "VALUES (?,?,?,?,?,?,?,?)",
+                    (name, path.as_posix(), st.st_size, st.st_mtime_ns, _racy(st.st_mtime_ns), sha, rows, _utc()))
+
+    def stamp(self, name: str, path: Path):
+        """Records that dataset `name` now corresponds to the file at `path` (e.g. its export)."""
+        rows = self.db.execute("SELECT rows FROM datasets WHERE name = ?", (name,)).fetchone()
+        self._stamp(name, path, path.stat(), sha256_file(path), rows=rows[0] if rows else 0)
+
+    def _replace_dataset(self, name: str, rows: int):
+        # the dataset's rows changed; until stamp() runs no file is known to match it
+        self.db.execute("INSERT OR REPLACE INTO datasets (name, source, size, mtime_ns, racy, sha256, rows, updated_utc) "
+                        "VALUES (?, '', NULL, NULL, 0, '', ?, ?)", (name, rows, _utc()))
+
+    def datasets(self) -> list:
+        return [dict(zip(("name", "source", "rows", "updated_utc"), r)) for r in
+                self.db.execute("SELECT name, source, rows, updated_utc FROM datasets ORDER BY name")]
+
+    # ---- requirements ----
+
+    @perf_trace.traced("requirements_store.put_requirements")
+    def put_requirements(self, reqs: list) -> int:
+        """
+        Replaces the requirements dataset with `reqs` (in order); only rows whose record
+        changed are rewritten, together with their criteria and full-text entries.
+        Returns the number of rows written.
+        """
+        old = dict(self.db.execute("SELECT ord, record FROM requirements"))
+        rows = [_requirement_row(i, r) for i, r in enumerate(reqs)]
+        changed = [row for row in rows if old.get(row[0]) != row[-1]]
+        gone = [o for o in old if o >= len(rows)]
+        with self.db:
+            stale = [(row[0],) for row in changed if row[0] in old] + [(o,) for o in gone]
+            self.db.executemany("DELETE FROM requirements WHERE ord = ?", stale)
+            self.db.executemany("DELETE FROM acceptance_criteria WHERE req_ord = ?", stale)
+            if self.fts:
+                self.db.executemany("DELETE FROM requirements_fts WHERE rowid = ?", stale)
+            self.db.executemany("INSERT INTO requirements (ord, requirement_id, title, milestone, priority, "
+                                "missing_acceptance, body, record) VALUES (?,?,?,?,?,?,?,?)", changed)
+            self.db.executemany("INSERT INTO acceptance_criteria (req_ord, ord, text) VALUES (?,?,?)",
+                                ((row[0], j, str(a)) for row in changed
+                                 for j, a in enumerate(reqs[row[0]].get("acceptance_criteria") or [])))
+            if self.fts:
+                self.db.executemany("INSERT INTO requirements_fts (rowid, title, body) VALUES (?,?,?)",
+                                    ((row[0], row[2], row[6]) for row in changed))
+            self.db.execute("UPDATE milestones SET requirements = 0")
+            self.db.executemany(
+                "INSERT INTO milestones (milestone, requirements) VALUES (?, ?) "
+                "ON CONFLICT (milestone) DO UPDATE SET requirements = excluded.requirements",
+                self.db.execute("SELECT milestone, COUNT(*) FROM requirements WHERE milestone IS NOT NULL "
+                                "GROUP BY milestone").fetchall())
+            self._replace_dataset("requirements", len(rows))
+        return len(changed)
+
+    def put_milestones(self, milestones: list):
+        """Names and target statuses of CANONICAL.json milestones ([{"id", "name", "target_status"}])."""
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO milestones (milestone, name, target_status) VALUES (?,?,?) "
+                "ON CONFLICT (milestone) DO UPDATE SET name = excluded.name, target_status = excluded.target_status",
+                ((m["id"], m.get("name"), m.get("target_status")) for m in milestones if isinstance(m, dict) and m.get("id")))
+
+    def load_requirements(self, path: Path) -> list:
+        """The requirement records of the JSONL at `path`, parsed only if the store lacks them."""
+        if not self.current("requirements", path):
+            self.put_requirements(load_jsonl(path))
+            self.stamp("requirements", path)
+        return self.requirements()
+
+    def requirements(self) -> list:
+        return [json.loads(r) for (r,) in self.db.execute("SELECT record FROM requirements ORDER BY ord")]
+
+    def requirement(self, requirement_id: str):
+        row = self.db.execute("SELECT record FROM requirements WHERE requirement_id = ? ORDER BY ord LIMIT 1",
+                              (requirement_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def missing_acceptance(self) -> list:
+        """Requirement records without acceptance criteria, in document order."""
+        return [json.loads(r) for (r,) in self.db.execute(
+            "SELECT record FROM requirements WHERE missing_acceptance = 1 ORDER BY ord")]
+
+    def count(self, table: str) -> int:
+        return self.db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    # ---- seed evidence, agent statuses, inventory ----
+
+    def put_seed(self, records: list):
+        with self.db:
+            self.db.execute("DELETE FROM seed")
+            self.db.execute("DELETE FROM seed_evidence")
+            self.db.executemany("INSERT INTO seed (ord, requirement_id, seed_status, record) VALUES (?,?,?,?)",
+                                ((i, r.get("requirement_id"), r.get("seed_status"), _dumps(r)) for i, r in enumerate(records)))
+            self.db.executemany("INSERT INTO seed_evidence (seed_ord, rank, path, score) VALUES (?,?,?,?)",
+                                _seed_evidence_rows(records))
+            self._replace_dataset("seed", len(records))
+
+    def seed(self) -> list:
+        return [json.loads(r) for (r,) in self.db.execute("SELECT record FROM seed ORDER BY ord")]
+
+    def citing(self, path: str) -> list:
+        """requirement_ids whose seed evidence or agent status cites `path`."""
+        rows = self.db.execute(
+            "SELECT s.requirement_id FROM seed_evidence e JOIN seed s ON s.ord = e.seed_ord WHERE e.path = ? "
+            "UNION SELECT st.requirement_id FROM status_evidence e JOIN statuses st ON st.ord = e.status_ord "
+            "WHERE e.ref = ?", (path, path))
+        return sorted(r for (r,) in rows if r)
+
+    def status_writer(self, source: Path):
+        """A StatusWriter that streams status records into the store (see make_dashboard)."""
+        return StatusWriter(self, source)
+
+    def load_statuses(self, path: Path) -> list:
+        if not self.current("status", path):
+            w = self.status_writer(path)
+            for r in load_jsonl(path):
+                w.add(r)
+            w.close()
+        return self.statuses()
+
+    def statuses(self) -> list:
+        return [json.loads(r) for (r,) in self.db.execute("SELECT record FROM statuses ORDER BY ord")]
+
+    def status_counts(self) -> dict:
+        """{milestone: {status: count}} straight from the (milestone, status) index."""
+        out = {}
+        for m, s, n in self.db.execute("SELECT milestone, status, COUNT(*) FROM statuses GROUP BY milestone, status"):
+            out.setdefault(m, {})[s] = n
+        return out
+
+    def put_inventory(self, inv: dict):
+        """as_is_scan.json: each list becomes rows of its kind; the git block is one row."""
+        rows = [("git", 0, None, _dumps(inv.get("git") or {}))]
+        for kind, name_key in INVENTORY_LISTS.items():
+            for i, item in enumerate(inv.get(kind) or []):
+                name = item.get(name_key) if name_key and isinstance(item, dict) else (item if isinstance(item, str) else None)
+                rows.append((kind, i, name, _dumps(item)))
+        with self.db:
+            self.db.execute("DELETE FROM inventory")
+            self.db.executemany("INSERT INTO inventory (kind, ord, name, record) VALUES (?,?,?,?)", rows)
+            self._replace_dataset("inventory", len(rows))
+
+    def inventory(self, kind: str) -> list:
+        return [json.loads(r) for (r,) in self.db.execute("SELECT record FROM inventory WHERE kind = ? ORDER BY ord", (kind,))]
+
+    # ---- full-text search ----
+
+    @perf_trace.traced("requirements_store.index_sources")
+    def index_sources(self, root: Path) -> dict:
+        """
+        Brings sources_fts up to date with the evidence files under `root` (the same file set
+        as EvidenceIndex). Unchanged files cost a stat; changed ones are re-read and re-indexed.
+        """
+        if not self.fts:
+            raise RuntimeError("SQLite was built without FTS5")
+        known = {path: (sid, size, mtime_ns, racy, sha) for sid, path, size, mtime_ns, racy, sha in
+                 self.db.execute("SELECT id, path, size, mtime_ns, racy, sha256 FROM sources")}
+        stats = {"files": 0, "indexed": 0, "removed": 0, "skipped": 0}
+        seen = set()
+        limits = ScanLimits.from_env()
+        with self.db:
+            for p, rel in iter_evidence_files(root):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                if limits.skip_by_stat(p.name, st.st_size):
+                    stats["skipped"] += 1
+                    continue
+                seen.add(rel)
+                stats["files"] += 1
+                old = known.get(rel)
+                if old and old[1] == st.st_size and old[2] == st.st_mtime_ns and not old[3]:
+                    continue
+                try:
+                    data = p.read_bytes()
+                except OSError:
+                    continue
+                sha = hashlib.sha256(data).hexdigest()
+                if old and old[4] == sha:
+                    self.db.execute("UPDATE sources SET size = ?, mtime_ns = ?, racy = ? WHERE id = ?",
+                                    (st.st_size, st.st_mtime_ns, _racy(st.st_mtime_ns), old[0]))
+                    continue
+                if old:
+                    self.db.execute("DELETE FROM sources_fts WHERE rowid = ?", (old[0],))
+                    self.db.execute("DELETE FROM sources WHERE id = ?", (old[0],))
+                sid = self.db.execute("INSERT INTO sources (path, size, mtime_ns, racy, sha256) VALUES (?,?,?,?,?)",
+                                      (rel, st.st_size, st.st_mtime_ns, _racy(st.st_mtime_ns), sha)).lastrowid
+                # binary/generated files stay in `sources` (so they are not re-read) with no text
+                skip = limits.sniff and sniff(data)
+                self.db.execute("INSERT INTO sources_fts (rowid, body) VALUES (?, ?)", (sid, "" if skip else decode_text(data)))
+                stats["skipped" if skip else "indexed"] += 1
+            gone = [(known[rel][0],) for rel in known if rel not in seen]
+            self.db.executemany("DELETE FROM sources_fts WHERE rowid = ?", gone)
+            self.db.executemany("DELETE FROM sources WHERE id = ?", gone)
+            stats["removed"] = len(gone)
+        return stats
+
+    def search(self, text: str, limit: int = 10) -> list:
+        """[(requirement_id, title, bm25 rank)] for requirements whose title/body has every word."""
+        q = fts_query(text)
+        if not q or not self.fts:
+            return []
+        return self.db.execute(
+            "SELECT r.requirement_id, r.title, bm25(requirements_fts) AS rank FROM requirements_fts f "
+            "JOIN requirements r ON r.ord = f.rowid WHERE requirements_fts MATCH ? ORDER BY rank LIMIT ?",
+            (q, limit)).fetchall()
+
+    def search_sources(self, text: str, limit: int = 10) -> list:
+        """[(path, bm25 rank)] for indexed source files containing every word."""
+        q = fts_query(text)
+        if not q or not self.fts:
+            return []
+        return self.db.execute(
+            "SELECT s.path, bm25(sources_fts) AS rank FROM sources_fts f JOIN sources s ON s.id = f.rowid "
+            "WHERE sources_fts MATCH ? ORDER BY rank LIMIT ?", (q, limit)).fetchall()
+
+class StatusWriter:
+    """Streams requirements_status records into the store in batches; close() commits and stamps."""
+
+    def __init__(self, store: RequirementsStore, source: Path):
+        self.store = store
+        self.source = source
+        self.n = 0
+        self._rows, self._refs = [], []
+        store.db.execute("BEGIN")
+        store.db.execute("DELETE FROM statuses")
+        store.db.execute("DELETE FROM status_evidence")
+
+    def add(self, r: dict):
+        self._rows.append((self.n, r.get("requirement_id"), r.get("milestone"), r.get("status"), _dumps(r)))
+        ev = r.get("evidence")
+        refs = ev if isinstance(ev, list) else list(ev.values()) if isinstance(ev, dict) else []
+        self._refs.extend((self.n, k, str(x)) for k, x in enumerate(refs) if isinstance(x, str))
+        self.n += 1
+        if len(self._rows) >= BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        db = self.store.db
+        db.executemany("INSERT INTO statuses (ord, requirement_id, milestone, status, record) VALUES (?,?,?,?,?)", self._rows)
+        db.executemany("INSERT INTO status_evidence (status_ord, ord, ref) VALUES (?,?,?)", self._refs)
+        self._rows, self._refs = [], []
+
+    def close(self):
+        self._flush()
+        self.store._replace_dataset("status", self.n)
+        self.store.db.commit()
+        self.store.stamp("status", self.source)
+
+    def abort(self):
+        self.store.db.rollback()
+
+def build(store: RequirementsStore, root: Path, sources: bool = True) -> list:
+    """Loads every dataset whose file exists under `root`; returns report lines."""
+    out = []
+    for name, rels in (("requirements", ["AgentInput/requirements.jsonl", "Requirements/requirements.jsonl"]),
+                       ("seed", ["AgentInput/requirements_status_seed.jsonl"]),
+                       ("status", ["AgentOutput/requirements_status.jsonl"]),
+                       ("inventory", ["AgentInput/as_is_scan.json"])):
+        p = next((root / r for r in rels if (root / r).exists()), None)
+        if p is None:
+            out.append(f"{name:<13} (no source file)")
+            continue
+        if store.current(name, p):
+            out.append(f"{name:<13} unchanged ({p.relative_to(root).as_posix()})")
+            continue
+        if name == "requirements":
+            store.load_requirements(p)
+        elif name == "seed":
+            store.put_seed(load_jsonl(p))
+            store.stamp(name, p)
+        elif name == "status":
+            store.load_statuses(p)
+        else:
+            store.put_inventory(json.loads(p.read_text(encoding="utf-8-sig")))
+            store.stamp(name, p)
+        out.append(f"{name:<13} loaded from {p.relative_to(root).as_posix()}")
+    canonical = root / "Requirements" / "CANONICAL.json"
+    if canonical.exists():
+        try:
+            data = json.loads(canonical.read_text(encoding="utf-8-sig"))
+        except ValueError:
+            data = {}
+        if isinstance(data, dict) and isinstance(data.get("milestones"), list):
+            store.put_milestones(data["milestones"])
+    if sources and store.fts:
+        s = store.index_sources(root)
+        out.append(f"{'sources':<13} {s['files']} files, {s['indexed']} indexed, {s['removed']} removed, {s['skipped']} skipped")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="SQLite requirements/evidence store with full-text search.")
+    ap.add_argument("--db", default="", help="Store path (default: REQUIREMENTS_STORE or Artifacts/requirements_store.sqlite)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="Load every dataset found in the repo and index source text")
+    b.add_argument("--no-sources", action="store_true", help="Skip the source full-text index")
+    s = sub.add_parser("search", help="Full-text search of requirements (or --sources)")
+    s.add_argument("text")
+    s.add_argument("--sources", action="store_true")
+    s.add_argument("--limit", type=int, default=10)
+    e = sub.add_parser("export", help="Write a dataset back out as JSONL")
+    e.add_argument("dataset", choices=["requirements", "seed", "status"])
+    e.add_argument("--out", default="", help="Output file (default: stdout)")
+    sub.add_parser("stats", help="Dataset sources and row counts")
+    args = ap.parse_args()
+
+    root = Path(".").resolve()
+    store = RequirementsStore(Path(args.db)) if args.db else RequirementsStore.from_env(root)
+    if store is None:
+        raise SystemExit("REQUIREMENTS_STORE is disabled")
+    try:
+        if args.cmd == "build":
+            t0 = time.perf_counter()
+            for line in build(store, root, sources=not args.no_sources):
+                print(line)
+            print(f"Store: {store.path} ({time.perf_counter() - t0:.2f}s)")
+        elif args.cmd == "search":
+            hits = store.search_sources(args.text, args.limit) if args.sources else store.search(args.text, args.limit)
+            for h in hits:
+                print("\t".join(str(x) if not isinstance(x, float) else f"{x:.3f}" for x in h))
+            if not store.fts:
+                print("WARN: SQLite was built without FTS5; search is unavailable.", file=sys.stderr)
+        elif args.cmd == "export":
+            records = {"requirements": store.requirements, "seed": store.seed, "status": store.statuses}[args.dataset]()
+            text = "".join(_dumps(r) + "\n" for r in records)
+            if args.out:
+                Path(args.out).write_text(text, encoding="utf-8")
+                print(f"Wrote: {args.out} ({len(records)} records)")
+            else:
+                sys.stdout.write(text)
+        else:
+            for d in store.datasets():
+                print(f"{d['name']:<13} {d['rows']:>8} rows  {d['source'] or '(not exported)'}  {d['updated_utc']}")
+            for t in ("acceptance_criteria", "milestones", "seed_evidence", "status_evidence", "sources"):
+                print(f"{t:<20} {store.count(t):>8}")
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    perf_trace.run("requirements_store", main)
@@ -0,0 +1,82 @@
+import re
+
+# Route-like strings in prose: "/drivers/{driverId}/trips", "GET /payments/:id/refund".
+# The lookbehind skips relative file paths ("scripts/x.py", "./a/b") and URL hosts.
+MENTION_RE = re.compile(r"(?<![\w.:/\-])/[A-Za-z0-9_\-{}:<>\[\]$*.]+(?:/[A-Za-z0-9_\-{}:<>\[\]$*.]*)*")
+
+# Path parameters in the styles the extractors and the requirements use:
+# :id  {driverId}  <id>  [id]  ${id}  *  **
+PARAM_RE = re.compile(r"^(?::\w+\??|\{[^/{}]*\}|<[^/<>]*>|\[[^/\[\]]*\]|\$\{[^/{}]*\}|\*{1,2})$")
+
+# Leading segments that are deployment prefixes, not part of the route: /api, /v1, /api/v2
+PREFIX_RE = re.compile(r"^(?:api|v\d+)$")
+
+PARAM = "*"
+END = ""
+
+def route_segments(path: str) -> list:
+    """
+    Normalized segments of a route template: lowercased literals, every parameter as "*",
+    no query string, no empty segments. "/Drivers/{driverId}/" -> ["drivers", "*"].
+    """
+    path = path.split("?", 1)[0].split("#", 1)[0]
+    out = []
+    for seg in path.split("/"):
+        if not seg:
+            continue
+        out.append(PARAM if PARAM_RE.match(seg) else seg.lower())
+    return out
+
+def route_key(segs: list) -> list:
+    """Segments with deployment prefixes removed: ["api", "v1", "drivers"] -> ["drivers"]."""
+    i = 0
+    while i < len(segs) and PREFIX_RE.match(segs[i]):
+        i += 1
+    return segs[i:]
+
+def route_mentions(text: str) -> list:
+    """Segment lists of every route-like string in `text`, in order of appearance."""
+    out = []
+    for m in MENTION_RE.finditer(text):
+        # drop sentence punctuation picked up from prose ("... via /driver/status.")
+        segs = route_segments(m.group(0).rstrip(".:"))
+        if segs:
+            out.append(segs)
+    return out
+
+class RouteTrie:
+    """
+    Segment trie of documented routes. Routes are keyed without deployment prefixes, so
+    "/api/v1/driver/profile" in the requirements covers the endpoint "/driver/profile"
+    and the other way round. A lookup walks one node per endpoint segment.
+    """
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    @classmethod
+    def from_text(cls, text: str):
+        t = cls()
+        for segs in route_mentions(text):
+            t.add(segs)
+        return t
+
+    def add(self, segs: list):
+        segs = route_key(segs)
+        if not segs:
+            return
+        node = self.root
+        for s in segs:
+            node = node.setdefault(s, {})
+        if END not in node:
+            node[END] = True
+            self.size += 1
+
+    def __contains__(self, path: str) -> bool:
+        node = self.root
+        for s in route_key(route_segments(path)):
+            node = node.get(s)
+            if node is None:
+                return False
+        return END in node
@@ -99,6 +99,11 @@ if (-not $SkipAgenticScan) {
       $env:TOP_K          = "999999"
       $env:MAX_CANDIDATES = "999999"
 
+      # Per-stage timings: set PERF_TRACE=1 before running the audit to record them
+      if ($env:PERF_TRACE) {
+        & $pythonExe @pyPrefix "scripts/perf_trace.py" reset
+      }
+
       LogLine "Running: agentic_scan_runner.py"
       & $pythonExe @pyPrefix "scripts/agentic_scan_runner.py" --run-mode full --batch-size 999999 2>&1 | Tee-Object -FilePath $LogPath -Append | Out-Null
       $exit1 = $LASTEXITCODE
@@ -127,6 +132,10 @@ if (-not $SkipAgenticScan) {
           }
         }
       }
+
+      if ($env:PERF_TRACE) {
+        & $pythonExe @pyPrefix "scripts/perf_trace.py" summary --append $LogPath | Out-Null
+      }
     }
   }
 } else {
@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from pathlib import Path
+
+import perf_trace
+
+# Bump whenever build_prompt() or the expected answer shape changes.
+PROMPT_VERSION = "status-eval-v1"
+
+# Completion tokens assumed for a call before it is made (rate limiting, budget reservations).
+OUTPUT_TOKENS_ESTIMATE = 1000
+
+SYSTEM_PROMPT = (
+    "You audit a rideshare platform repository against one canonical requirement. "
+    "Use only the evidence given. Answer with a single JSON object: "
+    '{"status": <one of the allowed statuses>, "evidence": [<"file:<path>" or "route:<METHOD path>" ...>], '
+    '"gaps": [<missing pieces>], "notes": <short rationale>}.'
+)
+
+class RetryableError(Exception):
+    """Transient backend failure (rate limit, timeout, 5xx); the engine retries these."""
+
+class BudgetExceeded(Exception):
+    pass
+
+class Budget:
+    """
+    Spend cap shared by the workers. reserve() holds the estimated cost of a call before it
+    is made and raises BudgetExceeded when that would cross the cap; settle() replaces the
+    hold with the actual cost once the call returns (release() when nothing was billed).
+    """
+
+    def reserve(self, input_tokens: int, output_tokens: int, requirement_id: str):
+        raise NotImplementedError
+
+    def settle(self, hold, input_tokens: int, output_tokens: int, requirement_id: str):
+        raise NotImplementedError
+
+    def release(self, hold):
+        raise NotImplementedError
+
+class TokenBucket:
+    """
+    Async token bucket: `rate_per_min` tokens refill continuously up to `capacity`.
+    acquire(n) waits until n tokens are available. Requests larger than the capacity are
+    allowed once the bucket is full, so one oversized prompt can't deadlock the engine.
+    """
+
+    def __init__(self, rate_per_min: float, capacity: float = None, clock=time.monotonic):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_min
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, n: float = 1.0):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            need = min(n, self.capacity)
+            while True:
+                self._refill()
+                if self.tokens >= need:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((need - self.tokens) / self.rate)
+
+class ModelBackend:
+    """Pluggable model client. complete() returns (text, input_tokens, output_tokens)."""
+    name = "backend"
+
+    async def complete(self, system: str, prompt: str, model: str) -> tuple[str, int, int]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class OpenAIBackend(ModelBackend):
+    name = "openai"
+
+    def __init__(self, timeout_s: float = 120.0):
+        import openai  # optional: only needed for real runs
+        self._openai = openai
+        self.client = openai.AsyncOpenAI(timeout=timeout_s, max_retries=0)
+
+    async def complete(self, system, prompt, model):
+        o = self._openai
+        try:
+            r = await self.client.chat.completions.create(
+                model=model,
+                messages=[{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+                response_format={"type": "json_object"},
+            )
+        except (o.RateLimitError, o.APITimeoutError, o.APIConnectionError, o.InternalServerError) as e:
+            raise RetryableError(str(e)) from e
+        u = r.usage
+        return r.choices[0].message.content or "", int(u.prompt_tokens if u else 0), int(u.completion_tokens if u else 0)
+
+    async def close(self):
+        await self.client.close()
+
+class FakeBackend(ModelBackend):
+    """
+    Offline backend for tests and benchmarks: deterministic answers (hash of the prompt),
+    log-normal latency around `latency_ms`, and a seeded rate of retryable failures.
+    """
+    name = "fake"
+
+    def __init__(self, statuses, latency_ms: float = 50.0, fail_rate: float = 0.0, seed: int = 0):
+        self.statuses = list(statuses) or ["UNKNOWN_REVIEW_NEEDED"]
+        self.latency_ms = latency_ms
+        self.fail_rate = fail_rate
+        self.rnd = random.Random(seed)
+
+    async def complete(self, system, prompt, model):
+        delay = self.rnd.lognormvariate(0, 0.5) * self.latency_ms / 1000.0
+        await asyncio.sleep(delay)
+        if self.rnd.random() < self.fail_rate:
+            raise RetryableError("fake transient failure")
+        h = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+        answer = {
+            "status": self.statuses[h % len(self.statuses)],
+            "evidence": [],
+            "gaps": [],
+            "notes": f"fake backend ({PROMPT_VERSION})",
+        }
+        return json.dumps(answer), estimate_tokens(system + prompt), 60
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def build_prompt(req: dict, evidence: list, statuses: list) -> str:
+    parts = [
+        f"Requirement {req['requirement_id']}: {req.get('title') or ''}",
+        f"Milestone: {req.get('milestone') or '(none)'}",
+        "",
+        (req.get("description") or "").strip(),
+    ]
+    if req.get("acceptance_criteria"):
+        parts += ["", "Acceptance criteria:"] + [f"- {a}" for a in req["acceptance_criteria"]]
+    parts += ["", "Allowed statuses: " + ", ".join(statuses), "", "Evidence:"]
+    if not evidence:
+        parts.append("(no candidate evidence found by the seed scan)")
+    for ev in evidence:
+        parts.append(f"--- {ev['path']}")
+        if ev.get("snippet"):
+            parts.append(ev["snippet"])
+    return "\n".join(parts)
+
+def parse_answer(text: str, statuses: list) -> dict:
+    try:
+        obj = json.loads(text)
+        if not isinstance(obj, dict):
+            raise ValueError("not a JSON object")
+    except Exception:
+        return {"status": "UNKNOWN_REVIEW_NEEDED", "evidence": [], "gaps": [], "notes": "Model answer was not valid JSON."}
+    status = obj.get("status")
+    if status not in statuses:
+        status = "UNKNOWN_REVIEW_NEEDED"
+    return {
+        "status": status,
+        "evidence": [str(x) for x in (obj.get("evidence") or []) if x],
+        "gaps": [str(x) for x in (obj.get("gaps") or []) if x],
+        "notes": str(obj.get("notes") or ""),
+    }
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    v = sorted(values)
+    return v[min(len(v) - 1, int(round(q * (len(v) - 1))))]
+
+class EvaluationEngine:
+    """
+    Evaluates requirements concurrently: at most `concurrency` requests in flight, request
+    and token rate limits enforced by token buckets, retryable failures retried with
+    jittered exponential backoff. on_result(record) is called as each requirement finishes.
+    """
+
+    def __init__(self, backend: ModelBackend, *, model: str, statuses: list, concurrency: int = 4,
+                 rpm: float = 60, tpm: float = 200_000, max_retries: int = 5,
+                 backoff_base_s: float = 1.0, backoff_max_s: float = 60.0, budget: Budget = None, seed: int = None):
+        self.backend = backend
+        self.model = model
+        self.statuses = statuses
+        self.concurrency = max(1, concurrency)
+        self.req_bucket = TokenBucket(rpm, capacity=max(1.0, min(rpm, self.concurrency)))
+        self.tok_bucket = TokenBucket(tpm)
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.budget = budget
+        self.rnd = random.Random(seed)
+        self.latencies = []
+        self.failed_ids = set()  # answers synthesized after retries ran out; not worth caching
+        self.stats = {"requests": 0, "retries": 0, "failed": 0, "input_tokens": 0, "output_tokens": 0}
+
+    async def _call(self, prompt: str) -> tuple[str, int, int]:
+        est = estimate_tokens(SYSTEM_PROMPT + prompt) + OUTPUT_TOKENS_ESTIMATE
+        for attempt in range(self.max_retries + 1):
+            await self.req_bucket.acquire(1)
+            await self.tok_bucket.acquire(est)
+            self.stats["requests"] += 1
+            try:
+                return await self.backend.complete(SYSTEM_PROMPT, prompt, self.model)
+            except RetryableError:
+                if attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                # full jitter: uniform(0, min(cap, base * 2^attempt))
+                await asyncio.sleep(self.rnd.uniform(0, min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt))))
+
+    async def _evaluate_one(self, req: dict, evidence: list) -> dict:
+        prompt = build_prompt(req, evidence, self.statuses)
+        hold = None
+        if self.budget is not None:
+            # raises BudgetExceeded before anything is spent
+            hold = self.budget.reserve(estimate_tokens(SYSTEM_PROMPT + prompt), OUTPUT_TOKENS_ESTIMATE,
+                                       req["requirement_id"])
+        t0 = time.perf_counter()
+        try:
+            text, tin, tout = await self._call(prompt)
+            answer = parse_answer(text, self.statuses)
+        except RetryableError as e:
+            self.stats["failed"] += 1
+            self.failed_ids.add(req["requirement_id"])
+            tin = tout = 0
+            answer = {"status": "UNKNOWN_REVIEW_NEEDED", "evidence": [], "gaps": [],
+                      "notes": f"Evaluation failed after {self.max_retries} retries: {e}"}
+        except Exception as e:
+            # not retryable (e.g. a 400 for an oversized prompt): this requirement only
+            self.stats["failed"] += 1
+            self.failed_ids.add(req["requirement_id"])
+            tin = tout = 0
+            answer = {"status": "UNKNOWN_REVIEW_NEEDED", "evidence": [], "gaps": [],
+                      "notes": f"Evaluation failed: {type(e).__name__}: {e}"}
+        except BaseException:
+            if hold is not None:
+                self.budget.release(hold)
+            raise
+        if hold is not None:
+            if tin or tout:
+                self.budget.settle(hold, tin, tout, req["requirement_id"])
+            else:
+                self.budget.release(hold)
+        self.latencies.append(time.perf_counter() - t0)
+        self.stats["input_tokens"] += tin
+        self.stats["output_tokens"] += tout
+        perf_trace.count("tokens_sent", tin)
+        perf_trace.count("tokens_received", tout)
+        rec = {
+            "requirement_id": req["requirement_id"],
+            "title": req.get("title"),
+            "milestone": req.get("milestone"),
+            **answer,
+        }
+        return rec, tin, tout
+
+    async def run(self, items, on_result) -> dict:
+        """
+        items: iterable of (requirement, evidence list). Stops scheduling new work once the
+        budget cannot cover another call; calls already in flight hold a reservation, so
+        they are delivered (and recorded) without overshooting the cap.
+        """
+        queue = asyncio.Queue()
+        for it in items:
+            queue.put_nowait(it)
+        stop = {"reason": ""}
+        t_start = time.perf_counter()
+
+        async def worker():
+            while not stop["reason"]:
+                try:
+                    req, evidence = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    rec, tin, tout = await self._evaluate_one(req, evidence)
+                except BudgetExceeded as e:
+                    stop["reason"] = str(e)
+                    queue.put_nowait((req, evidence))  # counted as not started
+                    return
+                on_result(rec)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        wall = time.perf_counter() - t_start
+        done = len(self.latencies)
+        return {
+            "backend": self.backend.name,
+            "concurrency": self.concurrency,
+            "completed": done,
+            "not_started": queue.qsize(),
+            "stopped_reason": stop["reason"],
+            "wall_seconds": round(wall, 3),
+            "throughput_per_min": round(done / wall * 60.0, 2) if wall > 0 else 0.0,
+            "latency_p50_s": round(percentile(self.latencies, 0.50), 3),
+            "latency_p95_s": round(percentile(self.latencies, 0.95), 3),
+            "latency_p99_s": round(percentile(self.latencies, 0.99), 3),
+            **self.stats,
+        }
+
+def load_evidence(root: Path, paths, max_files: int, snippet_chars: int) -> list:
+    out = []
+    for rel in list(paths)[:max_files]:
+        p = root / rel
+        snippet = ""
+        if snippet_chars > 0:
+            try:
+                snippet = p.read_text(encoding="utf-8", errors="replace")[:snippet_chars]
+            except Exception:
+                pass
+        out.append({"path": rel, "snippet": snippet})
+    return out
+
+class StreamingJsonlWriter:
+    """
+    Appends each record to `<path>.partial` as it arrives (flushed); finalize() writes
+    `path` in a stable order and drops the partial file. Until then `path` keeps the
+    previous run's output, so an aborted run loses nothing.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.partial = path.with_name(path.name + ".partial")
+        self.f = open(self.partial, "w", encoding="utf-8")
+        self.records = []
+
+    def write(self, rec: dict):
+        self.records.append(rec)
+        self.f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def finalize(self, order: list):
+        self.f.close()
+        pos = {rid: i for i, rid in enumerate(order)}
+        recs = sorted(self.records, key=lambda r: pos.get(r["requirement_id"], len(pos)))
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in recs), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self.partial.unlink(missing_ok=True)
+        return recs
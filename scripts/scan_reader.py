@@ -0,0 +1,157 @@
+import hashlib, mmap, os, re
+from contextlib import contextmanager
+from pathlib import Path
+
+from file_fact_cache import MISS
+import perf_trace
+
+# Shared file reader for repository scans: files are memory-mapped (small ones read) and
+# handed to byte-level extractors as a buffer, so nothing is decoded up front; extractors
+# decode only the regions they match. Files over the size cap, lockfiles and minified
+# assets (by name), and binary or generated content (by sniffing the first bytes) are
+# skipped before any extractor runs.
+
+DEFAULT_MAX_KB = 1024
+
+# Below this size read() is cheaper than setting up a mapping.
+MMAP_MIN_BYTES = 64 * 1024
+
+# Sniffing looks at this much of the head of a file.
+SNIFF_BYTES = 8192
+
+# A line this long in the head means minified or machine-written output.
+MAX_LINE_BYTES = 2000
+
+LOCKFILE_NAMES = {"package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb",
+                  "Cargo.lock", "poetry.lock", "composer.lock", "Gemfile.lock", "go.sum"}
+GENERATED_SUFFIXES = (".min.js", ".min.mjs", ".min.css", ".map", ".bundle.js", ".chunk.js")
+GENERATED_MARKERS = (b"@generated", b"DO NOT EDIT", b"Code generated by", b"Automatically generated by")
+NON_TEXT = re.compile(rb"[\x00-\x08\x0e-\x1a]")
+# A NUL byte, or this share of other control bytes in the head, means binary; a stray
+# control character in an otherwise textual file does not.
+BINARY_CONTROL_RATIO = 0.1
+NON_ASCII = re.compile(rb"[\x80-\xff]")
+
+class ScanLimits:
+    """Per-file size cap and whether to sniff out binary/generated files."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_KB * 1024, sniff: bool = True):
+        self.max_bytes = max_bytes
+        self.sniff = sniff
+
+    @classmethod
+    def from_env(cls):
+        """
+        SCAN_MAX_FILE_KB caps the size of files handed to extractors (0 = no cap);
+        SCAN_SNIFF=0 also reads lockfiles, minified, binary and generated files.
+        """
+        kb = os.getenv("SCAN_MAX_FILE_KB", "").strip()
+        sniff = os.getenv("SCAN_SNIFF", "").strip().lower() not in {"0","off","false","no"}
+        return cls(int(float(kb) * 1024) if kb else DEFAULT_MAX_KB * 1024, sniff)
+
+    def skip_by_stat(self, name: str, size: int):
+        """Skip reason decided from the name and size alone, or None."""
+        if self.max_bytes and size > self.max_bytes:
+            return "too_large"
+        if self.sniff and (name in LOCKFILE_NAMES or name.lower().endswith(GENERATED_SUFFIXES)):
+            return "name"
+        return None
+
+def sniff(buf) -> str:
+    """"binary", "generated" or "" from the head of a file's bytes."""
+    head = bytes(buf[:SNIFF_BYTES])
+    if b"\0" in head or len(NON_TEXT.findall(head)) > len(head) * BINARY_CONTROL_RATIO:
+        return "binary"
+    if any(m in head for m in GENERATED_MARKERS):
+        return "generated"
+    if len(head) > MAX_LINE_BYTES and max(map(len, head.split(b"\n"))) > MAX_LINE_BYTES:
+        return "generated"
+    return ""
+
+def is_ascii(buf) -> bool:
+    """bytes.isascii() for either kind of buffer mapped() hands out."""
+    return buf.isascii() if isinstance(buf, bytes) else NON_ASCII.search(buf) is None
+
+@contextmanager
+def mapped(path):
+    """The file's bytes as a read-only buffer: an mmap for large files, bytes otherwise."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_MIN_BYTES:
+            yield f.read()
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mm
+        finally:
+            mm.close()
+
+def lookup_facts(p: Path, rel: str, kind: str, extractor, cache=None, limits: ScanLimits = None):
+    """
+    What is known about file `p` without reading it: None when it is skipped (by name or
+    size, or a cached sniff verdict), the cached extractor result, or MISS.
+    """
+    limits = limits or ScanLimits.from_env()
+    reason = limits.skip_by_stat(p.name, p.stat().st_size)
+    if reason:
+        perf_trace.count(f"files_skipped_{reason}")
+        return None
+    if cache is None or not cache.enabled:
+        return MISS
+    value = cache.lookup(p, rel, kind, extractor)
+    if not limits.sniff:
+        return value
+    # one stat/rehash per file: the verdict of a file whose fact hit is read off the same entry
+    verdict = cache.lookup(p, rel, "sniff", sniff) if value is MISS else cache.peek(rel, "sniff", sniff)
+    if verdict is MISS:
+        return MISS
+    if verdict:
+        perf_trace.count(f"files_skipped_{verdict}")
+        return None
+    return value
+
+def extract_file(path, extractor, limits: ScanLimits = None):
+    """
+    Reads `path` once: (extractor(buffer) or None, sniff verdict, sha256, size, mtime_ns),
+    or None when the file cannot be read. Safe to run in a worker process.
+    """
+    limits = limits or ScanLimits.from_env()
+    try:
+        st = os.stat(path)
+        with mapped(path) as buf:
+            reason = sniff(buf) if limits.sniff else ""
+            value = None if reason else extractor(buf)
+            sha = hashlib.sha256(buf).hexdigest()
+    except OSError:
+        return None
+    return value, reason, sha, st.st_size, st.st_mtime_ns
+
+def store_facts(cache, rel: str, kind: str, extractor, result, limits: ScanLimits = None):
+    """Caches an extract_file() result (the sniff verdict too); returns its value."""
+    limits = limits or ScanLimits.from_env()
+    value, reason, sha, size, mtime_ns = result
+    perf_trace.count("files_read")
+    perf_trace.count("bytes_read", size)
+    if cache is not None and cache.enabled:
+        if limits.sniff:
+            cache.put(rel, "sniff", sniff, reason, sha, size, mtime_ns)
+        if not reason:
+            cache.put(rel, kind, extractor, value, sha, size, mtime_ns)
+    if reason:
+        perf_trace.count(f"files_skipped_{reason}")
+    return value
+
+def read_facts(p: Path, rel: str, kind: str, extractor, cache=None, limits: ScanLimits = None):
+    """
+    extractor(buffer) for file `p`, or None when the file is skipped (see ScanLimits and
+    sniff()). With a FileFactCache the result is cached under `kind` like cache.get(), and
+    the sniff verdict under "sniff", so unchanged files are neither read nor re-sniffed.
+    """
+    limits = limits or ScanLimits.from_env()
+    value = lookup_facts(p, rel, kind, extractor, cache, limits)
+    if value is not MISS:
+        return value
+    result = extract_file(p, extractor, limits)
+    if result is None:
+        raise OSError(f"cannot read {p}")
+    return store_facts(cache, rel, kind, extractor, result, limits)
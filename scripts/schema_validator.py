@@ -0,0 +1,657 @@
+import argparse, hashlib, json, math, os, random, re, sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import perf_trace
+
+# JSON Schema (draft 2020-12, with the draft-07 spellings of items/additionalItems and
+# boolean exclusiveMinimum/Maximum) compiled into nested check closures. Each closure
+# takes an instance and returns None when it is valid, or a list of (path, message)
+# with `path` a tuple of keys relative to the closure's own instance; allocations only
+# happen on the error path, so valid records cost little more than the type tests.
+#
+# Supported: type enum const required properties patternProperties additionalProperties
+# propertyNames minProperties maxProperties dependentRequired dependentSchemas items
+# prefixItems additionalItems contains minContains maxContains minItems maxItems
+# uniqueItems minLength maxLength pattern minimum maximum exclusiveMinimum exclusiveMaximum
+# multipleOf allOf anyOf oneOf not if/then/else $ref (within the document) $defs definitions.
+# "format" and other annotations are ignored, as the spec allows.
+
+# Bytes of JSONL handed to a worker at a time (cut at line boundaries).
+CHUNK_BYTES = 8 << 20
+
+# Below this size a JSONL file is checked in-process.
+PARALLEL_MIN_BYTES = 2 * CHUNK_BYTES
+
+UNSUPPORTED = {"unevaluatedProperties", "unevaluatedItems", "$dynamicRef", "$recursiveRef"}
+
+class SchemaError(ValueError):
+    """The schema is malformed or uses a keyword this compiler does not implement."""
+
+def pointer(path) -> str:
+    """RFC 6901 JSON pointer of a key path; "" is the document root."""
+    return "".join("/" + str(p).replace("~", "~0").replace("/", "~1") for p in path)
+
+def _norm(v):
+    # JSON equality: 1 == 1.0, but true != 1
+    if isinstance(v, bool) or v is None or isinstance(v, str):
+        return v
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if isinstance(v, dict):
+        return {k: _norm(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_norm(x) for x in v]
+    return v
+
+def canonical(v) -> str:
+    return json.dumps(_norm(v), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+TYPE_TESTS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: (isinstance(v, int) and not isinstance(v, bool)) or (isinstance(v, float) and v.is_integer()),
+}
+
+# Python types that exactly decide a JSON type ("number"/"integer" need the bool exclusion)
+EXACT_TYPES = {"object": dict, "array": list, "string": str, "boolean": bool, "null": type(None)}
+
+def _type_name(v) -> str:
+    if isinstance(v, bool):
+        return "boolean"
+    if v is None:
+        return "null"
+    for name, t in (("object", dict), ("array", list), ("string", str)):
+        if isinstance(v, t):
+            return name
+    return "integer" if isinstance(v, int) else "number"
+
+def _prefix(key, errs):
+    return [((key,) + p, m) for p, m in errs]
+
+def _all(checks):
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+    if len(checks) == 2:  # the common "type" + one keyword group
+        first, second = checks
+
+        def pair(v):
+            a, b = first(v), second(v)
+            return a + b if a and b else (a or b)
+        return pair
+
+    def check(v):
+        errs = None
+        for c in checks:
+            e = c(v)
+            if e:
+                errs = e if errs is None else errs + e
+        return errs
+    return check
+
+class Compiler:
+    """Compiles one schema document; $ref targets are compiled once and shared."""
+
+    def __init__(self, root):
+        self.root = root
+        self.base = root.get("$id", "").split("#")[0] if isinstance(root, dict) else ""
+        self.refs = {}
+
+    def compile(self, schema, where: str = "#"):
+        """The check closure for `schema`, or None when it accepts everything."""
+        if schema is True:
+            return None
+        if schema is False:
+            return lambda v: [((), "no value is allowed here")]
+        if not isinstance(schema, dict):
+            raise SchemaError(f"{where}: a schema must be an object or a boolean")
+        bad = UNSUPPORTED & set(schema)
+        if bad:
+            raise SchemaError(f"{where}: unsupported keyword(s) {', '.join(sorted(bad))}")
+        checks = []
+        for kw, build in KEYWORDS:
+            if any(k in schema for k in kw):
+                c = build(self, schema, where)
+                if c is not None:
+                    checks.append(c)
+        return _all(checks)
+
+    def resolve(self, ref: str, where: str):
+        doc_part, _, frag = ref.partition("#")
+        if doc_part and doc_part != self.base:
+            raise SchemaError(f"{where}: $ref {ref!r} points outside this schema document")
+        node = self.root
+        for tok in [t for t in frag.split("/")[1:]] if frag else []:
+            tok = tok.replace("~1", "/").replace("~0", "~")
+            try:
+                node = node[int(tok)] if isinstance(node, list) else node[tok]
+            except (KeyError, IndexError, ValueError, TypeError):
+                raise SchemaError(f"{where}: $ref {ref!r} does not resolve") from None
+        return "#" + frag, node
+
+    def ref(self, ref: str, where: str):
+        key, target = self.resolve(ref, where)
+        if key in self.refs:
+            cell = self.refs[key]
+            if cell[0] is not _PENDING:
+                return cell[0]
+            # recursive reference: go through the cell, which is filled once compiled
+            return lambda v: cell[0](v) if cell[0] is not None else None
+        cell = self.refs[key] = [_PENDING]
+        cell[0] = self.compile(target, key)
+        return cell[0]
+
+_PENDING = object()
+
+# ---- keyword builders: (keywords, builder(compiler, schema, where) -> check or None) ----
+
+def _k_type(c, s, where):
+    t = s["type"]
+    names = t if isinstance(t, list) else [t]
+    for n in names:
+        if n not in TYPE_TESTS:
+            raise SchemaError(f"{where}: unknown type {n!r}")
+    want = " or ".join(names)
+    if all(n in EXACT_TYPES for n in names):
+        py = tuple(EXACT_TYPES[n] for n in names)
+        check = lambda v: None if isinstance(v, py) else [((), f"expected {want}, got {_type_name(v)}")]
+        check.pytypes = py  # lets array items skip the per-item call
+        return check
+    tests = [TYPE_TESTS[n] for n in names]
+    return lambda v: None if any(t(v) for t in tests) else [((), f"expected {want}, got {_type_name(v)}")]
+
+def _k_enum(c, s, where):
+    values = s["enum"]
+    if not isinstance(values, list):
+        raise SchemaError(f"{where}: enum must be an array")
+    shown = ", ".join(json.dumps(x) for x in values[:10]) + (", ..." if len(values) > 10 else "")
+    if all(isinstance(x, str) for x in values):
+        allowed = frozenset(values)
+        return lambda v: None if isinstance(v, str) and v in allowed else [((), f"{json.dumps(v)[:80]} is not one of [{shown}]")]
+    keys = frozenset(canonical(x) for x in values)
+    return lambda v: None if canonical(v) in keys else [((), f"{json.dumps(v)[:80]} is not one of [{shown}]")]
+
+def _k_const(c, s, where):
+    key = canonical(s["const"])
+    return lambda v: None if canonical(v) == key else [((), f"must equal {key[:80]}")]
+
+def _k_object(c, s, where):
+    props = s.get("properties") or {}
+    prop_checks = []
+    for k, sub in props.items():
+        f = c.compile(sub, f"{where}/properties/{k}")
+        if f is not None:
+            prop_checks.append((k, f, getattr(f, "pytypes", None)))
+    patterns = []
+    for p, sub in (s.get("patternProperties") or {}).items():
+        try:
+            rx = re.compile(p)
+        except re.error as e:
+            raise SchemaError(f"{where}/patternProperties: bad pattern {p!r}: {e}") from None
+        patterns.append((rx, c.compile(sub, f"{where}/patternProperties/{p}")))
+    addl = s.get("additionalProperties", True)
+    addl_check = None if addl is False or addl is True else c.compile(addl, f"{where}/additionalProperties")
+    closed = addl is False
+    required = list(s.get("required") or [])
+    names = c.compile(s["propertyNames"], f"{where}/propertyNames") if "propertyNames" in s else None
+    min_p, max_p = s.get("minProperties"), s.get("maxProperties")
+    dep_req = s.get("dependentRequired") or {}
+    dep_sch = [(k, c.compile(sub, f"{where}/dependentSchemas/{k}")) for k, sub in (s.get("dependentSchemas") or {}).items()]
+    dep_sch = [(k, f) for k, f in dep_sch if f is not None]
+    known = set(props)
+    extra_needed = closed or addl_check is not None or patterns
+
+    def check(v):
+        if not isinstance(v, dict):
+            return None
+        errs = None
+        for k in required:
+            if k not in v:
+                errs = (errs or []) + [((), f"missing required property {k!r}")]
+        for k, f, py in prop_checks:
+            if k in v:
+                x = v[k]
+                if py is not None and isinstance(x, py):
+                    continue  # plain type check passed; skip the call
+                e = f(x)
+                if e:
+                    errs = (errs or []) + _prefix(k, e)
+        if extra_needed:
+            for k, x in v.items():
+                matched = k in known
+                for rx, f in patterns:
+                    if rx.search(k):
+                        matched = True
+                        e = f(x) if f is not None else None
+                        if e:
+                            errs = (errs or []) + _prefix(k, e)
+                if matched:
+                    continue
+                if closed:
+                    errs = (errs or []) + [((k,), "additional property not allowed")]
+                elif addl_check is not None:
+                    e = addl_check(x)
+                    if e:
+                        errs = (errs or []) + _prefix(k, e)
+        if names is not None:
+            for k in v:
+                e = names(k)
+                if e:
+                    errs = (errs or []) + [((k,), f"property name {k!r} is invalid: {m}") for _, m in e]
+        if min_p is not None and len(v) < min_p:
+            errs = (errs or []) + [((), f"must have at least {min_p} properties")]
+        if max_p is not None and len(v) > max_p:
+            errs = (errs or []) + [((), f"must have at most {max_p} properties")]
+        for k, deps in dep_req.items():
+            if k in v:
+                for d in deps:
+                    if d not in v:
+                        errs = (errs or []) + [((), f"property {d!r} is required when {k!r} is present")]
+        for k, f in dep_sch:
+            if k in v:
+                e = f(v)
+                if e:
+                    errs = (errs or []) + e
+        return errs
+    return check
+
+def _homogeneous(v: list, start: int, types) -> bool:
+    """True when every item from `start` on is an instance of `types`."""
+    for x in (v[start:] if start else v):
+        if not isinstance(x, types):
+            return False
+    return True
+
+def _k_array(c, s, where):
+    items = s.get("items", True)
+    prefix = s.get("prefixItems")
+    rest = items
+    if isinstance(items, list):  # draft-07 tuple form
+        prefix, rest = items, s.get("additionalItems", True)
+    prefix_checks = [c.compile(sub, f"{where}/prefixItems/{i}") for i, sub in enumerate(prefix or [])]
+    rest_closed = rest is False
+    rest_check = None if rest is True or rest is False else c.compile(rest, f"{where}/items")
+    rest_types = getattr(rest_check, "pytypes", None)
+    n_prefix = len(prefix_checks)
+    min_i, max_i = s.get("minItems"), s.get("maxItems")
+    unique = s.get("uniqueItems") is True
+    contains = c.compile(s["contains"], f"{where}/contains") if "contains" in s else None
+    has_contains = "contains" in s
+    min_c = s.get("minContains", 1)
+    max_c = s.get("maxContains")
+
+    def check(v):
+        if not isinstance(v, list):
+            return None
+        errs = None
+        for i, f in enumerate(prefix_checks[:len(v)]):
+            if f is not None:
+                e = f(v[i])
+                if e:
+                    errs = (errs or []) + _prefix(i, e)
+        if rest_closed and len(v) > n_prefix:
+            errs = (errs or []) + [((), f"at most {n_prefix} items are allowed")]
+        elif rest_check is not None and not (rest_types is not None and _homogeneous(v, n_prefix, rest_types)):
+            for i in range(n_prefix, len(v)):
+                e = rest_check(v[i])
+                if e:
+                    errs = (errs or []) + _prefix(i, e)
+        if min_i is not None and len(v) < min_i:
+            errs = (errs or []) + [((), f"must have at least {min_i} items")]
+        if max_i is not None and len(v) > max_i:
+            errs = (errs or []) + [((), f"must have at most {max_i} items")]
+        if unique and len(v) > 1:
+            seen = set()
+            for i, x in enumerate(v):
+                k = canonical(x)
+                if k in seen:
+                    errs = (errs or []) + [((i,), "duplicate item (uniqueItems)")]
+                seen.add(k)
+        if has_contains:
+            n = sum(1 for x in v if contains is None or not contains(x))
+            if n < min_c:
+                errs = (errs or []) + [((), f"must contain at least {min_c} matching item(s)")]
+            if max_c is not None and n > max_c:
+                errs = (errs or []) + [((), f"must contain at most {max_c} matching item(s)")]
+        return errs
+    return check
+
+def _k_string(c, s, where):
+    min_l, max_l = s.get("minLength"), s.get("maxLength")
+    rx = None
+    if "pattern" in s:
+        try:
+            rx = re.compile(s["pattern"])
+        except re.error as e:
+            raise SchemaError(f"{where}/pattern: bad pattern {s['pattern']!r}: {e}") from None
+    pat = s.get("pattern")
+
+    def check(v):
+        if not isinstance(v, str):
+            return None
+        errs = None
+        if min_l is not None and len(v) < min_l:
+            errs = [((), f"must be at least {min_l} characters long")]
+        if max_l is not None and len(v) > max_l:
+            errs = (errs or []) + [((), f"must be at most {max_l} characters long")]
+        if rx is not None and not rx.search(v):
+            errs = (errs or []) + [((), f"does not match pattern {pat!r}")]
+        return errs
+    return check
+
+def _k_number(c, s, where):
+    lo, hi = s.get("minimum"), s.get("maximum")
+    xlo, xhi = s.get("exclusiveMinimum"), s.get("exclusiveMaximum")
+    if xlo is True:  # draft-04 boolean form
+        lo, xlo = None, lo
+    elif xlo is False:
+        xlo = None
+    if xhi is True:
+        hi, xhi = None, hi
+    elif xhi is False:
+        xhi = None
+    mult = s.get("multipleOf")
+
+    def check(v):
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            return None
+        errs = None
+        if lo is not None and v < lo:
+            errs = [((), f"must be >= {lo}")]
+        if hi is not None and v > hi:
+            errs = (errs or []) + [((), f"must be <= {hi}")]
+        if xlo is not None and v <= xlo:
+            errs = (errs or []) + [((), f"must be > {xlo}")]
+        if xhi is not None and v >= xhi:
+            errs = (errs or []) + [((), f"must be < {xhi}")]
+        if mult is not None:
+            if isinstance(v, int) and isinstance(mult, int):
+                bad = v % mult != 0
+            else:
+                q = v / mult
+                bad = not math.isfinite(q) or abs(q - round(q)) > 1e-9 * max(1.0, abs(q))
+            if bad:
+                errs = (errs or []) + [((), f"must be a multiple of {mult}")]
+        return errs
+    return check
+
+def _subschemas(c, s, kw, where):
+    subs = s[kw]
+    if not isinstance(subs, list) or not subs:
+        raise SchemaError(f"{where}/{kw}: must be a non-empty array")
+    return [c.compile(sub, f"{where}/{kw}/{i}") for i, sub in enumerate(subs)]
+
+def _k_allof(c, s, where):
+    return _all([f for f in _subschemas(c, s, "allOf", where) if f is not None])
+
+def _k_anyof(c, s, where):
+    subs = _subschemas(c, s, "anyOf", where)
+    if any(f is None for f in subs):
+        return None
+    return lambda v: None if any(not f(v) for f in subs) else [((), "does not match any of the anyOf schemas")]
+
+def _k_oneof(c, s, where):
+    subs = _subschemas(c, s, "oneOf", where)
+
+    def check(v):
+        n = sum(1 for f in subs if f is None or not f(v))
+        if n == 1:
+            return None
+        return [((), "does not match any of the oneOf schemas" if n == 0 else f"matches {n} of the oneOf schemas (exactly one allowed)")]
+    return check
+
+def _k_not(c, s, where):
+    f = c.compile(s["not"], f"{where}/not")
+    return lambda v: [((), "must not match the 'not' schema")] if f is None or not f(v) else None
+
+def _k_if(c, s, where):
+    cond = c.compile(s["if"], f"{where}/if")
+    then = c.compile(s["then"], f"{where}/then") if "then" in s else None
+    other = c.compile(s["else"], f"{where}/else") if "else" in s else None
+    if then is None and other is None:
+        return None
+
+    def check(v):
+        if cond is None or not cond(v):
+            return then(v) if then is not None else None
+        return other(v) if other is not None else None
+    return check
+
+def _k_ref(c, s, where):
+    return c.ref(s["$ref"], where)
+
+KEYWORDS = [
+    (("$ref",), _k_ref),
+    (("type",), _k_type),
+    (("enum",), _k_enum),
+    (("const",), _k_const),
+    (("properties", "patternProperties", "additionalProperties", "required", "propertyNames",
+      "minProperties", "maxProperties", "dependentRequired", "dependentSchemas"), _k_object),
+    (("items", "prefixItems", "additionalItems", "contains", "minItems", "maxItems", "uniqueItems"), _k_array),
+    (("minLength", "maxLength", "pattern"), _k_string),
+    (("minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum", "multipleOf"), _k_number),
+    (("allOf",), _k_allof),
+    (("anyOf",), _k_anyof),
+    (("oneOf",), _k_oneof),
+    (("not",), _k_not),
+    (("if",), _k_if),
+]
+
+class Validator:
+    """A compiled schema. errors(instance) -> [(json_pointer, message)], [] when valid."""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._check = Compiler(schema).compile(schema)
+
+    def errors(self, instance) -> list:
+        if self._check is None:
+            return []
+        errs = self._check(instance)
+        return [(pointer(p), m) for p, m in errs] if errs else []
+
+_COMPILED = {}
+
+def compile_schema(schema) -> Validator:
+    """Validator for `schema`, compiled once per process for identical schema content."""
+    key = hashlib.sha256(canonical(schema).encode("utf-8")).hexdigest()
+    v = _COMPILED.get(key)
+    if v is None:
+        v = _COMPILED[key] = Validator(schema)
+    return v
+
+def load_json(path: Path):
+    return json.loads(Path(path).read_text(encoding="utf-8-sig"))
+
+# ---- JSONL: streaming, chunked, optionally over a process pool ----
+
+_worker = None
+
+def _init_worker(schema):
+    global _worker
+    _worker = compile_schema(schema)
+
+def _check_lines(validator, data: bytes):
+    """(lines, records, [(line_in_chunk, pointer, message)]) for one chunk of JSONL bytes."""
+    try:
+        lines = data.decode("utf-8").split("\n")  # one decode per chunk, not per line
+    except UnicodeDecodeError:
+        lines = data.split(b"\n")  # per line, so the bad line is the one reported
+    if lines and not lines[-1]:
+        lines.pop()
+    errors = []
+    records = 0
+    loads = json.loads
+    check = validator._check
+    for i, raw in enumerate(lines, start=1):
+        if not raw.strip():
+            continue
+        records += 1
+        try:
+            obj = loads(raw)
+        except ValueError as e:
+            errors.append((i, "", f"invalid JSON: {e}"))
+            continue
+        if check is not None:
+            errs = check(obj)
+            if errs:
+                errors.extend((i, pointer(p), m) for p, m in errs)
+    return len(lines), records, errors
+
+def _check_chunk(path: str, offset: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    if offset == 0 and data.startswith(b"\xef\xbb\xbf"):
+        data = data[3:]
+    return _check_lines(_worker, data)
+
+def _chunks(path: Path, size: int):
+    """(offset, length) spans of about `size` bytes, each ending at a line boundary."""
+    total = path.stat().st_size
+    with open(path, "rb") as f:
+        start = 0
+        while start < total:
+            f.seek(min(start + size, total))
+            if f.tell() < total:
+                f.readline()
+            end = f.tell()
+            yield start, end - start
+            start = end
+
+def default_workers() -> int:
+    v = os.getenv("SCHEMA_WORKERS", "")
+    return int(v) if v.strip() else (os.cpu_count() or 1)
+
+def validate_jsonl(path: Path, schema, workers: int = None, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Validates every line of a JSONL file against `schema`. Yields (line, pointer, message)
+    for each error in file order; returns (lines, records) when exhausted (see JsonlReport).
+    Chunks are read and checked by worker processes, at most 2 per worker in flight.
+    """
+    path = Path(path)
+    workers = default_workers() if workers is None else workers
+    validator = compile_schema(schema)
+    base = 0
+    records = 0
+    if workers <= 1 or path.stat().st_size < max(PARALLEL_MIN_BYTES, 2 * chunk_bytes):
+        _init_worker(schema)
+        for off, n in _chunks(path, chunk_bytes):
+            lines, recs, errs = _check_chunk(str(path), off, n)
+            for i, p, m in errs:
+                yield base + i, p, m
+            base += lines
+            records += recs
+        return base, records
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(validator.schema,)) as ex:
+        pending = []
+        spans = _chunks(path, chunk_bytes)
+        for off, n in spans:
+            pending.append(ex.submit(_check_chunk, str(path), off, n))
+            if len(pending) < 2 * workers:
+                continue
+            lines, recs, errs = pending.pop(0).result()
+            for i, p, m in errs:
+                yield base + i, p, m
+            base += lines
+            records += recs
+        for fut in pending:
+            lines, recs, errs = fut.result()
+            for i, p, m in errs:
+                yield base + i, p, m
+            base += lines
+            records += recs
+    return base, records
+
+class JsonlReport:
+    """Runs validate_jsonl() to the end: .errors, .lines, .records."""
+
+    def __init__(self, path: Path, schema, workers: int = None, max_errors: int = 0):
+        self.errors = []
+        self.total_errors = 0
+        gen = validate_jsonl(path, schema, workers)
+        while True:
+            try:
+                err = next(gen)
+            except StopIteration as stop:
+                self.lines, self.records = stop.value
+                break
+            self.total_errors += 1
+            if not max_errors or len(self.errors) < max_errors:
+                self.errors.append(err)
+
+def _bench(n: int, workers: int):
+    schema = {
+        "type": "object",
+        "required": ["requirement_id", "status", "evidence", "gaps", "notes"],
+        "properties": {
+            "requirement_id": {"type": "string", "pattern": "^[A-Z]+-\\d+$"},
+            "title": {"type": ["string", "null"]},
+            "status": {"enum": ["NOT_STARTED", "PARTIAL", "IMPLEMENTED_NO_TESTS", "IMPLEMENTED_WITH_TESTS"]},
+            "evidence": {"type": "array", "items": {"type": "string"}},
+            "gaps": {"type": "array", "items": {"type": "string"}},
+            "notes": {"type": "string"},
+        },
+    }
+    rnd = random.Random(5)
+    statuses = schema["properties"]["status"]["enum"] + ["DONE"]
+    with tempfile.TemporaryDirectory() as td:
+        p = Path(td) / "bench.jsonl"
+        with open(p, "w", encoding="utf-8") as f:
+            for i in range(n):
+                f.write(json.dumps({"requirement_id": f"BRRS-{i}", "title": f"Requirement {i}",
+                                    "status": statuses[rnd.randrange(len(statuses)) if i % 1000 == 0 else 0],
+                                    "evidence": [f"file:services/svc{i % 7}/src/x{i}.ts", f"route:GET /r/{i}"],
+                                    "gaps": [] if i % 3 else ["no tests"], "notes": "bench"}) + "\n")
+        size = p.stat().st_size
+        print(f"schema validation bench: {n} records, {size / 1e6:.1f} MB")
+        for w in sorted({1, workers}):
+            t0 = time.perf_counter()
+            r = JsonlReport(p, schema, workers=w)
+            dt = time.perf_counter() - t0
+            print(f"  workers={w:<3} {dt:7.2f}s  {r.records / dt:10.0f} records/s  errors={r.total_errors}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Validate JSON / JSONL instances against a JSON Schema.")
+    ap.add_argument("schema", nargs="?", help="Schema file")
+    ap.add_argument("instances", nargs="*", help="Instance files; *.jsonl is validated line by line")
+    ap.add_argument("--workers", type=int, default=None, help="JSONL worker processes (default: SCHEMA_WORKERS or CPU count)")
+    ap.add_argument("--max-errors", type=int, default=0, help="Print at most this many errors per file (0 = all)")
+    ap.add_argument("--bench", type=int, default=0, metavar="RECORDS", help="Benchmark on a synthetic JSONL file")
+    args = ap.parse_args()
+
+    if args.bench:
+        _bench(args.bench, default_workers() if args.workers is None else args.workers)
+        return 0
+    if not args.schema or not args.instances:
+        ap.error("schema and at least one instance are required")
+    try:
+        schema = load_json(args.schema)
+        compile_schema(schema)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {args.schema}: {e}", file=sys.stderr)
+        return 2
+    failed = 0
+    for inst in args.instances:
+        if inst.endswith(".jsonl"):
+            r = JsonlReport(Path(inst), schema, args.workers, args.max_errors)
+            for line, ptr, msg in r.errors:
+                print(f"{inst}:{line}: {ptr or '/'}: {msg}")
+            total, n = r.total_errors, r.records
+        else:
+            errs = compile_schema(schema).errors(load_json(inst))
+            for ptr, msg in errs[:args.max_errors or None]:
+                print(f"{inst}: {ptr or '/'}: {msg}")
+            total, n = len(errs), 1
+        failed += bool(total)
+        print(f"{'FAIL' if total else 'OK'}: {inst}: {n} record(s), {total} error(s)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(perf_trace.run("schema_validator", main))
@@ -1,6 +1,14 @@
 ﻿import json, re
 from pathlib import Path
 
+from evidence_index import EvidenceIndex
+from evidence_rank import BM25Ranker, dir_boosts_from_env
+from file_fact_cache import FileFactCache
+from git_history import GitHistory
+from db_catalog import OUT_JSON as CATALOG_JSON, SchemaMatcher
+import perf_trace
+from requirements_store import RequirementsStore
+
 ROOT = Path(".").resolve()
 REQ_JSONL = ROOT / "AgentInput" / "requirements.jsonl"
 ASIS_JSON = ROOT / "AgentInput" / "as_is_scan.json"
@@ -37,49 +45,30 @@ def best_keywords(req):
     kws = sorted(freq.items(), key=lambda x: (-x[1], x[0]))
     return [k for k,_ in kws[:10]]
 
-def search_evidence(repo_root: Path, keywords):
-    hits = []
-    # Search within common code/config extensions only
-    exts = {".ts",".tsx",".js",".jsx",".md",".json",".yml",".yaml",".sql",".prisma"}
-    skip = {"node_modules",".git",".next","dist","build","out",".turbo",".cache","coverage"}
-    for p in repo_root.rglob("*"):
-        if p.is_dir():
-            continue
-        if any(part in skip for part in p.parts):
-            continue
-        if p.suffix.lower() not in exts:
-            continue
-        try:
-            txt = p.read_text(encoding="utf-8", errors="replace").lower()
-        except Exception:
-            continue
-        score = 0
-        for k in keywords:
-            if k in txt:
-                score += 1
-        if score > 0:
-            hits.append((score, str(p.relative_to(repo_root)).replace("\\","/")))
-    hits.sort(reverse=True)
-    return [h[1] for h in hits[:6]]
+def rank_evidence(index: EvidenceIndex, keyword_lists):
+    # BM25 over whole tokens, all requirements in one batch; [(path, score), ...] each
+    return BM25Ranker(index, boosts=dir_boosts_from_env()).rank(keyword_lists, limit=6)
 
-def main():
-    if not REQ_JSONL.exists():
-        raise SystemExit(f"Missing requirements.jsonl: {REQ_JSONL}")
-    reqs = load_jsonl(REQ_JSONL)
-
-    # repo root is parent of AgentInput
-    repo_root = ROOT
-
-    out_lines = []
+def write_seed(reqs, index: EvidenceIndex, store: RequirementsStore = None, history: GitHistory = None,
+               schema: SchemaMatcher = None):
+    """
+    Ranks evidence for every requirement and writes the seed JSONL and Markdown. With a
+    store the seed rows go there first and the JSONL is exported from it. With a git
+    history each evidence path also gets its freshness (None for uncommitted files).
+    With a schema matcher each requirement also lists the tables/columns it names.
+    """
+    records = []
     md = []
     md.append("# Requirements Status Seed (auto-generated; agent must refine semantically)")
     md.append("")
     md.append("Legend: NOT_STARTED / IN_PROGRESS (evidence found) — this is a *seed*, not final proof.")
     md.append("")
 
-    for r in reqs:
-        kws = best_keywords(r)
-        evidence = search_evidence(repo_root, kws)
+    keywords = [best_keywords(r) for r in reqs]
+    ranked = rank_evidence(index, keywords)
+
+    for r, kws, hits in zip(reqs, keywords, ranked):
+        evidence = [p for p, _ in hits]
         status = "IN_PROGRESS" if evidence else "NOT_STARTED"
         rec = {
             "requirement_id": r.get("requirement_id"),
@@ -87,9 +76,16 @@ def main():
             "seed_status": status,
             "keywords": kws,
             "evidence_paths": evidence,
+            "evidence_scores": [round(sc, 4) for _, sc in hits],
             "missing_acceptance_criteria": bool(r.get("missing_acceptance_criteria"))
         }
-        out_lines.append(json.dumps(rec, ensure_ascii=False))
+        fresh = [history.get(p) for p in evidence] if history is not None else [None] * len(evidence)
+        if history is not None:
+            rec["evidence_freshness"] = fresh
+        objects = schema.match(f"{r.get('title') or ''} {r.get('description') or ''}") if schema is not None else []
+        if schema is not None:
+            rec["schema_objects"] = objects
+        records.append(rec)
 
         md.append(f"## {r.get('requirement_id')} — {r.get('title')}")
         md.append(f"- Seed status: **{status}**")
@@ -98,16 +94,44 @@ def main():
             md.append(f"- Acceptance criteria: **MISSING (agent should add Given/When/Then)**")
         if evidence:
             md.append("- Evidence:")
-            for e in evidence:
-                md.append(f"  - {e}")
+            for (e, sc), f in zip(hits, fresh):
+                age = f", last changed {f['last_changed'][:10]} by {f['last_author']}" if f else ""
+                md.append(f"  - {e} (score {sc:.2f}{age})")
         else:
             md.append("- Evidence: (none found by keyword scan)")
+        if objects:
+            md.append(f"- Schema objects: {', '.join(objects)}")
         md.append("")
 
-    OUT_SEED_JSONL.write_text("\n".join(out_lines) + "\n", encoding="utf-8")
+    if store is not None:
+        store.put_seed(records)
+        records = store.seed()
+    OUT_SEED_JSONL.write_text("\n".join(json.dumps(rec, ensure_ascii=False) for rec in records) + "\n", encoding="utf-8")
     OUT_SEED_MD.write_text("\n".join(md) + "\n", encoding="utf-8")
+    if store is not None:
+        store.stamp("seed", OUT_SEED_JSONL)
+
+def main():
+    if not REQ_JSONL.exists():
+        raise SystemExit(f"Missing requirements.jsonl: {REQ_JSONL}")
+    store = RequirementsStore.from_env(ROOT)
+    reqs = store.load_requirements(REQ_JSONL) if store is not None else load_jsonl(REQ_JSONL)
+
+    # repo root is parent of AgentInput
+    repo_root = ROOT
+    # One pass over the repo; every requirement queries the index in memory.
+    cache = FileFactCache.from_env(repo_root)
+    index = EvidenceIndex.build(repo_root, cache=cache)
+    cache.save()
+
+    # db_catalog.json is optional: without migrations (or before the first catalog build) no schema matching
+    write_seed(reqs, index, store, GitHistory.from_env(repo_root), SchemaMatcher.load(CATALOG_JSON))
+    if store is not None:
+        store.close()
     print(f"Wrote: {OUT_SEED_JSONL}")
     print(f"Wrote: {OUT_SEED_MD}")
+    if cache.enabled:
+        print(cache.summary())
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run("seed_status", main)
@@ -0,0 +1,261 @@
+import argparse, json, os, sqlite3, sys, tempfile, time
+from pathlib import Path
+
+import perf_trace
+
+DEFAULT_PATH = Path("Artifacts") / "status_history.sqlite"
+
+# Requirement ids, statuses and milestones are interned into small lookup tables, so each
+# observation row is four integers. Two small tables are maintained as runs are recorded so
+# dashboard queries never scan observations: run_counts (per run/milestone/status rollup,
+# for burn-up) and streaks (each requirement's current status and the run it started in).
+# Runs are ordered by generated_at (run_id only breaks ties), so a backfilled older run
+# lands in its place in the timeline. Test-mode runs are stored, flagged by run_mode, but
+# left out of the streaks and the trend queries.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_key TEXT NOT NULL UNIQUE,
+    generated_at TEXT NOT NULL,
+    git_sha TEXT NOT NULL DEFAULT '',
+    run_mode TEXT NOT NULL DEFAULT '',
+    workflow_run_url TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS runs_by_time ON runs (generated_at, run_id);
+CREATE TABLE IF NOT EXISTS requirements (id INTEGER PRIMARY KEY, requirement_id TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS statuses (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS milestones (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS observations (
+    run_id INTEGER NOT NULL,
+    req_id INTEGER NOT NULL,
+    status_id INTEGER NOT NULL,
+    milestone_id INTEGER NOT NULL,
+    PRIMARY KEY (run_id, req_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS run_counts (
+    run_id INTEGER NOT NULL,
+    milestone_id INTEGER NOT NULL,
+    status_id INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (run_id, milestone_id, status_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS streaks (
+    req_id INTEGER PRIMARY KEY,
+    status_id INTEGER NOT NULL,
+    milestone_id INTEGER NOT NULL,
+    since_run_id INTEGER NOT NULL,
+    last_run_id INTEGER NOT NULL
+);
+"""
+
+class StatusHistory:
+    """
+    Append-only store of requirement statuses per scan run (SQLite, stdlib only).
+    record_run() adds one run; the query helpers only touch the last N non-test runs.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._ids = {}
+
+    @classmethod
+    def from_env(cls, root: Path):
+        """STATUS_HISTORY=0 disables history, any other value overrides the database path."""
+        setting = os.getenv("STATUS_HISTORY", "")
+        if setting.strip().lower() in {"0","off","false","no"}:
+            return None
+        return cls(Path(setting) if setting.strip() else root / DEFAULT_PATH)
+
+    def close(self):
+        self.db.close()
+
+    def _intern(self, table: str, col: str, value: str) -> int:
+        key = (table, value)
+        if key not in self._ids:
+            self.db.execute(f"INSERT OR IGNORE INTO {table} ({col}) VALUES (?)", (value,))
+            self._ids[key] = self.db.execute(f"SELECT id FROM {table} WHERE {col} = ?", (value,)).fetchone()[0]
+        return self._ids[key]
+
+    @perf_trace.traced("status_history.record_run")
+    def record_run(self, rows, meta: dict) -> int:
+        """
+        Stores one run's rows (requirements_status records). Re-recording the same run
+        (same generated_at + git_sha) replaces it. Returns the run_id.
+        """
+        generated = meta.get("generated_at_utc") or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        git_sha = meta.get("git_sha") or ""
+        run_key = f"{generated}|{git_sha}"
+        with self.db:
+            old = self.db.execute("SELECT run_id FROM runs WHERE run_key = ?", (run_key,)).fetchone()
+            if old:
+                for table in ("observations", "run_counts", "runs"):
+                    self.db.execute(f"DELETE FROM {table} WHERE run_id = ?", (old[0],))
+            cur = self.db.execute(
+                "INSERT INTO runs (run_key, generated_at, git_sha, run_mode, workflow_run_url) VALUES (?,?,?,?,?)",
+                (run_key, generated, git_sha, meta.get("run_mode") or "", meta.get("workflow_run_url") or ""))
+            run_id = cur.lastrowid
+            obs = {}
+            for r in rows:
+                if r.get("requirement_id"):
+                    obs[self._intern("requirements", "requirement_id", str(r["requirement_id"]))] = (
+                        self._intern("statuses", "name", str(r.get("status") or "")),
+                        self._intern("milestones", "name", str(r.get("milestone") or "(none)")))
+            self.db.executemany("INSERT INTO observations (run_id, req_id, status_id, milestone_id) VALUES (?,?,?,?)",
+                                ((run_id, req, sid, mid) for req, (sid, mid) in obs.items()))
+            counts = {}
+            for sid, mid in obs.values():
+                counts[(mid, sid)] = counts.get((mid, sid), 0) + 1
+            self.db.executemany("INSERT INTO run_counts (run_id, milestone_id, status_id, n) VALUES (?,?,?,?)",
+                                ((run_id, mid, sid, n) for (mid, sid), n in counts.items()))
+            if old or (meta.get("run_mode") != "test" and self._has_later_run(run_id, generated)):
+                self._rebuild_streaks()
+            elif meta.get("run_mode") != "test":
+                self._extend_streaks(run_id, obs)
+        return run_id
+
+    def _has_later_run(self, run_id: int, generated: str) -> bool:
+        # A backfilled run is older than runs already folded into the streaks.
+        return self.db.execute(
+            "SELECT 1 FROM runs WHERE run_mode != 'test' AND run_id != ? AND generated_at > ? LIMIT 1",
+            (run_id, generated)).fetchone() is not None
+
+    def _extend_streaks(self, run_id: int, obs: dict):
+        current = {req: (sid, since) for req, sid, since in self.db.execute("SELECT req_id, status_id, since_run_id FROM streaks")}
+        self.db.executemany(
+            "INSERT OR REPLACE INTO streaks (req_id, status_id, milestone_id, since_run_id, last_run_id) VALUES (?,?,?,?,?)",
+            ((req, sid, mid, current[req][1] if req in current and current[req][0] == sid else run_id, run_id)
+             for req, (sid, mid) in obs.items()))
+
+    def _rebuild_streaks(self):
+        self.db.execute("DELETE FROM streaks")
+        for (run_id,) in self.db.execute(
+                "SELECT run_id FROM runs WHERE run_mode != 'test' ORDER BY generated_at, run_id").fetchall():
+            self._extend_streaks(run_id, {req: (sid, mid) for req, sid, mid in self.db.execute(
+                "SELECT req_id, status_id, milestone_id FROM observations WHERE run_id = ?", (run_id,))})
+
+    def last_runs(self, n: int) -> list:
+        """[{run_id, generated_at, git_sha, run_mode}] for the last `n` non-test runs, oldest first."""
+        rows = self.db.execute(
+            "SELECT run_id, generated_at, git_sha, run_mode FROM runs WHERE run_mode != 'test' "
+            "ORDER BY generated_at DESC, run_id DESC LIMIT ?", (n,)).fetchall()
+        return [dict(zip(("run_id", "generated_at", "git_sha", "run_mode"), r)) for r in reversed(rows)]
+
+    def _names(self, table: str) -> dict:
+        return dict(self.db.execute(f"SELECT id, {'requirement_id' if table == 'requirements' else 'name'} FROM {table}"))
+
+    def status_counts(self, n: int) -> tuple:
+        """
+        (runs, {milestone: {run_id: {status: count}}}) over the last `n` runs; enough for
+        burn-up charts once the caller decides which statuses count as done.
+        """
+        runs = self.last_runs(n)
+        if not runs:
+            return [], {}
+        statuses, milestones = self._names("statuses"), self._names("milestones")
+        out = {}
+        ids = [r["run_id"] for r in runs]
+        for run_id, mid, sid, count in self.db.execute(
+                f"SELECT run_id, milestone_id, status_id, n FROM run_counts WHERE run_id IN ({','.join('?' * len(ids))})", ids):
+            out.setdefault(milestones[mid], {}).setdefault(run_id, {})[statuses[sid]] = count
+        return runs, out
+
+    def time_in_status(self, n: int) -> list:
+        """
+        For every requirement in the latest run: its current status and since which run
+        (within the last `n`) it has held it. Rows are dicts with requirement_id, status,
+        milestone, since_run_id, since_generated_at and runs (count of runs in status).
+        """
+        runs = self.last_runs(n)
+        if not runs:
+            return []
+        first, last = runs[0]["run_id"], runs[-1]["run_id"]
+        pos = {r["run_id"]: i for i, r in enumerate(runs)}
+        gen = {r["run_id"]: r["generated_at"] for r in runs}
+        reqs, statuses, milestones = self._names("requirements"), self._names("statuses"), self._names("milestones")
+        out = []
+        for req_id, sid, mid, since in self.db.execute(
+                "SELECT req_id, status_id, milestone_id, since_run_id FROM streaks WHERE last_run_id = ?", (last,)):
+            if since not in pos:
+                since = first  # started before the window: clipped to it
+            out.append({
+                "requirement_id": reqs[req_id],
+                "status": statuses[sid],
+                "milestone": milestones[mid],
+                "since_run_id": since,
+                "since_generated_at": gen[since],
+                "runs": len(runs) - pos[since],
+            })
+        out.sort(key=lambda r: (-r["runs"], r["requirement_id"]))
+        return out
+
+def _bench(n_reqs: int, n_runs: int, window: int):
+    import random
+    rnd = random.Random(0)
+    statuses = ["NOT_STARTED", "PARTIAL", "IMPLEMENTED_NO_TESTS", "IMPLEMENTED_WITH_TESTS", "BLOCKED_DEPENDENCY"]
+    milestones = ["Core/Other", "Dispatch Console", "Driver App", "Payments/Payouts", "Rider App", "Tenant Admin"]
+    with tempfile.TemporaryDirectory() as td:
+        h = StatusHistory(Path(td) / "h.sqlite")
+        state = {f"BRRS-{i:05d}": 0 for i in range(n_reqs)}
+        t0 = time.perf_counter()
+        for run in range(n_runs):
+            for rid in state:
+                if rnd.random() < 0.02:
+                    state[rid] = min(len(statuses) - 1, state[rid] + 1)
+            h.record_run(({"requirement_id": rid, "status": statuses[s], "milestone": milestones[hash(rid) % len(milestones)]}
+                          for rid, s in state.items()),
+                         {"generated_at_utc": f"2026-01-01T00:00:{run:06d}Z", "git_sha": f"{run:040x}"})
+        t_rec = time.perf_counter() - t0
+        size = os.path.getsize(Path(td) / "h.sqlite")
+        t0 = time.perf_counter()
+        _, counts = h.status_counts(window)
+        t_counts = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        tis = h.time_in_status(window)
+        t_tis = time.perf_counter() - t0
+        h.close()
+    print(f"{n_reqs} requirements x {n_runs} runs: record {t_rec / n_runs * 1000:.1f} ms/run, db {size / 1024 / 1024:.1f} MiB")
+    print(f"  status_counts(last {window}):  {t_counts * 1000:7.1f} ms  ({len(counts)} milestones)")
+    print(f"  time_in_status(last {window}): {t_tis * 1000:7.1f} ms  ({len(tis)} requirements)")
+
+def main():
+    ap = argparse.ArgumentParser(description="Requirement status history (SQLite).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("record", help="Append one run from requirements_status.jsonl + run_metadata.json.")
+    rp.add_argument("--jsonl", required=True)
+    rp.add_argument("--meta", default="", help="run_metadata.json (default: next to --jsonl)")
+    rp.add_argument("--db", default=str(DEFAULT_PATH))
+    qp = sub.add_parser("report", help="Print time-in-status for the last N runs.")
+    qp.add_argument("--db", default=str(DEFAULT_PATH))
+    qp.add_argument("--last", type=int, default=30)
+    bp = sub.add_parser("bench", help="Query latency on a synthetic history.")
+    bp.add_argument("--requirements", type=int, default=5000)
+    bp.add_argument("--runs", type=int, default=200)
+    bp.add_argument("--last", type=int, default=50)
+    args = ap.parse_args()
+
+    if args.cmd == "bench":
+        _bench(args.requirements, args.runs, args.last)
+        return 0
+    if args.cmd == "record":
+        jsonl = Path(args.jsonl)
+        meta_path = Path(args.meta) if args.meta else jsonl.with_name("run_metadata.json")
+        meta = json.loads(meta_path.read_text(encoding="utf-8-sig")) if meta_path.exists() else {}
+        h = StatusHistory(Path(args.db))
+        with jsonl.open("r", encoding="utf-8") as f:
+            run_id = h.record_run((json.loads(l) for l in f if l.strip()), meta)
+        h.close()
+        print(f"OK: recorded run {run_id} into {args.db}")
+        return 0
+    h = StatusHistory(Path(args.db))
+    for r in h.time_in_status(args.last):
+        print(json.dumps(r, ensure_ascii=False))
+    h.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(perf_trace.run("status_history", main))
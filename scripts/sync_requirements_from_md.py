@@ -1,104 +1,108 @@
-﻿import json, re
+﻿import argparse, json, os
 from pathlib import Path
 
+from eval_result_cache import requirement_hash
+import perf_trace
+from requirements_md import load_document, render_sync
+from requirements_store import RequirementsStore
+
 REQ_MD   = Path(r"Requirements/BlackRavenia_RideShare_Canonical_Requirements_v6_1_MERGED_REORG_v3.md")
 OUT_JSON = Path(r"Requirements/BlackRavenia_RideShare_Canonical_Requirements_v6_1_MERGED_REORG_v3.json")
 OUT_JSONL = Path(r"Requirements/requirements.jsonl")
 
-def parse_blocks(md: str):
-    # Split on ### headings
-    heading_re = re.compile(r'(?m)^###\s+(.+?)\s*$')
-    hits = list(heading_re.finditer(md))
-    if not hits:
-        raise SystemExit("Parsed 0 requirements: expected '### ' headings in the Markdown (MD).")
-
-    reqs = []
-    used_ids = set()
-
-    def alloc_id(n: int):
-        return f"BRRS-{n:04d}"
-
-    next_auto = 1
-
-    for i, h in enumerate(hits):
-        start = h.start()
-        end = hits[i+1].start() if i+1 < len(hits) else len(md)
-        block = md[start:end].strip()
-
-        title_line = h.group(1).strip()
-
-        # Optional explicit ID in heading: "BRRS-0001 - Title" or "BRRS-0001: Title"
-        m = re.match(r'^(BRRS-\d{4,})\s*[:\-]\s*(.+)$', title_line)
-        if m:
-            rid = m.group(1).strip()
-            title = m.group(2).strip()
-        else:
-            rid = None
-            title = title_line
-
-        body = block.split("\n", 1)[1].strip() if "\n" in block else ""
-
-        # Lightweight metadata parsing (optional; you can add these lines right under the heading)
-        # milestone: X
-        # priority: P1
-        milestone = None
-        priority = None
-        acceptance = []
-        meta_lines = body.splitlines()
-
-        for line in meta_lines[:25]:
-            lm = re.match(r'^\s*milestone\s*:\s*(.+?)\s*$', line, re.IGNORECASE)
-            if lm: milestone = lm.group(1).strip()
-            lp = re.match(r'^\s*priority\s*:\s*(.+?)\s*$', line, re.IGNORECASE)
-            if lp: priority = lp.group(1).strip()
-
-        # Acceptance: lines starting with "acceptance:" then bullets "- ..."
-        acc_start = None
-        for idx, line in enumerate(meta_lines):
-            if re.match(r'^\s*acceptance\s*:\s*$', line, re.IGNORECASE):
-                acc_start = idx + 1
-                break
-        if acc_start is not None:
-            for line in meta_lines[acc_start:]:
-                if re.match(r'^\s*-\s+.+$', line):
-                    acceptance.append(re.sub(r'^\s*-\s+','',line).strip())
-                elif line.strip()=="":
-                    continue
-                else:
-                    break
-
-        if rid is None:
-            # Auto ID (stable if you only append new requirements at the end)
-            while alloc_id(next_auto) in used_ids:
-                next_auto += 1
-            rid = alloc_id(next_auto)
-            next_auto += 1
-
-        used_ids.add(rid)
-
-        reqs.append({
-            "id": rid,
-            "title": title,
-            "milestone": milestone,
-            "priority": priority,
-            "acceptance_criteria": acceptance,
-            "body_md": body
-        })
-
-    return reqs
+MANIFEST_VERSION = 1
+
+def sidecar(jsonl: Path, suffix: str) -> Path:
+    # Requirements/requirements.jsonl -> Requirements/requirements.delta.jsonl
+    return jsonl.with_name(jsonl.stem + suffix)
+
+def write_if_changed(path: Path, text: str) -> bool:
+    """Atomically replaces `path` with `text` unless it already holds exactly that; True if written."""
+    data = text.encode("utf-8")
+    try:
+        if path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+def load_manifest(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if isinstance(data, dict) and data.get("version") == MANIFEST_VERSION:
+        return data.get("requirements") or {}
+    return {}
+
+def diff_blocks(previous: dict, current: dict) -> list:
+    """
+    Delta records between two ID -> block hash maps: added and modified IDs in document
+    order, then removed IDs.
+    """
+    out = []
+    for rid, h in current.items():
+        old = previous.get(rid)
+        if old is None:
+            out.append({"id": rid, "change": "added", "hash": h})
+        elif old != h:
+            out.append({"id": rid, "change": "modified", "hash": h, "previous_hash": old})
+    for rid in sorted(set(previous) - set(current)):
+        out.append({"id": rid, "change": "removed", "previous_hash": previous[rid]})
+    return out
 
 def main():
-    md = REQ_MD.read_text(encoding="utf-8", errors="replace").replace("\r\n","\n")
-    reqs = parse_blocks(md)
-
-    OUT_JSON.parent.mkdir(parents=True, exist_ok=True)
-    OUT_JSONL.parent.mkdir(parents=True, exist_ok=True)
-
-    OUT_JSON.write_text(json.dumps(reqs, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-    OUT_JSONL.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in reqs), encoding="utf-8")
+    ap = argparse.ArgumentParser(description="Sync the requirements Markdown (MD) into JSON/JSONL, with a per-requirement delta.")
+    ap.add_argument("--md", default=str(REQ_MD), help="Requirements Markdown (MD) with one ### heading per requirement")
+    ap.add_argument("--json", default=str(OUT_JSON), help="JSON array to write")
+    ap.add_argument("--jsonl", default=str(OUT_JSONL), help="JSONL (JavaScript Object Notation Lines) to write")
+    ap.add_argument("--delta", default="", help="Delta JSONL of added/modified/removed IDs (default: <jsonl stem>.delta.jsonl)")
+    ap.add_argument("--manifest", default="", help="ID -> block hash manifest (default: <jsonl stem>.manifest.json)")
+    args = ap.parse_args()
+
+    md_path, out_json, out_jsonl = Path(args.md), Path(args.json), Path(args.jsonl)
+    delta_path = Path(args.delta) if args.delta else sidecar(out_jsonl, ".delta.jsonl")
+    manifest_path = Path(args.manifest) if args.manifest else sidecar(out_jsonl, ".manifest.json")
+    if not md_path.exists():
+        raise SystemExit(f"Requirements Markdown (MD) not found: {md_path}")
+
+    # Split on ### headings; see requirements_md.Document.blocks for the metadata rules.
+    reqs = load_document(md_path).blocks()
+    if not reqs:
+        raise SystemExit("Parsed 0 requirements: expected '### ' headings in the Markdown (MD).")
 
-    print(f"Wrote: {OUT_JSON} ({len(reqs)} requirements)")
-    print(f"Wrote: {OUT_JSONL}")
+    # Each ### block is hashed as the record it produces, so a changed heading, body or
+    # assigned ID all show up as a modification of that ID.
+    current = {}
+    for r in reqs:
+        current[r["id"]] = requirement_hash(r)
+    delta = diff_blocks(load_manifest(manifest_path), current)
+
+    # The store is the system of record; the JSON/JSONL are exports of what it now holds.
+    store = RequirementsStore.from_env(Path("."))
+    if store is not None:
+        written = store.put_requirements(reqs)
+        reqs = store.requirements()
+    out = render_sync(reqs)
+    for path, text in ((out_json, out["json"]), (out_jsonl, out["jsonl"])):
+        if write_if_changed(path, text):
+            print(f"Wrote: {path} ({len(reqs)} requirements)")
+        else:
+            print(f"Unchanged: {path}")
+    if store is not None:
+        store.stamp("requirements", out_jsonl)
+        print(f"Store: {store.path} ({written} requirement row(s) updated)")
+        store.close()
+
+    write_if_changed(delta_path, "".join(json.dumps(d, ensure_ascii=False) + "\n" for d in delta))
+    write_if_changed(manifest_path, json.dumps({"version": MANIFEST_VERSION, "source": md_path.as_posix(),
+                                                "requirements": current}, ensure_ascii=False, indent=2) + "\n")
+    counts = {c: sum(1 for d in delta if d["change"] == c) for c in ("added", "modified", "removed")}
+    print(f"Delta: {counts['added']} added, {counts['modified']} modified, {counts['removed']} removed -> {delta_path}")
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run("sync_requirements_from_md", main)
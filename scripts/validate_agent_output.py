@@ -1,42 +1,44 @@
-﻿import json
-from pathlib import Path
+﻿from pathlib import Path
+
+import perf_trace
+from schema_validator import JsonlReport, load_json
 
 OUT_JSONL = Path("AgentOutput/requirements_status.jsonl")
 OUT_MD    = Path("AgentOutput/requirements_status.md")
 OUT_UNDOC = Path("AgentOutput/implemented_not_documented.md")
 
-REQUIRED_TOP_KEYS = {"requirement_id","title","status","evidence","gaps","proposed_work","needs_acceptance","proposed_acceptance_criteria"}
-VALID_STATUS = {"NOT_STARTED","IN_PROGRESS","IMPLEMENTED","TESTED","BLOCKED"}
+# Requirements/ of the tree being validated, else the one shipped next to this script
+SCRIPT_REQ = Path(__file__).resolve().parents[1] / "Requirements"
+
+# Errors listed in the failure message; the total is always reported.
+MAX_LISTED = 20
+
+def requirements_file(name: str) -> Path:
+    p = Path("Requirements") / name
+    return p if p.exists() else SCRIPT_REQ / name
+
+def status_schema() -> dict:
+    """The record schema with $defs.status taken from the status taxonomy."""
+    schema = load_json(requirements_file("requirements_status.schema.json"))
+    taxonomy = requirements_file("status_taxonomy.json")
+    if taxonomy.exists():
+        statuses = [s for s in load_json(taxonomy).get("statuses") or [] if isinstance(s, str)]
+        if statuses:
+            schema.setdefault("$defs", {})["status"] = {"enum": statuses}
+    return schema
 
 def main():
     missing_files = [p for p in [OUT_JSONL, OUT_MD, OUT_UNDOC] if not p.exists()]
     if missing_files:
         raise SystemExit("Missing expected agent outputs:\n" + "\n".join(str(p) for p in missing_files))
 
-    bad = []
-    lines = OUT_JSONL.read_text(encoding="utf-8", errors="replace").splitlines()
-    for i, line in enumerate(lines, start=1):
-        if not line.strip():
-            continue
-        try:
-            obj = json.loads(line)
-        except Exception as e:
-            bad.append((i, f"Invalid JSON: {e}"))
-            continue
-
-        missing = REQUIRED_TOP_KEYS - set(obj.keys())
-        if missing:
-            bad.append((i, f"Missing keys: {sorted(missing)}"))
-        if obj.get("status") not in VALID_STATUS:
-            bad.append((i, f"Invalid status: {obj.get('status')}"))
-        if not isinstance(obj.get("evidence"), dict):
-            bad.append((i, "evidence must be an object"))
-
-    if bad:
-        msg = "AgentOutput/requirements_status.jsonl failed validation:\n" + "\n".join([f"Line {i}: {m}" for i,m in bad[:20]])
+    report = JsonlReport(OUT_JSONL, status_schema(), max_errors=MAX_LISTED)
+    if report.errors:
+        msg = (f"{OUT_JSONL.as_posix()} failed validation ({report.total_errors} error(s) in {report.records} record(s)):\n"
+               + "\n".join(f"Line {i}: {ptr or '/'}: {m}" for i, ptr, m in report.errors))
         raise SystemExit(msg)
 
     print("OK: Agent outputs exist and requirements_status.jsonl is valid JSONL with expected schema.")
 
 if __name__ == "__main__":
-    main()
+    perf_trace.run("validate_agent_output", main)
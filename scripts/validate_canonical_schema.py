@@ -31,6 +31,9 @@ for _name, _obj in (
 #!/usr/bin/env python3
 import json, os, sys
 
+import perf_trace
+from schema_validator import compile_schema
+
 ROOT = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
 REQ  = os.path.join(ROOT, "Requirements")
 
@@ -39,6 +42,14 @@ TARGETS = [
   os.path.join(REQ, "PROJECT_PROFILE.schema.json"),
 ]
 
+# schema -> instance validated against it (when the instance exists)
+INSTANCES = {
+  os.path.join(REQ, "CANONICAL.schema.json"): os.path.join(REQ, "CANONICAL.json"),
+}
+
+# Errors printed per instance; the total is always reported.
+MAX_LISTED = 50
+
 def load_json(p):
   with open(p, "r", encoding="utf-8-sig") as f:
     return json.load(f)
@@ -58,17 +69,39 @@ def main():
     for p in missing: print(" - " + p)
     return 2
 
+  validators = {}
   for p in TARGETS:
     try:
       obj = load_json(p)
       basic_schema_sanity(obj, p)
+      validators[p] = compile_schema(obj)
     except Exception as e:
       print(f"Schema validation failed for {p}: {e}")
       return 2
 
-  print("OK: CANONICAL.schema.json + PROJECT_PROFILE.schema.json parse + basic sanity passed.")
+  failed = False
+  checked = []
+  for schema_path, inst in INSTANCES.items():
+    if not os.path.exists(inst):
+      continue
+    try:
+      errs = validators[schema_path].errors(load_json(inst))
+    except Exception as e:
+      print(f"Failed reading {inst}: {e}")
+      return 2
+    for ptr, msg in errs[:MAX_LISTED]:
+      print(f"{os.path.relpath(inst, ROOT)}: {ptr or '/'}: {msg}")
+    if errs:
+      print(f"{os.path.relpath(inst, ROOT)} does not match {os.path.basename(schema_path)} ({len(errs)} error(s))")
+      failed = True
+    checked.append(os.path.basename(inst))
+  if failed:
+    return 2
+
+  print("OK: CANONICAL.schema.json + PROJECT_PROFILE.schema.json parse + compile passed"
+        + (f"; {', '.join(checked)} valid." if checked else "."))
   return 0
 
 if __name__ == "__main__":
-  sys.exit(main())
+  sys.exit(perf_trace.run("validate_canonical_schema", main))
 
@@ -3,8 +3,12 @@ import json
 import sys
 from pathlib import Path
 
+import perf_trace
+from schema_validator import compile_schema
+
 ROOT = Path(__file__).resolve().parents[1]
 SCHEMA = ROOT / "Requirements" / "PROJECT_PROFILE.schema.json"
+PROFILE = ROOT / "Requirements" / "PROJECT_PROFILE.json"
 
 def die(msg: str, code: int = 2):
   print(msg, file=sys.stderr)
@@ -39,8 +43,21 @@ def main():
   if data.get("type") != "object":
     die("PROJECT_PROFILE.schema.json must have type=object", 2)
 
+  try:
+    validator = compile_schema(data)
+  except ValueError as e:
+    die(f"PROJECT_PROFILE.schema.json does not compile: {e}", 2)
+
+  # The profile itself is optional; when present it must match the schema.
+  if PROFILE.exists():
+    errs = validator.errors(read_json(PROFILE))
+    if errs:
+      die("PROJECT_PROFILE.json does not match its schema:\n"
+          + "\n".join(f"  {ptr or '/'}: {msg}" for ptr, msg in errs), 2)
+    print("OK: PROJECT_PROFILE.json validated against PROJECT_PROFILE.schema.json")
+
   print("OK: PROJECT_PROFILE.schema.json basic shape validated")
   return 0
 
 if __name__ == "__main__":
-  sys.exit(main())
\ No newline at end of file
+  sys.exit(perf_trace.run("validate_project_profile_schema", main))
\ No newline at end of file